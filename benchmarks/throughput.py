@@ -0,0 +1,492 @@
+"""Offline end-to-end throughput benchmark of the evaluator.
+
+Drives the real Orchestrator against generated SQLite databases, with the
+simulated_latency model generator standing in for an LLM, so runs are
+deterministic and need no network or cloud resources. Every case (dataset
+size x runner preset) runs in its own process, so peak RSS and the process-wide
+runner pools, metrics and tracer are measured per case.
+
+Usage (from the repository root):
+  python benchmarks/throughput.py --sizes=100,1000 --presets=batch,streaming
+  python benchmarks/throughput.py --update_baseline
+
+The run exits with a non-zero status if a case regressed against the baseline
+by more than the thresholds stored with it, or has no baseline. Throughput and
+latencies are compared as ratios to the batch case of the same size, which
+always runs, so that the check holds on hosts other than the one the baseline
+was recorded on. Absolute numbers are only compared on that same host.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from absl import app
+from absl import flags
+
+_EVALBENCH_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "evalbench"
+)
+sys.path.insert(0, _EVALBENCH_DIRECTORY)
+
+_SIZES = flags.DEFINE_list("sizes", ["100", "1000"], "Dataset sizes to run.")
+_PRESETS = flags.DEFINE_list(
+    "presets", ["batch", "streaming", "async"], "Runner presets to run."
+)
+_LATENCY_MS = flags.DEFINE_integer(
+    "latency_ms", 20, "Simulated latency of every SQL generation call."
+)
+_ROWS = flags.DEFINE_integer("rows", 1000, "Rows per table of the generated DB.")
+_BASELINE = flags.DEFINE_string(
+    "baseline",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json"),
+    "Baseline to compare the results against.",
+)
+_UPDATE_BASELINE = flags.DEFINE_bool(
+    "update_baseline", False, "Store the results as the new baseline."
+)
+_OUTPUT = flags.DEFINE_string("output", None, "Optional path to write the results.")
+_CASE = flags.DEFINE_string("case", None, "Internal: runs a single case (JSON).")
+_CASE_OUTPUT = flags.DEFINE_string(
+    "case_output", None, "Internal: where a single case writes its results."
+)
+
+# Runner settings to benchmark, merged over the defaults of the runners config.
+RUNNER_PRESETS: dict[str, dict[str, Any]] = {
+    "batch": {"mode": "batch"},
+    "streaming": {"mode": "streaming"},
+    "async": {"mode": "async"},
+    "batch_shared": {"mode": "batch", "shared_executors": True},
+    "streaming_small": {
+        "mode": "streaming",
+        "promptgen_runners": 2,
+        "sqlgen_runners": 2,
+        "sqlexec_runners": 2,
+        "scoring_runners": 2,
+    },
+}
+
+# The runners config key of each stage, used to compute its utilization.
+_STAGE_RUNNER_KEYS = {
+    "promptgen": "promptgen_runners",
+    "sqlgen": "sqlgen_runners",
+    "sqlexec": "sqlexec_runners",
+    "scoring": "scoring_runners",
+}
+# Default number of runners per stage of the Evaluator.
+_DEFAULT_STAGE_RUNNERS = 10
+
+# Preset that the speed of the other cases of the same size is measured against.
+REFERENCE_PRESET = "batch"
+# Metrics that depend on the speed of the host, compared as ratios to the
+# reference case of the same size, in "<metric>_vs_batch".
+_NORMALIZED_METRICS = ["items_per_second", "p50_item_latency", "p99_item_latency"]
+
+# Relative change of a metric that counts as a regression, if the baseline does
+# not set its own. Positive for higher-is-better metrics.
+DEFAULT_THRESHOLDS = {
+    "items_per_second_vs_batch": 0.2,
+    "p50_item_latency_vs_batch": -0.5,
+    "p99_item_latency_vs_batch": -0.5,
+    "peak_rss_mb": -0.25,
+}
+# Thresholds of the absolute numbers, only checked on the host that recorded
+# the baseline.
+DEFAULT_HOST_THRESHOLDS = {
+    "items_per_second": 0.2,
+    "p50_item_latency": -0.5,
+    "p99_item_latency": -0.5,
+}
+
+_DATABASE = "benchmark_db"
+_COUNTRIES = ["AU", "BR", "CA", "DE", "FR", "IN", "JP", "US"]
+_STATUSES = ["new", "paid", "shipped", "returned"]
+
+_SETUP_SQL = """
+CREATE TABLE users (
+  user_id INTEGER PRIMARY KEY,
+  name TEXT,
+  country TEXT,
+  age INTEGER
+);
+CREATE TABLE orders (
+  order_id INTEGER PRIMARY KEY,
+  user_id INTEGER,
+  amount REAL,
+  status TEXT
+);
+"""
+
+# Golden queries of the dataset, cycled through with the item index as {n}.
+_QUERY_TEMPLATES = [
+    "SELECT COUNT(*) AS users FROM users WHERE age > {n} % 50 + 18;",
+    "SELECT country, COUNT(*) AS users FROM users GROUP BY country ORDER BY country;",
+    "SELECT u.name, SUM(o.amount) AS total FROM users u JOIN orders o"
+    + " ON u.user_id = o.user_id WHERE u.user_id <= {n} % 100 + 1"
+    + " GROUP BY u.name ORDER BY total DESC, u.name LIMIT 10;",
+    "SELECT status, ROUND(AVG(amount), 2) AS average FROM orders"
+    + " WHERE order_id % ({n} % 7 + 2) = 0 GROUP BY status ORDER BY status;",
+    "SELECT user_id, name FROM users WHERE country = '{country}'"
+    + " ORDER BY user_id LIMIT 20;",
+]
+
+
+def write_setup_directory(directory: str, rows: int):
+    """Writes the setup scripts and data of a generated SQLite DB."""
+    scripts_directory = os.path.join(directory, _DATABASE, "sqlite")
+    data_directory = os.path.join(directory, _DATABASE, "data")
+    os.makedirs(scripts_directory, exist_ok=True)
+    os.makedirs(data_directory, exist_ok=True)
+    with open(os.path.join(scripts_directory, "setup.sql"), "w") as f:
+        f.write(_SETUP_SQL)
+    rng = random.Random(0)
+    with open(os.path.join(data_directory, "users.csv"), "w") as f:
+        for user_id in range(1, rows + 1):
+            country = rng.choice(_COUNTRIES)
+            age = rng.randint(18, 90)
+            f.write(f"{user_id},'user_{user_id}','{country}',{age}\n")
+    with open(os.path.join(data_directory, "orders.csv"), "w") as f:
+        for order_id in range(1, rows + 1):
+            user_id = rng.randint(1, rows)
+            amount = round(rng.uniform(1, 500), 2)
+            status = rng.choice(_STATUSES)
+            f.write(f"{order_id},{user_id},{amount},'{status}'\n")
+
+
+def build_dataset(size: int) -> list[dict]:
+    """Builds DQL items whose nl_prompt is their golden SQL.
+
+    The NOOPGenerator prompt generator passes the nl_prompt through, and the
+    simulated_latency model returns its prompt, so every item is answered with
+    its golden SQL.
+    """
+    items = []
+    for n in range(size):
+        template = _QUERY_TEMPLATES[n % len(_QUERY_TEMPLATES)]
+        sql = template.format(n=n, country=_COUNTRIES[n % len(_COUNTRIES)])
+        items.append(
+            {
+                "id": n,
+                "nl_prompt": sql,
+                "query_type": "dql",
+                "database": _DATABASE,
+                "dialects": ["sqlite"],
+                "golden_sql": {"sqlite": [sql]},
+                "eval_query": {},
+                "setup_sql": {},
+                "cleanup_sql": {},
+                "tags": [],
+                "other": {},
+            }
+        )
+    return items
+
+
+def run_case(case: dict[str, Any]) -> dict[str, Any]:
+    """Runs one case in this process and returns its measurements."""
+    from dataset.dataset import flatten_dataset, load_dataset
+    from evaluator.async_orchestrator import AsyncOrchestrator
+    from evaluator.orchestrator import Orchestrator
+    from util.metrics import REGISTRY, STAGE_RUN_TIME
+    from util.ndjson import iter_ndjson
+
+    work_directory = tempfile.mkdtemp(prefix="evalbench_benchmark_")
+    setup_directory = os.path.join(work_directory, "setup")
+    write_setup_directory(setup_directory, case["rows"])
+    model_config = os.path.join(work_directory, "model.yaml")
+    with open(model_config, "w") as f:
+        f.write("generator: simulated_latency\n")
+        f.write(f"simulated_latency_ms: {case['latency_ms']}\n")
+    trace_file = os.path.join(work_directory, "trace.json")
+
+    runners = {**RUNNER_PRESETS[case["preset"]], "trace_file": trace_file}
+    config = {
+        "model_config": model_config,
+        "prompt_generator": "NOOPGenerator",
+        "dialects": ["sqlite"],
+        "scorers": {"exact_match": None, "set_match": None},
+        "runners": runners,
+        "journal_directory": "",
+    }
+    db_configs = {
+        "sqlite": [
+            {
+                "db_type": "sqlite",
+                "dialect": "sqlite",
+                "database_name": _DATABASE,
+                "database_path": os.path.join(work_directory, "dbs", ""),
+                "max_executions_per_minute": 1_000_000,
+            }
+        ]
+    }
+    dataset = flatten_dataset(load_dataset(build_dataset(case["size"]), config))
+
+    REGISTRY.reset()
+    setup_config = {"setup_directory": setup_directory}
+    start = time.monotonic()
+    if runners.get("mode") == "async":
+        orchestrator = AsyncOrchestrator(config, db_configs, setup_config)
+        asyncio.run(orchestrator.evaluate(dataset))
+    else:
+        orchestrator = Orchestrator(config, db_configs, setup_config)
+        orchestrator.evaluate(dataset)
+    elapsed = time.monotonic() - start
+    _, _, results_path, scores_path = orchestrator.process()
+
+    items = sum(1 for _ in iter_ndjson(results_path))
+    errors = sum(
+        1
+        for result in iter_ndjson(results_path)
+        if result.get("generated_error") or result.get("golden_error")
+    )
+    scores = [score["score"] for score in iter_ndjson(scores_path)]
+    latencies = sorted(item_latencies(trace_file).values())
+    shutil.rmtree(work_directory, ignore_errors=True)
+
+    utilization = {}
+    for stage, key in _STAGE_RUNNER_KEYS.items():
+        busy = sum(
+            STAGE_RUN_TIME.summary(**labels)["sum"]
+            for labels in map(dict, STAGE_RUN_TIME.label_sets())
+            if labels.get("stage") == stage
+        )
+        capacity = elapsed * runners.get(key, _DEFAULT_STAGE_RUNNERS)
+        utilization[stage] = busy / capacity if capacity else 0.0
+
+    return {
+        "items": items,
+        "errors": errors,
+        "mean_score": sum(scores) / len(scores) if scores else 0.0,
+        "elapsed_seconds": elapsed,
+        "items_per_second": items / elapsed if elapsed else 0.0,
+        "p50_item_latency": percentile(latencies, 0.5),
+        "p99_item_latency": percentile(latencies, 0.99),
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stage_utilization": utilization,
+    }
+
+
+def item_latencies(trace_file: str) -> dict[Any, float]:
+    """Returns the time from the first queueing to the end of scoring per item.
+
+    Uses the queue wait and stage spans of the trace that the runners record.
+    """
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    span_items = {}
+    bounds: dict[Any, list[float]] = {}
+
+    def extend(item, start, end):
+        if item not in bounds:
+            bounds[item] = [start, end]
+        else:
+            bounds[item][0] = min(bounds[item][0], start)
+            bounds[item][1] = max(bounds[item][1], end)
+
+    for event in events:
+        if event.get("cat") not in ("queue", "stage"):
+            continue
+        args = event.get("args", {})
+        if event["ph"] == "X":
+            extend(args.get("id"), event["ts"], event["ts"] + event["dur"])
+        elif event["ph"] == "b":
+            span_items[event["id"]] = (args.get("id"), event["ts"])
+        elif event["ph"] == "e" and event["id"] in span_items:
+            item, start = span_items.pop(event["id"])
+            extend(item, start, event["ts"])
+    # Trace timestamps are in microseconds.
+    return {
+        item: (end - start) / 1_000_000
+        for item, (start, end) in bounds.items()
+        if item is not None
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q * len(values)) - 1))
+    return values[index]
+
+
+def case_name(case: dict[str, Any]) -> str:
+    return f"{case['preset']}/{case['size']}"
+
+
+def run_case_in_subprocess(case: dict[str, Any]) -> dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        case_output = f.name
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                f"--case={json.dumps(case)}",
+                f"--case_output={case_output}",
+            ],
+            check=True,
+        )
+        with open(case_output) as f:
+            return json.load(f)
+    finally:
+        os.remove(case_output)
+
+
+def add_normalized_metrics(results: dict[str, dict]) -> None:
+    """Adds the "<metric>_vs_batch" ratios to the reference case to every result."""
+    for name, result in results.items():
+        reference = results.get(f"{REFERENCE_PRESET}/{name.rsplit('/', 1)[1]}")
+        if reference is None:
+            continue
+        for metric in _NORMALIZED_METRICS:
+            if reference[metric]:
+                result[f"{metric}_vs_batch"] = result[metric] / reference[metric]
+
+
+def find_regressions(
+    results: dict[str, dict], baseline: dict[str, Any], same_host: bool = False
+) -> list[str]:
+    """Compares the results of every case against its baseline.
+
+    A threshold t of a metric is the largest allowed relative change: higher is
+    better for t > 0, where a value below baseline * (1 - t) regresses, and
+    lower is better for t < 0, where a value above baseline * (1 - t) regresses.
+    A case without a baseline counts as a regression, as it was not checked.
+
+    Args:
+      results: The results of the cases, with their normalized metrics.
+      baseline: The stored baseline.
+      same_host: Whether the baseline was recorded on this host, in which case
+        the absolute numbers are compared too.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    if same_host:
+        thresholds = {
+            **DEFAULT_HOST_THRESHOLDS,
+            **baseline.get("host_thresholds", {}),
+            **thresholds,
+        }
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get("cases", {}).get(name)
+        if expected is None:
+            regressions.append(
+                f"{name}: no baseline, record one with --update_baseline"
+            )
+            continue
+        if result["errors"] or result["items"] != expected["items"]:
+            regressions.append(
+                f"{name}: {result['items']} items with {result['errors']} errors,"
+                + f" expected {expected['items']} without errors"
+            )
+        for metric, threshold in thresholds.items():
+            if metric not in expected or metric not in result:
+                continue
+            limit = expected[metric] * (1 - threshold)
+            value = result[metric]
+            if (threshold > 0 and value < limit) or (threshold < 0 and value > limit):
+                regressions.append(
+                    f"{name}: {metric} is {value:.4g},"
+                    + f" baseline {expected[metric]:.4g} (limit {limit:.4g})"
+                )
+    return regressions
+
+
+def format_results(results: dict[str, dict]) -> str:
+    lines = [
+        f"{'case':<24}{'items/s':>10}{'p50 s':>10}{'p99 s':>10}"
+        + f"{'rss MB':>10}  stage utilization"
+    ]
+    for name, result in results.items():
+        utilization = " ".join(
+            f"{stage}={value:.0%}"
+            for stage, value in result["stage_utilization"].items()
+        )
+        lines.append(
+            f"{name:<24}{result['items_per_second']:>10.1f}"
+            + f"{result['p50_item_latency']:>10.3f}"
+            + f"{result['p99_item_latency']:>10.3f}"
+            + f"{result['peak_rss_mb']:>10.1f}  {utilization}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str]):
+    if _CASE.value:
+        result = run_case(json.loads(_CASE.value))
+        with open(_CASE_OUTPUT.value, "w") as f:
+            json.dump(result, f)
+        # Skip waiting on idle runner threads; the results are written.
+        os._exit(0)
+
+    results = {}
+    # The reference preset always runs, to normalize the other cases by.
+    for preset in dict.fromkeys([REFERENCE_PRESET, *_PRESETS.value]):
+        if preset not in RUNNER_PRESETS:
+            raise ValueError(f"Unknown runner preset {preset}")
+        for size in _SIZES.value:
+            case = {
+                "preset": preset,
+                "size": int(size),
+                "rows": _ROWS.value,
+                "latency_ms": _LATENCY_MS.value,
+            }
+            logging.info(f"Running benchmark case {case_name(case)}")
+            results[case_name(case)] = run_case_in_subprocess(case)
+    add_normalized_metrics(results)
+    print(format_results(results))
+
+    if _OUTPUT.value:
+        with open(_OUTPUT.value, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(_BASELINE.value):
+        with open(_BASELINE.value) as f:
+            baseline = json.load(f)
+    if _UPDATE_BASELINE.value:
+        baseline["thresholds"] = baseline.get("thresholds", DEFAULT_THRESHOLDS)
+        baseline["host_thresholds"] = baseline.get(
+            "host_thresholds", DEFAULT_HOST_THRESHOLDS
+        )
+        baseline["host"] = platform.node()
+        baseline["settings"] = {"latency_ms": _LATENCY_MS.value, "rows": _ROWS.value}
+        baseline["cases"] = {**baseline.get("cases", {}), **results}
+        with open(_BASELINE.value, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        logging.info(f"Updated the baseline at {_BASELINE.value}")
+        return
+
+    settings = baseline.get("settings")
+    if settings and settings != {"latency_ms": _LATENCY_MS.value, "rows": _ROWS.value}:
+        logging.warning(f"The baseline was recorded with different settings {settings}")
+    same_host = baseline.get("host") == platform.node()
+    if not same_host:
+        logging.warning(
+            "The baseline was recorded on another host, so only the ratios to the"
+            + f" {REFERENCE_PRESET} cases and the memory use are compared."
+        )
+    regressions = find_regressions(results, baseline, same_host)
+    if regressions:
+        print("Performance regressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("No performance regressions.")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    app.run(main)
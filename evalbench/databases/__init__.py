@@ -6,6 +6,10 @@ from .db import DB
 from .bigquery import BQDB
 from .alloydb import AlloyDB
 from .alloydb_omni import AlloyDBOmni
+from .golden_store import GoldenStore, get_golden_store
+from .resultset import ResultSet
+from .session_pool import DBSession, SessionPool
+from .setup_data import SetupData, TableData, get_setup_data, setup_fingerprint
 
 
 def get_database(db_config, db_name) -> DB:
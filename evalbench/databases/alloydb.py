@@ -40,7 +40,7 @@ class AlloyDB(PGDB):
             if "is_tmp_db" in db_config:
                 common_args["poolclass"] = NullPool
             else:
-                common_args["pool_size"] = 50
+                common_args["pool_size"] = self.pool_size
                 common_args["pool_recycle"] = 300
             return common_args
 
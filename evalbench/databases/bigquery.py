@@ -1,30 +1,48 @@
 from google.cloud import bigquery
 import logging
 import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from .db import DB
-from .util import with_cache_execute, DatabaseSchema
+from .resultset import ResultSet
+from .util import (
+    fetch_bounded,
+    with_cache_execute,
+    parse_sql_literal,
+    DatabaseSchema,
+)
 from util.rate_limit import rate_limit, ResourceExhaustedError
-from typing import List, Optional, Tuple, Any, Dict
+from typing import IO, Iterable, List, Optional, Sequence, Tuple, Any, Dict
 import json
 import sqlparse
 from google.cloud.bigquery import QueryJobConfig, ConnectionProperty
 from util.gcp import get_gcp_project
 from google.api_core.exceptions import GoogleAPICallError
 
+# Tables whose setup data is loaded at once, one load job each.
+_MAX_PARALLEL_LOAD_JOBS = 8
+# NDJSON of a load job is kept in memory up to this size, then spills to disk.
+_LOAD_FILE_MEMORY_SIZE = 16 * 1024 * 1024
+
 
 class BQDB(DB):
 
+    # Queries go through the stateless BigQuery client, there is no connection.
+    pin_sessions = False
+    # GoogleSQL string literals interpret backslash escapes.
+    backslash_escapes = True
+
     #####################################################
     #####################################################
     # Database Connection Setup Logic
     #####################################################
     #####################################################
 
-    def __init__(self, db_config):
+    def __init__(self, db_config, client: Optional[bigquery.Client] = None):
         super().__init__(db_config)
         self.project_id = get_gcp_project("")
         self.location = db_config.get("location", "US")
-        self.client = bigquery.Client(project=self.project_id)
+        self.client = client or bigquery.Client(project=self.project_id)
         self.tmp_users = []
 
     #####################################################
@@ -34,14 +52,21 @@ class BQDB(DB):
     #####################################################
 
     def _execute_queries(self, query: str, job_config: Optional[bigquery.QueryJobConfig] = None) -> List:
-        result: List = []
+        result = ResultSet()
         for sub_query in sqlparse.split(query):
             if sub_query:
                 resultset = self.client.query(sub_query, job_config)
                 rows = resultset.result()
                 if rows:
-                    for row in rows:
-                        result.append(dict(row))
+                    # Pages past the caps are not downloaded, the count is known.
+                    fetch_bounded(
+                        rows,
+                        [field.name for field in rows.schema],
+                        self.fetch_policy,
+                        result,
+                        to_tuple=lambda row: tuple(row.values()),
+                        total_row_count=rows.total_rows,
+                    )
         return result
 
     def batch_execute(self, commands: list[str]):
@@ -56,7 +81,12 @@ class BQDB(DB):
         if not use_cache or not self.cache_client or eval_query:
             return self._execute(query, eval_query, rollback)
         return with_cache_execute(
-            query, f"{self.project_id}.{self.db_name}", self._execute, self.cache_client
+            query,
+            f"{self.project_id}.{self.db_name}",
+            self._execute,
+            self.cache_client,
+            self.setup_fingerprint,
+            self.backslash_escapes,
         )
 
     def _execute(
@@ -125,9 +155,9 @@ class BQDB(DB):
             return rate_limit(
                 (query, eval_query, rollback),
                 _run_execute,
-                self.execs_per_minute,
-                self.semaphore,
+                self.rate_limiter,
                 self.max_attempts,
+                semaphore=self.semaphore,
             )
         except ResourceExhaustedError as e:
             logging.info(
@@ -227,44 +257,150 @@ class BQDB(DB):
         return schema_mapping
 
     def insert_data(self, data: dict[str, List[str]], setup: Optional[List[str]] = None):
+        """
+        Loads the setup data of every table with a single load job per table,
+        running the jobs of up to _MAX_PARALLEL_LOAD_JOBS tables at once. Rows
+        with values that cannot be loaded as typed values are inserted as
+        INSERT statements instead.
+        """
         if not data:
             return
         schema_mapping = self._get_column_name_to_type_mapping(setup)
-        insertion_statements = []
-
-        for table_name in data:
-            column_names = list(schema_mapping[table_name].keys())
-            for row in data[table_name]:
-                formatted_values = []
-
-                for index, value in enumerate(row):
-                    col_name = column_names[index]
-                    col_type = schema_mapping[table_name][col_name].upper()
-
-                    if col_type == 'BOOL':
-                        if value == "'1'":
-                            formatted_values.append("TRUE")
-                        elif value == "'0'":
-                            formatted_values.append("FALSE")
-                        else:
-                            formatted_values.append(f"{value}")
-                    elif self._is_float(value):
-                        formatted_values.append(f"{value}")
-                    elif col_type == 'JSON':
-                        formatted_values.append(f"PARSE_JSON({value})")
-                    else:
-                        escaped_value = value.replace("''", "\\'")
-                        formatted_values.append(f"{escaped_value}")
-
-                inline_columns = ", ".join(formatted_values)
-                insertion_statements.append(
-                    f"INSERT INTO `{self.project_id}.{self.db_name}.{table_name}` VALUES ({inline_columns});"
-                )
         try:
-            self.batch_execute(insertion_statements)
+            with ThreadPoolExecutor(
+                max_workers=min(len(data), _MAX_PARALLEL_LOAD_JOBS)
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        self._insert_table_data,
+                        table_name,
+                        rows,
+                        schema_mapping[table_name],
+                    )
+                    for table_name, rows in data.items()
+                ]
+                for future in futures:
+                    future.result()
         except RuntimeError as error:
             raise RuntimeError(f"Could not insert data into database: {error}")
 
+    def _insert_table_data(
+        self,
+        table_name: str,
+        rows: Iterable[Sequence[str]],
+        column_types: Dict[str, str],
+    ):
+        unparsed: list = []
+
+        def typed_rows():
+            for row in rows:
+                try:
+                    yield [
+                        self._to_load_value(value, column_type)
+                        for value, column_type in zip(row, column_types.values())
+                    ]
+                except ValueError:
+                    unparsed.append(row)
+
+        self.bulk_load(table_name, typed_rows(), list(column_types.keys()))
+        if unparsed:
+            self.batch_execute(
+                [
+                    self._insert_statement(table_name, row, column_types)
+                    for row in unparsed
+                ]
+            )
+
+    def _to_load_value(self, value: str, column_type: str) -> Any:
+        """Converts a SQL literal of the setup data into the JSON value of a column.
+        Raises ValueError if the literal has to be inserted as SQL instead."""
+        parsed = parse_sql_literal(value, self.backslash_escapes)
+        column_type = column_type.upper()
+        if parsed is None:
+            return None
+        if column_type.startswith("BOOL") and isinstance(parsed, str):
+            if parsed not in ("1", "0"):
+                raise ValueError(f"Unsupported BOOL literal {value}")
+            return parsed == "1"
+        if column_type.startswith("JSON") and isinstance(parsed, str):
+            return json.loads(parsed)
+        if column_type.startswith(("NUMERIC", "BIGNUMERIC")) and not isinstance(
+            parsed, str
+        ):
+            # Decimal strings keep the precision that a float would lose.
+            return value.strip()
+        return parsed
+
+    def _insert_statement(
+        self, table_name: str, row: Sequence[str], column_types: Dict[str, str]
+    ) -> str:
+        formatted_values = []
+        for value, col_type in zip(row, column_types.values()):
+            col_type = col_type.upper()
+            if col_type == 'BOOL':
+                if value == "'1'":
+                    formatted_values.append("TRUE")
+                elif value == "'0'":
+                    formatted_values.append("FALSE")
+                else:
+                    formatted_values.append(f"{value}")
+            elif self._is_float(value):
+                formatted_values.append(f"{value}")
+            elif col_type == 'JSON':
+                formatted_values.append(f"PARSE_JSON({value})")
+            else:
+                escaped_value = value.replace("''", "\\'")
+                formatted_values.append(f"{escaped_value}")
+
+        inline_columns = ", ".join(formatted_values)
+        return f"INSERT INTO `{self.project_id}.{self.db_name}.{table_name}` VALUES ({inline_columns});"
+
+    def bulk_load(
+        self,
+        table: str,
+        rows: Iterable[Sequence[Any]],
+        columns: Optional[List[str]] = None,
+    ) -> int:
+        """Loads all rows of JSON values with one NDJSON load job."""
+        table_id = f"{self.project_id}.{self.db_name}.{table}"
+        if columns is None:
+            columns = [field.name for field in self.client.get_table(table_id).schema]
+        loaded = 0
+        with tempfile.SpooledTemporaryFile(max_size=_LOAD_FILE_MEMORY_SIZE) as file:
+            for row in rows:
+                line = json.dumps(dict(zip(columns, row)), default=str) + "\n"
+                file.write(line.encode("utf-8"))
+                loaded += 1
+            if not loaded:
+                return 0
+            try:
+                rate_limit(
+                    (table_id, file),
+                    self._load_file,
+                    self.rate_limiter,
+                    self.max_attempts,
+                    semaphore=self.semaphore,
+                )
+            except Exception as error:
+                raise RuntimeError(f"Could not load data into {table}: {error}")
+        return loaded
+
+    def _load_file(self, table_id: str, file: IO[bytes]):
+        file.seek(0)
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        )
+        try:
+            self.client.load_table_from_file(
+                file, table_id, job_config=job_config, location=self.location
+            ).result()
+        except GoogleAPICallError as e:
+            error = str(e).lower()
+            if "resources exceeded" in error or "quota exceeded" in error:
+                raise ResourceExhaustedError(f"BigQuery load job exhausted: {e}") from e
+            raise
+
     #####################################################
     #####################################################
     # Database User Management
@@ -1,13 +1,41 @@
+import contextlib
+import itertools
+import logging
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Optional, Tuple, List
-from threading import Semaphore
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Optional, Sequence, Tuple, List
 from util.config import generate_key
-from .util import get_cache_client, get_db_secret, DatabaseSchema, Table, Column
+from util.rate_limit import get_rate_limiter, rate_limit
+from util.tracing import span
+from .util import (
+    BULK_LOAD_CHUNK_SIZE,
+    SETUP_PARALLELISM,
+    FetchPolicy,
+    chunked,
+    get_cache_client,
+    get_db_secret,
+    parse_literal_rows,
+    UnparsedRow,
+    DatabaseSchema,
+    Table,
+    Column,
+)
+from .setup_data import TableData, setup_fingerprint
+from sqlalchemy import text
 from sqlalchemy.engine.base import Connection
 
 
 class DB(ABC):
 
+    # Whether a SessionPool pins an open connection of self.engine per session.
+    pin_sessions = True
+    # Whether string literals of the database interpret backslash escapes.
+    backslash_escapes = False
+    # Whether the setup data of several tables can be loaded at once, each on a
+    # connection of its own.
+    parallel_table_loads = False
+
     def __init__(self, db_config):
         self.db_path = db_config["database_path"]
         self.db_name = db_config["database_name"]
@@ -26,16 +54,85 @@ class DB(ABC):
         # Setup the concurrency requirements
         self.execs_per_minute = db_config["max_executions_per_minute"]
         self.max_attempts = 3
-        self.semaphore = Semaphore(self.execs_per_minute)
+        # The budget is shared by every DB of the same instance, e.g. tmp DBs.
+        self.rate_limiter = get_rate_limiter(
+            f"{self.db_type}:{self.db_path}",
+            self.execs_per_minute,
+            db_config.get("max_executions_burst"),
+            db_config.get("adaptive_rate_limit", False),
+        )
+        # The rate limiter only paces when calls start, so this caps the calls
+        # in flight on this DB.
+        self.semaphore = (
+            threading.Semaphore(self.execs_per_minute)
+            if isinstance(self.execs_per_minute, int) and self.execs_per_minute > 0
+            else None
+        )
+        self.bulk_load_chunk_size = (
+            db_config.get("bulk_load_chunk_size") or BULK_LOAD_CHUNK_SIZE
+        )
+        # Tmp databases created, and tables loaded, at once while setting up.
+        self.setup_parallelism = max(
+            1, db_config.get("setup_parallelism") or SETUP_PARALLELISM
+        )
+        # Caps of the rows a query materializes, however large its result is.
+        self.fetch_policy = FetchPolicy.from_config(db_config)
+        # Connections the engine keeps open, e.g. one per session of a SessionPool.
+        self.pool_size = db_config.get("pool_size") or 50
+        self._pinned = threading.local()
 
         # Maintain setup / teardown information
         self.tmp_dbs = []
         self.tmp_users = []
         self.was_re_setup_this_session = False
+        # Restore a snapshot of the setup state between DDL items instead of
+        # running the whole setup again.
+        self.use_snapshots = db_config.get("ddl_snapshots", True)
+        self.has_snapshot = False
+        # DB of the instance that created this (tmp) database, for engines that
+        # snapshot whole databases and so need a connection to another one.
+        self.admin_db: Optional["DB"] = None
+        # Hash of the setup scripts and data the database was seeded with, which
+        # cached query results and golden results are keyed by. Set by
+        # resetup_database, or passed on by the DB that seeded the database.
+        # None if the contents are not known, e.g. of an existing database.
+        self.setup_fingerprint = db_config.get("setup_fingerprint")
+        # Tmp databases are created empty for the run, so their setup scripts
+        # alone determine what they hold.
+        self.is_tmp_db = "is_tmp_db" in db_config
 
         # Initialize the Redis cache client
         self.cache_client = get_cache_client(db_config)
 
+    @contextlib.contextmanager
+    def pinned(self, connection: Connection):
+        """Makes _connect() return the given connection on the current thread."""
+        previous = getattr(self._pinned, "connection", None)
+        self._pinned.connection = connection
+        try:
+            yield
+        finally:
+            self._pinned.connection = previous
+
+    def connect_session(self) -> Connection:
+        """Opens the connection that a DBSession of a SessionPool pins."""
+        return self.engine.connect()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields the connection pinned to this thread, or a new one of the engine."""
+        connection = getattr(self._pinned, "connection", None)
+        if connection is None:
+            with self.engine.connect() as connection:
+                yield connection
+            return
+        try:
+            yield connection
+        finally:
+            # Hand the pinned connection back without a transaction left open.
+            if connection.in_transaction():
+                connection.rollback()
+
     def clean_tmp_creations(self) -> None:
         self.drop_tmp_databases(self.tmp_dbs.copy())
         self.delete_tmp_users(self.tmp_users.copy())
@@ -68,8 +165,63 @@ class DB(ABC):
             self.batch_execute(post_setup)
         if setup_users:
             self.setup_tmp_users()
+        # Without data the tables are not dropped first, so the database also
+        # holds whatever it held before, which no fingerprint captures: its query
+        # results are then neither cached nor read from the golden store.
+        self.setup_fingerprint = (
+            setup_fingerprint(self.setup_scripts, self.data)
+            if self.data or self.is_tmp_db
+            else None
+        )
         self.was_re_setup_this_session = True
 
+    def reset_to_setup(self) -> None:
+        """
+        Brings the database back to the state of its setup scripts, e.g. before
+        each DDL item. The first call runs the full setup and snapshots the
+        result, later calls restore the snapshot. Falls back to the full setup
+        if the database does not support snapshots or restoring fails.
+        """
+        if self.has_snapshot:
+            try:
+                with span("db.restore_snapshot", "db", database=self.db_name):
+                    self.restore_snapshot()
+                return
+            except Exception as error:
+                logging.warning(
+                    f"Could not restore the snapshot of {self.db_name}, running"
+                    + f" the setup again: {error}"
+                )
+                self.has_snapshot = False
+        with span("db.resetup", "db", database=self.db_name):
+            self.resetup_database(force=True)
+        if self.use_snapshots:
+            try:
+                with span("db.create_snapshot", "db", database=self.db_name):
+                    self.has_snapshot = self.create_snapshot()
+            except Exception as error:
+                logging.warning(f"Could not snapshot {self.db_name}: {error}")
+
+    def create_snapshot(self) -> bool:
+        """
+        Snapshots the schema and data of the database, replacing the previous
+        snapshot, so that restore_snapshot can bring them back.
+
+        Returns:
+            bool: False if the database does not support snapshots.
+        """
+        return False
+
+    def restore_snapshot(self) -> None:
+        """
+        Replaces the schema and data of the database with the last snapshot.
+         * Raises RuntimeError if it cannot restore the snapshot.
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def _snapshot_name(self) -> str:
+        return f"{self.db_name}_snapshot"
+
     def get_ddl_from_db(self):
         db_schema = DatabaseSchema(name=self.db_name)
         metadata = self.get_metadata()
@@ -83,12 +235,17 @@ class DB(ABC):
         return self.generate_ddl(db_schema)
 
     def create_tmp_databases(self, num_dbs: int) -> list[str]:
-        tmp_dbs = []
-        for _ in range(num_dbs):
-            base_db_name = self.db_name
-            tmp_db_name = f"tmp_{base_db_name}_{generate_key()}"
-            self.create_tmp_database(tmp_db_name)
-            tmp_dbs.append(tmp_db_name)
+        """Creates num_dbs tmp databases, setup_parallelism at a time."""
+        tmp_dbs = [f"tmp_{self.db_name}_{generate_key()}" for _ in range(num_dbs)]
+        if len(tmp_dbs) <= 1 or self.setup_parallelism == 1:
+            for tmp_db_name in tmp_dbs:
+                self.create_tmp_database(tmp_db_name)
+            return tmp_dbs
+        with ThreadPoolExecutor(
+            max_workers=min(self.setup_parallelism, len(tmp_dbs))
+        ) as executor:
+            # Raises the first error, once all creations finished.
+            list(executor.map(self.create_tmp_database, tmp_dbs))
         return tmp_dbs
 
     def drop_tmp_databases(self, databases) -> None:
@@ -204,6 +361,115 @@ class DB(ABC):
         """
         raise NotImplementedError("Subclasses must implement this method")
 
+    def bulk_load(
+        self,
+        table: str,
+        rows: Iterable[Sequence[Any]],
+        columns: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Loads rows of Python values into a table, one chunk of
+        bulk_load_chunk_size rows at a time, so rows can be streamed in.
+         * Raises RuntimeError if it cannot load a chunk.
+
+        Args:
+            table (str): The name of the table.
+            rows (Iterable[Sequence[Any]]): The rows, e.g. a generator.
+            columns (Optional[List[str]], optional): The columns of the values of
+                each row. Defaults to all columns, in order.
+
+        Returns:
+            int: The number of rows loaded.
+        """
+        loaded = 0
+        for chunk in chunked(rows, self.bulk_load_chunk_size):
+            try:
+                rate_limit(
+                    (table, chunk, columns),
+                    self._load_chunk,
+                    self.rate_limiter,
+                    self.max_attempts,
+                    semaphore=self.semaphore,
+                )
+            except Exception as error:
+                raise RuntimeError(f"Could not load data into {table}: {error}")
+            loaded += len(chunk)
+        return loaded
+
+    def _load_chunk(self, table: str, rows: list, columns: Optional[List[str]]):
+        """Inserts the rows with one parameterized executemany."""
+        statement, _ = self._multi_row_insert(table, rows[:1], columns)
+        with self._connect() as connection:
+            with connection.begin():
+                connection.execute(
+                    text(statement),
+                    [{f"p0_{i}": value for i, value in enumerate(row)} for row in rows],
+                )
+
+    def _multi_row_insert(
+        self, table: str, rows: list, columns: Optional[List[str]]
+    ) -> Tuple[str, dict]:
+        """Returns an INSERT of all rows in one VALUES clause, and its parameters."""
+        params = {}
+        values = []
+        for r, row in enumerate(rows):
+            names = []
+            for i, value in enumerate(row):
+                params[f"p{r}_{i}"] = value
+                names.append(f":p{r}_{i}")
+            values.append(f"({', '.join(names)})")
+        column_list = f" ({', '.join(columns)})" if columns else ""
+        statement = (
+            f"INSERT INTO {self._qualified_table_name(table)}{column_list}"
+            + f" VALUES {', '.join(values)}"
+        )
+        return statement, params
+
+    def _qualified_table_name(self, table: str) -> str:
+        return table
+
+    def _insert_statement(self, table: str, row: Sequence[str]) -> str:
+        """Returns the INSERT of a row of SQL literals."""
+        inline_columns = ", ".join([f"{value}" for value in row])
+        return f"INSERT INTO {self._qualified_table_name(table)} VALUES ({inline_columns});"
+
+    def _bulk_insert_data(self, data: dict[str, Iterable[Sequence[str]]]) -> None:
+        """
+        Loads setup data, rows of SQL literals, with bulk_load. Rows with values
+        that are not plain literals are inserted as INSERT statements instead.
+         * Raises RuntimeError if it cannot insert data.
+        """
+        if (
+            not self.parallel_table_loads
+            or self.setup_parallelism == 1
+            or len(data) <= 1
+        ):
+            for table_name, rows in data.items():
+                self._bulk_insert_table(table_name, rows)
+            return
+        with ThreadPoolExecutor(
+            max_workers=min(self.setup_parallelism, len(data))
+        ) as executor:
+            list(executor.map(self._bulk_insert_table, data.keys(), data.values()))
+
+    def _bulk_insert_table(self, table_name: str, rows: Iterable[Sequence[str]]):
+        if isinstance(rows, TableData):
+            # Parsed rows of a setup CSV come from its on-disk cache.
+            parsed_rows = rows.parsed_rows(self.backslash_escapes)
+        else:
+            parsed_rows = parse_literal_rows(rows, self.backslash_escapes)
+        # Rows are inserted in the order of the data, so that the tables (and the
+        # results of unordered queries) are the same as with INSERT statements.
+        for unparsed, group in itertools.groupby(
+            parsed_rows, key=lambda row: isinstance(row, UnparsedRow)
+        ):
+            if unparsed:
+                self.batch_execute(
+                    [self._insert_statement(table_name, row) for row in group]
+                )
+            else:
+                self.bulk_load(table_name, group)
+
     @abstractmethod
     def create_tmp_users(self, dql_user: str, dml_user: str, tmp_password: str) -> None:
         """
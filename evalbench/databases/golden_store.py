@@ -0,0 +1,102 @@
+"""Persistent store of the results of golden queries."""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import tempfile
+from typing import Any, Optional, Tuple
+
+from util.cache import DEFAULT_LOCAL_CACHE_MAX_BYTES, LocalCache, get_local_cache
+from util.metrics import CACHE_REQUESTS
+
+DEFAULT_GOLDEN_STORE_PATH = os.path.join(
+    tempfile.gettempdir(), "evalbench_golden", "golden.sqlite"
+)
+# Functions whose results change from one execution to the next, which make
+# the result of a golden query impossible to store.
+_NONDETERMINISTIC = re.compile(
+    r"\b(now|current_timestamp|current_date|current_time|localtimestamp|localtime"
+    r"|sysdate|sysdatetime|getdate|getutcdate|utc_timestamp|unix_timestamp"
+    r"|random|rand|newid|uuid|gen_random_uuid|generate_uuid)\b",
+    re.IGNORECASE,
+)
+
+
+class GoldenStore:
+    """Results of golden queries, kept across runs.
+
+    A golden result only depends on the golden query, the eval query, the data
+    the database was seeded with and the database engine, so it is keyed by all
+    of them: a run reads the results of the golden queries instead of executing
+    them again. Changing any setup script or CSV changes the setup fingerprint
+    (see DB.setup_fingerprint) and so the keys, which invalidates the stored
+    results; they are evicted as
+    the least recently used entries of the store.
+
+    Only results of golden queries that succeeded are stored, and never those
+    of queries that call e.g. NOW() or RANDOM(), which differ on every run.
+    """
+
+    def __init__(self, cache: LocalCache):
+        self.cache = cache
+
+    def key(
+        self, db: Any, query_type: str, golden_sql: str, eval_query: Optional[str]
+    ) -> Optional[str]:
+        """Returns the key of a golden query on db, or None if it can't be stored."""
+        fingerprint = getattr(db, "setup_fingerprint", None)
+        if not fingerprint or not golden_sql:
+            return None
+        if _NONDETERMINISTIC.search(golden_sql) or (
+            eval_query and _NONDETERMINISTIC.search(eval_query)
+        ):
+            return None
+        fetch_policy = db.fetch_policy
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    db.db_type,
+                    fingerprint,
+                    query_type,
+                    golden_sql,
+                    eval_query,
+                    fetch_policy.max_rows,
+                    fetch_policy.max_bytes,
+                ]
+            ).encode()
+        ).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Tuple[Any, Any]]:
+        """Returns the result and eval result stored under key, if any."""
+        if key is None:
+            return None
+        try:
+            value = self.cache.get(key)
+        except Exception as e:
+            logging.warning(f"Failed to read the golden store: {e}")
+            value = None
+        CACHE_REQUESTS.inc(cache="golden", result="miss" if value is None else "hit")
+        return pickle.loads(value) if value is not None else None
+
+    def put(self, key: Optional[str], result: Any, eval_result: Any):
+        if key is None:
+            return
+        try:
+            self.cache.set(key, pickle.dumps((result, eval_result)))
+        except Exception as e:
+            logging.warning(f"Failed to write the golden store: {e}")
+
+
+def get_golden_store(config: dict) -> Optional[GoldenStore]:
+    """Returns the GoldenStore of a run config, if the run uses one."""
+    if not config.get("golden_store", False):
+        return None
+    return GoldenStore(
+        get_local_cache(
+            config.get("golden_store_path", DEFAULT_GOLDEN_STORE_PATH),
+            config.get("golden_store_max_bytes", DEFAULT_LOCAL_CACHE_MAX_BYTES),
+        )
+    )
@@ -5,7 +5,9 @@ from sqlalchemy.engine.base import Connection
 import logging
 from .db import DB
 from google.cloud.sql.connector import Connector
+from .resultset import ResultSet
 from .util import (
+    fetch_bounded,
     get_db_secret,
     with_cache_execute,
     DatabaseSchema,
@@ -19,6 +21,9 @@ CREATE DATABASE {DATABASE};
 USE {DATABASE};
 """
 
+GET_BASE_TABLES_SQL = "SHOW FULL TABLES WHERE Table_type = 'BASE TABLE';"
+GET_VIEWS_SQL = "SHOW FULL TABLES WHERE Table_type = 'VIEW';"
+
 DELETE_USER_QUERY = """
 DROP USER IF EXISTS "{USERNAME}"@"%";
 """
@@ -39,6 +44,13 @@ FLUSH PRIVILEGES;
 
 class MySQLDB(DB):
 
+    # Setup data is bulk loaded with the base executemany, which pymysql sends
+    # as multi-row VALUES batches.
+    backslash_escapes = True
+    # Tables are loaded one after the other: FOREIGN_KEY_CHECKS is a session
+    # setting, so foreign keys of the setup scripts are checked while loading.
+    parallel_table_loads = False
+
     #####################################################
     #####################################################
     # Database Connection Setup Logic
@@ -68,11 +80,13 @@ class MySQLDB(DB):
                 common_args["pool_size"] = 1
                 common_args["pool_recycle"] = 300
             else:
-                common_args["pool_size"] = 50
+                common_args["pool_size"] = self.pool_size
                 common_args["pool_recycle"] = 300
             return common_args
 
         self.engine = sqlalchemy.create_engine("mysql+pymysql://", **get_engine_args())
+        # CREATE TABLE statements of the tables of the last snapshot.
+        self._snapshot_tables: list[Tuple[str, str]] = []
 
     def close_connections(self):
         try:
@@ -90,13 +104,19 @@ class MySQLDB(DB):
     #####################################################
 
     def _execute_queries(self, connection: Connection, query: str) -> List:
-        result: List = []
+        result = ResultSet()
         for sub_query in sqlparse.split(query):
             if sub_query:
-                resultset = connection.execute(text(sub_query))
+                resultset = connection.execute(
+                    text(sub_query),
+                    execution_options={
+                        "stream_results": self.fetch_policy.stream_results
+                    },
+                )
                 if resultset.returns_rows:
-                    rows = resultset.fetchall()
-                    result.extend(r._asdict() for r in rows)
+                    fetch_bounded(
+                        resultset, resultset.keys(), self.fetch_policy, result
+                    )
         return result
 
     def batch_execute(self, commands: list[str]):
@@ -124,6 +144,8 @@ class MySQLDB(DB):
             self.engine.url,
             self._execute,
             self.cache_client,
+            self.setup_fingerprint,
+            self.backslash_escapes,
         )
 
     def _execute(
@@ -138,7 +160,7 @@ class MySQLDB(DB):
             eval_result: List = []
             error = None
             try:
-                with self.engine.connect() as connection:
+                with self._connect() as connection:
                     with connection.begin() as transaction:
                         result = self._execute_queries(connection, query)
 
@@ -161,9 +183,9 @@ class MySQLDB(DB):
             return rate_limit(
                 (query, eval_query, rollback),
                 _run_execute,
-                self.execs_per_minute,
-                self.semaphore,
+                self.rate_limiter,
                 self.max_attempts,
+                semaphore=self.semaphore,
             )
         except ResourceExhaustedError as e:
             logging.info(
@@ -175,7 +197,7 @@ class MySQLDB(DB):
         db_metadata = {}
 
         try:
-            with self.engine.connect() as connection:
+            with self._connect() as connection:
                 metadata = MetaData()
                 metadata.reflect(bind=connection, schema=self.db_name)
                 for table in metadata.tables.values():
@@ -218,27 +240,76 @@ class MySQLDB(DB):
         _, _, error = self.execute(f"DROP DATABASE {database_name};")
         if error:
             logging.info(f"Could not delete database: {error}")
+        # Snapshot taken by the DB of the tmp database, see create_snapshot.
+        self.execute(f"DROP DATABASE IF EXISTS `{database_name}_snapshot`;")
 
     def drop_all_tables(self):
         self.batch_execute(
             DROP_ALL_TABLES_QUERY.format(DATABASE=self.db_name).split(";")
         )
 
+    def create_snapshot(self) -> bool:
+        views, _, error = self.execute(GET_VIEWS_SQL)
+        if error:
+            raise RuntimeError(f"Could not list views: {error}")
+        if views:
+            # Views are not copied, snapshots only cover tables.
+            return False
+        tables, _, error = self.execute(GET_BASE_TABLES_SQL)
+        if error:
+            raise RuntimeError(f"Could not list tables: {error}")
+        snapshot_tables = []
+        for row in tables:
+            table = list(row.values())[0]
+            result, _, error = self.execute(f"SHOW CREATE TABLE `{table}`;")
+            if error:
+                raise RuntimeError(f"Could not read table {table}: {error}")
+            snapshot_tables.append((table, result[0]["Create Table"]))
+        snapshot_name = self._snapshot_name()
+        commands = [
+            f"DROP DATABASE IF EXISTS `{snapshot_name}`",
+            f"CREATE DATABASE `{snapshot_name}`",
+        ]
+        for table, _ in snapshot_tables:
+            commands.append(
+                f"CREATE TABLE `{snapshot_name}`.`{table}` LIKE `{self.db_name}`.`{table}`"
+            )
+            commands.append(
+                f"INSERT INTO `{snapshot_name}`.`{table}`"
+                + f" SELECT * FROM `{self.db_name}`.`{table}`"
+            )
+        self.batch_execute(commands)
+        self._snapshot_tables = snapshot_tables
+        return True
+
+    def restore_snapshot(self):
+        snapshot_name = self._snapshot_name()
+        # Recreating the database also drops whatever tables the DDL item added.
+        commands = DROP_ALL_TABLES_QUERY.format(DATABASE=self.db_name).split(";")
+        commands.append("SET FOREIGN_KEY_CHECKS = 0")
+        for table, create_table in self._snapshot_tables:
+            commands.append(create_table)
+            commands.append(
+                f"INSERT INTO `{self.db_name}`.`{table}`"
+                + f" SELECT * FROM `{snapshot_name}`.`{table}`"
+            )
+        commands.append("SET FOREIGN_KEY_CHECKS = 1")
+        try:
+            self.batch_execute(commands)
+        except RuntimeError as error:
+            raise RuntimeError(f"Could not restore snapshot: {error}")
+
     def insert_data(self, data: dict[str, List[str]], setup: Optional[List[str]] = None):
         if not data:
             return
-        insertion_statements = []
-        for table_name in data:
-            for row in data[table_name]:
-                inline_columns = ", ".join([f"{value}" for value in row])
-                insertion_statements.append(
-                    f"INSERT INTO `{table_name}` VALUES ({inline_columns});"
-                )
         try:
-            self.batch_execute(insertion_statements)
+            self._bulk_insert_data(data)
         except RuntimeError as error:
             raise RuntimeError(f"Could not insert data into database: {error}")
 
+    def _qualified_table_name(self, table: str) -> str:
+        return f"`{table}`"
+
     #####################################################
     #####################################################
     # Database User Management
@@ -1,3 +1,4 @@
+import io
 from sqlalchemy.pool import NullPool
 import sqlalchemy
 from sqlalchemy import text, MetaData
@@ -6,6 +7,7 @@ import logging
 from .db import DB
 from google.cloud.sql.connector import Connector
 from .util import (
+    fetch_bounded,
     get_db_secret,
     with_cache_execute,
     DatabaseSchema,
@@ -35,8 +37,22 @@ GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO {DML_USER
 """
 
 
+def _to_copy_csv(value) -> str:
+    """Formats a value for COPY ... WITH (FORMAT csv), where NULL is unquoted."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
 class PGDB(DB):
 
+    # Each table is loaded on a connection of its own.
+    parallel_table_loads = True
+
     #####################################################
     #####################################################
     # Database Connection Setup Logic
@@ -65,7 +81,7 @@ class PGDB(DB):
             if "is_tmp_db" in db_config:
                 common_args["poolclass"] = NullPool
             else:
-                common_args["pool_size"] = 50
+                common_args["pool_size"] = self.pool_size
                 common_args["pool_recycle"] = 300
             return common_args
 
@@ -109,6 +125,8 @@ class PGDB(DB):
             self.engine.url,
             self._execute,
             self.cache_client,
+            self.setup_fingerprint,
+            self.backslash_escapes,
         )
 
     def _execute(
@@ -119,18 +137,27 @@ class PGDB(DB):
             eval_result: List = []
             error = None
             try:
-                with self.engine.connect() as connection:
+                with self._connect() as connection:
                     with connection.begin() as transaction:
-                        resultset = connection.execute(text(query))
+                        options = {"stream_results": self.fetch_policy.stream_results}
+                        resultset = connection.execute(
+                            text(query), execution_options=options
+                        )
                         if resultset.returns_rows:
-                            rows = resultset.fetchall()
-                            result.extend(r._asdict() for r in rows)
+                            result = fetch_bounded(
+                                resultset, resultset.keys(), self.fetch_policy
+                            )
 
                         if eval_query:
-                            eval_resultset = connection.execute(text(eval_query))
+                            eval_resultset = connection.execute(
+                                text(eval_query), execution_options=options
+                            )
                             if eval_resultset.returns_rows:
-                                eval_rows = eval_resultset.fetchall()
-                                eval_result.extend(r._asdict() for r in eval_rows)
+                                eval_result = fetch_bounded(
+                                    eval_resultset,
+                                    eval_resultset.keys(),
+                                    self.fetch_policy,
+                                )
 
                         if rollback:
                             transaction.rollback()
@@ -144,9 +171,9 @@ class PGDB(DB):
             return rate_limit(
                 (query, eval_query, rollback),
                 _run_execute,
-                self.execs_per_minute,
-                self.semaphore,
+                self.rate_limiter,
                 self.max_attempts,
+                semaphore=self.semaphore,
             )
         except ResourceExhaustedError as e:
             logging.info(
@@ -158,7 +185,7 @@ class PGDB(DB):
         db_metadata = {}
 
         try:
-            with self.engine.connect() as connection:
+            with self._connect() as connection:
                 metadata = MetaData()
                 metadata.reflect(bind=connection, schema="public")
                 for table in metadata.tables.values():
@@ -201,6 +228,39 @@ class PGDB(DB):
         _, error = self._execute_auto_commit(f"DROP DATABASE {database_name};")
         if error:
             logging.info(f"Could not delete database: {error}")
+        # Snapshot taken by the DB of the tmp database, see create_snapshot.
+        self._execute_auto_commit(f"DROP DATABASE IF EXISTS {database_name}_snapshot;")
+
+    def create_snapshot(self) -> bool:
+        # Copying a database needs a connection to another one of the instance.
+        if self.admin_db is None:
+            return False
+        snapshot_name = self._snapshot_name()
+        # CREATE DATABASE ... TEMPLATE fails while the template has sessions.
+        self._drop_sessions()
+        for query in (
+            f"DROP DATABASE IF EXISTS {snapshot_name};",
+            f"CREATE DATABASE {snapshot_name} TEMPLATE {self.db_name};",
+        ):
+            _, error = self.admin_db._execute_auto_commit(query)
+            if error:
+                raise RuntimeError(f"Could not create snapshot: {error}")
+        return True
+
+    def restore_snapshot(self):
+        self._drop_sessions()
+        for query in (
+            f"DROP DATABASE IF EXISTS {self.db_name} WITH (FORCE);",
+            f"CREATE DATABASE {self.db_name} TEMPLATE {self._snapshot_name()};",
+        ):
+            _, error = self.admin_db._execute_auto_commit(query)
+            if error:
+                raise RuntimeError(f"Could not restore snapshot: {error}")
+
+    def _drop_sessions(self):
+        # Unlike close_connections, keeps the Connector open: a closed one can't
+        # connect again, and the database is used right after.
+        self.engine.dispose()
 
     def drop_all_tables(self):
         _, _, error = self.execute(DROP_ALL_TABLES_QUERY)
@@ -210,18 +270,31 @@ class PGDB(DB):
     def insert_data(self, data: dict[str, List[str]], setup: Optional[List[str]] = None):
         if not data:
             return
-        insertion_statements = []
-        for table_name in data:
-            for row in data[table_name]:
-                inline_columns = ", ".join([f"{value}" for value in row])
-                insertion_statements.append(
-                    f"INSERT INTO public.{table_name} VALUES ({inline_columns});"
-                )
         try:
-            self.batch_execute(insertion_statements)
+            self._bulk_insert_data(data)
         except RuntimeError as error:
             raise RuntimeError(f"Could not insert data into database: {error}")
 
+    def _qualified_table_name(self, table: str) -> str:
+        return f"public.{table}"
+
+    def _load_chunk(self, table: str, rows: list, columns: Optional[List[str]]):
+        """Streams the rows to the table with COPY FROM STDIN."""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_to_copy_csv(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        column_list = f" ({', '.join(columns)})" if columns else ""
+        with self._connect() as connection:
+            with connection.begin():
+                cursor = connection.connection.cursor()
+                cursor.execute(
+                    f"COPY {self._qualified_table_name(table)}{column_list}"
+                    + " FROM STDIN WITH (FORMAT csv)",
+                    stream=buffer,
+                )
+
     #####################################################
     #####################################################
     # Database User Management
@@ -0,0 +1,127 @@
+"""Compact, normalized representation of the rows of a query result."""
+
+import datetime
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+
+def normalize_value(value: Any) -> Any:
+    """Converts a value fetched from a driver into a plain comparable value.
+
+    Temporal values become their str(), which is how they are reported.
+    Everything else is returned as is; in particular Decimals stay Decimals,
+    as floats would make NUMERIC values that differ past about 15 significant
+    digits compare equal.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return str(value)
+    return value
+
+
+class ResultSet:
+    """The rows of a query result as tuples, with the column names kept once.
+
+    A ResultSet reads like the list of row dicts that results used to be:
+    iterating, indexing and comparing with a list go through dicts, built on the
+    fly. Comparators and reporters that know about ResultSets read columns and
+    rows directly instead. Values are normalized with normalize_value when the
+    rows are fetched.
+
+    A query with several statements can return rows with different columns, in
+    which case the columns are kept per row as well.
+
+    Attributes:
+      columns: The column names of the rows of the first statement.
+      rows: The rows.
+      total_row_count: Rows the query returned, including the ones that were
+        dropped by a FetchPolicy.
+      truncated: Whether rows were dropped.
+      total_row_count_capped: Whether counting the dropped rows stopped early,
+        see FetchPolicy.max_counted_rows, so total_row_count is a lower bound.
+      size_bytes: Estimated bytes of the rows kept.
+    """
+
+    def __init__(self, columns: Sequence[str] = (), rows: Optional[list] = None):
+        self.columns = tuple(columns)
+        self.rows: list[tuple] = rows if rows is not None else []
+        self.total_row_count = len(self.rows)
+        self.truncated = False
+        self.total_row_count_capped = False
+        self.size_bytes = 0
+        # Columns of each row, once rows with other columns were added.
+        self._row_columns: Optional[list[tuple]] = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "ResultSet":
+        result = cls()
+        for record in records:
+            result.append(tuple(record.keys()), tuple(record.values()))
+        result.total_row_count = len(result.rows)
+        return result
+
+    def append(self, columns: Tuple[str, ...], row: tuple):
+        """Adds a row; columns is usually the same tuple for all rows."""
+        if not self.rows and self._row_columns is None:
+            self.columns = columns
+        elif self._row_columns is None and columns != self.columns:
+            self._row_columns = [self.columns] * len(self.rows)
+        if self._row_columns is not None:
+            self._row_columns.append(columns)
+        self.rows.append(row)
+
+    def iter_rows(self) -> Iterator[Tuple[Tuple[str, ...], tuple]]:
+        """Yields the columns and the values of each row."""
+        if self._row_columns is None:
+            for row in self.rows:
+                yield self.columns, row
+        else:
+            yield from zip(self._row_columns, self.rows)
+
+    def tuples(self) -> list[tuple]:
+        """Returns the values of the rows, without the column names."""
+        return self.rows
+
+    def to_records(self, limit: Optional[int] = None) -> list[dict]:
+        """Returns the first limit rows (all by default) as dicts."""
+        records = []
+        for columns, row in self.iter_rows():
+            if limit is not None and len(records) >= limit:
+                break
+            records.append(dict(zip(columns, row)))
+        return records
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[dict]:
+        for columns, row in self.iter_rows():
+            yield dict(zip(columns, row))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            rows = self.rows[index]
+            if self._row_columns is None:
+                return [dict(zip(self.columns, row)) for row in rows]
+            return [
+                dict(zip(columns, row))
+                for columns, row in zip(self._row_columns[index], rows)
+            ]
+        columns = self.columns if self._row_columns is None else self._row_columns[index]
+        return dict(zip(columns, self.rows[index]))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ResultSet):
+            if (
+                self._row_columns is None
+                and other._row_columns is None
+                and self.columns == other.columns
+            ):
+                return self.rows == other.rows
+            return self.to_records() == other.to_records()
+        if isinstance(other, list):
+            return self.to_records() == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"ResultSet(columns={self.columns!r}, rows={len(self.rows)})"
@@ -0,0 +1,235 @@
+"""Pool of DB sessions with pinned, already-open connections."""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine.base import Connection
+
+from util.metrics import DB_SESSION_RECONNECTS, DB_SESSION_WAIT
+from .db import DB
+
+# Idle sessions are pinged on checkout once they were unused for this long.
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+# Upper bound of the connections opened at once while warming up a pool.
+_MAX_WARM_UP_WORKERS = 16
+
+
+class DBSession:
+    """A DB that runs its queries on a connection of its own.
+
+    The connection is opened when the session is created and stays open, so
+    checking out a session never pays the connect / auth cost. Queries run
+    through the shared DB with the connection pinned to the calling thread;
+    every other attribute is read from the shared DB.
+
+    Attributes:
+      db: The shared DB.
+      connection: The pinned connection, or None if the DB does not pin sessions
+        or the connection could not be reopened.
+      last_used: time.monotonic() of the last checkin.
+    """
+
+    def __init__(self, db: DB):
+        self.db = db
+        self.connection: Optional[Connection] = None
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db, name)
+
+    def connect(self):
+        if self.db.pin_sessions:
+            self.connection = self.db.connect_session()
+        self.last_used = time.monotonic()
+
+    def ping(self):
+        """Runs a trivial query on the connection; raises if it is broken."""
+        if self.connection is None:
+            return
+        self.connection.execute(text("SELECT 1"))
+        self.connection.rollback()
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.close()
+        except Exception as e:
+            logging.warning(f"Failed to close a DB session: {e}")
+        self.connection = None
+
+    def execute(
+        self,
+        query: str,
+        eval_query: Optional[str] = None,
+        use_cache=False,
+        rollback=False,
+    ) -> Tuple[Any, Any, Any]:
+        with self.db.pinned(self.connection):
+            return self.db.execute(query, eval_query, use_cache, rollback)
+
+    def batch_execute(self, commands: list[str]) -> None:
+        with self.db.pinned(self.connection):
+            return self.db.batch_execute(commands)
+
+    def get_metadata(self) -> dict:
+        with self.db.pinned(self.connection):
+            return self.db.get_metadata()
+
+    def close_connections(self):
+        self.close()
+        self.db.close_connections()
+
+
+class SessionPoolStats:
+    """Counters of a SessionPool.
+
+    Attributes:
+      size: Number of sessions of the pool.
+      in_use: Sessions checked out right now.
+      checkouts: Sessions checked out so far.
+      reconnects: Connections reopened after failing a health check.
+      total_wait_time: Seconds spent waiting for a free session.
+      max_wait_time: Longest wait for a free session, in seconds.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_use = 0
+        self.checkouts = 0
+        self.reconnects = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.total_wait_time / self.checkouts if self.checkouts else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "checkouts": self.checkouts,
+            "reconnects": self.reconnects,
+            "mean_wait_time": self.mean_wait_time,
+            "max_wait_time": self.max_wait_time,
+        }
+
+
+class SessionPool:
+    """Checkout / checkin pool of DBSessions of one DB.
+
+    The pool has the get / put interface of the queue.Queue of DBs that the
+    evaluators check DBs out of, so it can be used as a db_queue. All sessions
+    are connected up front (warm-up), and a session that was idle for longer than
+    health_check_interval is pinged on checkout and reconnected if it is broken.
+
+    Attributes:
+      db: The shared DB of the sessions.
+      health_check_interval: Idle seconds after which a session is pinged.
+    """
+
+    def __init__(
+        self,
+        db: DB,
+        size: int,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+    ):
+        self.db = db
+        self.health_check_interval = health_check_interval
+        self._idle: queue.Queue[DBSession] = queue.Queue()
+        self._stats = SessionPoolStats(size)
+        self._stats_lock = threading.Lock()
+
+        sessions = [DBSession(db) for _ in range(size)]
+        if db.pin_sessions and sessions:
+            try:
+                with ThreadPoolExecutor(
+                    max_workers=min(size, _MAX_WARM_UP_WORKERS)
+                ) as executor:
+                    list(executor.map(DBSession.connect, sessions))
+            except Exception:
+                for session in sessions:
+                    session.close()
+                raise
+        for session in sessions:
+            self._idle.put(session)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> DBSession:
+        """Checks out a session, waiting for one to be checked in if none is free."""
+        started_at = time.monotonic()
+        session = self._idle.get(block, timeout)
+        wait_time = time.monotonic() - started_at
+        DB_SESSION_WAIT.observe(wait_time, database=self.db.db_name)
+        with self._stats_lock:
+            self._stats.in_use += 1
+            self._stats.checkouts += 1
+            self._stats.total_wait_time += wait_time
+            self._stats.max_wait_time = max(self._stats.max_wait_time, wait_time)
+        self._check_health(session)
+        return session
+
+    def get_nowait(self) -> DBSession:
+        return self.get(block=False)
+
+    def put(
+        self, session: DBSession, block: bool = True, timeout: Optional[float] = None
+    ):
+        """Checks a session back in."""
+        session.last_used = time.monotonic()
+        with self._stats_lock:
+            self._stats.in_use -= 1
+        self._idle.put(session, block, timeout)
+
+    def put_nowait(self, session: DBSession):
+        self.put(session, block=False)
+
+    def empty(self) -> bool:
+        return self._idle.empty()
+
+    def qsize(self) -> int:
+        return self._idle.qsize()
+
+    def stats(self) -> SessionPoolStats:
+        with self._stats_lock:
+            stats = SessionPoolStats(self._stats.size)
+            stats.__dict__.update(self._stats.__dict__)
+        return stats
+
+    def close(self):
+        """Closes the idle sessions and the connections of the shared DB."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self.db.close_connections()
+
+    def _check_health(self, session: DBSession):
+        if not self.db.pin_sessions:
+            return
+        connection = session.connection
+        if connection is not None and not (connection.closed or connection.invalidated):
+            if time.monotonic() - session.last_used < self.health_check_interval:
+                return
+            try:
+                session.ping()
+                return
+            except Exception as e:
+                logging.info(f"Reconnecting a DB session of {self.db.db_name}: {e}")
+        session.close()
+        try:
+            session.connect()
+        except Exception as e:
+            # The session falls back to a new connection per query until the next
+            # checkout reconnects it.
+            logging.warning(f"Could not reconnect a DB session of {self.db.db_name}: {e}")
+            return
+        DB_SESSION_RECONNECTS.inc(database=self.db.db_name)
+        with self._stats_lock:
+            self._stats.reconnects += 1
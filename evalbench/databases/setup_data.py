@@ -0,0 +1,172 @@
+"""Lazy reader of the data CSVs of a database setup directory."""
+
+import csv
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Any, Iterator, List, Optional, Tuple
+
+from .util import BULK_LOAD_CHUNK_SIZE, chunked, parse_literal_rows
+
+DEFAULT_SETUP_CACHE_DIRECTORY = os.path.join(
+    tempfile.gettempdir(), "evalbench_setup_cache"
+)
+
+# SetupData of every data directory read so far, by absolute path.
+_SETUP_DATA: dict[Tuple[str, Optional[str]], "SetupData"] = {}
+_SETUP_DATA_LOCK = threading.Lock()
+_HASH_BLOCK_SIZE = 1024 * 1024
+# Version of the layout of the cached chunks, part of their cache keys.
+_CACHE_FORMAT = 2
+# Content hashes of the data CSVs hashed so far, by (path, mtime_ns, size).
+_FILE_HASHES: dict[Tuple[str, int, int], str] = {}
+_FILE_HASHES_LOCK = threading.Lock()
+
+
+class TableData:
+    """The rows of one data CSV, read lazily every time they are iterated.
+
+    Iterating yields the raw rows, lists of SQL literals. parsed_chunks yields
+    the rows parsed into Python values, which are cached on disk next to the
+    mtime and size of the CSV, so setting up the same data again only unpickles
+    them.
+    """
+
+    def __init__(self, path: str, cache_directory: Optional[str] = None):
+        self.path = path
+        self.cache_directory = cache_directory
+
+    def __iter__(self) -> Iterator[List[str]]:
+        with open(self.path, "r", newline="") as csvfile:
+            yield from csv.reader(csvfile)
+
+    def __repr__(self) -> str:
+        return f"TableData({self.path!r})"
+
+    def parsed_chunks(
+        self,
+        backslash_escapes: bool = False,
+        chunk_size: int = BULK_LOAD_CHUNK_SIZE,
+    ) -> Iterator[list]:
+        """Yields the parsed rows per chunk of up to chunk_size rows.
+
+        Rows that are not plain literals (see parse_sql_literal) are kept raw, as
+        UnparsedRows in their position, to be inserted as SQL.
+        """
+        cache_path = self._cache_path(backslash_escapes, chunk_size)
+        if cache_path and os.path.exists(cache_path):
+            yield from _read_chunks(cache_path)
+            return
+        if not cache_path:
+            yield from self._parse_chunks(backslash_escapes, chunk_size)
+            return
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        try:
+            with os.fdopen(fd, "wb") as cache_file:
+                for chunk in self._parse_chunks(backslash_escapes, chunk_size):
+                    pickle.dump(chunk, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield chunk
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def parsed_rows(self, backslash_escapes: bool = False):
+        """Yields the parsed rows one by one, see parse_literal_rows."""
+        for chunk in self.parsed_chunks(backslash_escapes):
+            yield from chunk
+
+    def _parse_chunks(self, backslash_escapes: bool, chunk_size: int):
+        for rows in chunked(self, chunk_size):
+            yield list(parse_literal_rows(rows, backslash_escapes))
+
+    def _cache_path(self, backslash_escapes: bool, chunk_size: int) -> Optional[str]:
+        if not self.cache_directory:
+            return None
+        stat = os.stat(self.path)
+        key = hashlib.sha256(
+            f"{os.path.abspath(self.path)}:{stat.st_mtime_ns}:{stat.st_size}"
+            f":{backslash_escapes}:{chunk_size}:{_CACHE_FORMAT}".encode()
+        ).hexdigest()
+        return os.path.join(self.cache_directory, f"{key}.pickle")
+
+
+class SetupData(Mapping):
+    """Maps the table names of a data directory to their lazy TableData."""
+
+    def __init__(self, data_directory: str, cache_directory: Optional[str] = None):
+        self.data_directory = data_directory
+        self._tables: dict[str, TableData] = {}
+        if os.path.isdir(data_directory):
+            for filename in sorted(os.listdir(data_directory)):
+                if filename.endswith(".csv"):
+                    self._tables[filename[:-4]] = TableData(
+                        os.path.join(data_directory, filename), cache_directory
+                    )
+
+    def __getitem__(self, table_name: str) -> TableData:
+        return self._tables[table_name]
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+
+def get_setup_data(
+    data_directory: str, cache_directory: Optional[str] = DEFAULT_SETUP_CACHE_DIRECTORY
+) -> SetupData:
+    """Returns the SetupData of a directory, listed once per process."""
+    key = (os.path.abspath(data_directory), cache_directory)
+    with _SETUP_DATA_LOCK:
+        setup_data = _SETUP_DATA.get(key)
+        if setup_data is None:
+            setup_data = SetupData(data_directory, cache_directory)
+            _SETUP_DATA[key] = setup_data
+        return setup_data
+
+
+def setup_fingerprint(setup_scripts: Any, data: Optional[Mapping]) -> str:
+    """Hashes the setup scripts and the data that seed a database.
+
+    The data CSVs are hashed by content, once per version of each file, so the
+    fingerprint changes with any of them, whatever their timestamps say.
+    """
+    digest = hashlib.sha256(repr(setup_scripts).encode())
+    for table_name, rows in sorted((data or {}).items()):
+        if isinstance(rows, TableData):
+            table_hash = _file_hash(rows.path)
+        else:
+            table_hash = hashlib.sha256(repr(list(rows)).encode()).hexdigest()
+        digest.update(f"\n{table_name}:{table_hash}".encode())
+    return digest.hexdigest()
+
+
+def _file_hash(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _FILE_HASHES_LOCK:
+        file_hash = _FILE_HASHES.get(key)
+    if file_hash is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        file_hash = digest.hexdigest()
+        with _FILE_HASHES_LOCK:
+            _FILE_HASHES[key] = file_hash
+    return file_hash
+
+
+def _read_chunks(cache_path: str) -> Iterator[list]:
+    with open(cache_path, "rb") as cache_file:
+        while True:
+            try:
+                yield pickle.load(cache_file)
+            except EOFError:
+                return
@@ -1,13 +1,18 @@
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, SingletonThreadPool, StaticPool
 import sqlalchemy
 from sqlalchemy import text, MetaData
 from sqlalchemy.engine.base import Connection
 import logging
 import sqlite3
 import os
+import contextlib
+from urllib.parse import quote
+from contextlib import closing
 import sqlparse
 from .db import DB
+from .resultset import ResultSet
 from .util import (
+    fetch_bounded,
     with_cache_execute,
     DatabaseSchema,
 )
@@ -17,6 +22,14 @@ from typing import Any, List, Optional, Tuple
 DROP_TABLE_SQL = "DROP TABLE {TABLE};"
 GET_TABLES_SQL = "SELECT name FROM sqlite_schema WHERE type='table';"
 
+# Pragmas of read-only connections: map the file into memory, keep more pages
+# cached and reject writes.
+READ_ONLY_PRAGMAS = [
+    "PRAGMA mmap_size = 268435456;",
+    "PRAGMA cache_size = -65536;",
+    "PRAGMA query_only = 1;",
+]
+
 
 class SQLiteDB(DB):
 
@@ -28,14 +41,48 @@ class SQLiteDB(DB):
 
     def __init__(self, db_config):
         super().__init__(db_config)
+        # Evaluate on in-memory copies of the database file: every pooled session
+        # gets its own clone, and tmp DDL databases live in memory only.
+        self.in_memory = db_config.get("in_memory", False)
+        self._memory_connection: Optional[sqlite3.Connection] = None
+        # Open the file read-only and immutable, e.g. for DQL. SQLite then skips
+        # locking altogether, so the file must not change while connected.
+        self.read_only = db_config.get("read_only", False)
 
         def get_conn():
             path = self._get_connection_path(self.db_path, self.db_name)
+            if self.read_only:
+                return get_read_only_conn(path)
             os.makedirs(os.path.dirname(path), exist_ok=True)
-            conn = sqlite3.connect(path)
+            # Sessions open their connection on one thread and run on others.
+            conn = sqlite3.connect(path, check_same_thread=False)
             return conn
 
+        def get_read_only_conn(path):
+            conn = sqlite3.connect(
+                f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1",
+                uri=True,
+                check_same_thread=False,
+            )
+            for pragma in READ_ONLY_PRAGMAS:
+                conn.execute(pragma)
+            return conn
+
+        def get_clone():
+            clone = sqlite3.connect(":memory:", check_same_thread=False)
+            with closing(get_conn()) as source:
+                source.backup(clone)
+            return clone
+
         def get_engine_args():
+            if self.read_only:
+                # Keep one connection per thread instead of reopening the file.
+                return {
+                    "creator": get_conn,
+                    "echo": False,
+                    "poolclass": SingletonThreadPool,
+                    "pool_size": self.pool_size,
+                }
             return {
                 "creator": get_conn,
                 "connect_args": {"timeout": 60},
@@ -43,9 +90,43 @@ class SQLiteDB(DB):
                 "poolclass": NullPool,
             }
 
-        self.engine = sqlalchemy.create_engine("sqlite:///", **get_engine_args())
+        if self.in_memory and "is_tmp_db" in db_config:
+            # A single connection holds the database, so it must never close.
+            self._memory_connection = sqlite3.connect(
+                ":memory:", check_same_thread=False
+            )
+            self.engine = sqlalchemy.create_engine(
+                "sqlite://",
+                creator=lambda: self._memory_connection,
+                poolclass=StaticPool,
+            )
+        else:
+            self.engine = sqlalchemy.create_engine("sqlite:///", **get_engine_args())
+        if self.in_memory:
+            self._clone_engine = sqlalchemy.create_engine(
+                "sqlite://", creator=get_clone, poolclass=NullPool
+            )
+        if self.read_only:
+            # Pinned session connections are dedicated, not the thread's one.
+            self._session_engine = sqlalchemy.create_engine(
+                "sqlite://", creator=get_conn, poolclass=NullPool
+            )
+        # In-memory copy of the database taken by create_snapshot.
+        self._snapshot: Optional[sqlite3.Connection] = None
+
+    def connect_session(self) -> Connection:
+        if self.in_memory and self._memory_connection is None:
+            return self._clone_engine.connect()
+        if self.read_only:
+            return self._session_engine.connect()
+        return self.engine.connect()
 
     def close_connections(self):
+        if self._memory_connection is not None:
+            # Disposing the StaticPool would close the connection that holds the
+            # database, and the DB is reused after e.g. a session health check.
+            # The database is freed along with the DB instead.
+            return
         try:
             self.engine.dispose()
         except Exception as e:
@@ -60,13 +141,19 @@ class SQLiteDB(DB):
     #####################################################
 
     def _execute_queries(self, connection: Connection, query: str) -> List:
-        result: List = []
+        result = ResultSet()
         for sub_query in sqlparse.split(query):
             if sub_query:
-                resultset = connection.execute(text(sub_query))
+                resultset = connection.execute(
+                    text(sub_query),
+                    execution_options={
+                        "stream_results": self.fetch_policy.stream_results
+                    },
+                )
                 if resultset.returns_rows:
-                    rows = resultset.fetchall()
-                    result.extend(r._asdict() for r in rows)
+                    fetch_bounded(
+                        resultset, resultset.keys(), self.fetch_policy, result
+                    )
         return result
 
     def batch_execute(self, commands: list[str]):
@@ -94,6 +181,8 @@ class SQLiteDB(DB):
             self.db_name,
             self._execute,
             self.cache_client,
+            self.setup_fingerprint,
+            self.backslash_escapes,
         )
 
     def _execute(
@@ -108,7 +197,7 @@ class SQLiteDB(DB):
             eval_result: List = []
             error = None
             try:
-                with self.engine.connect() as connection:
+                with self._connect() as connection:
                     with connection.begin() as transaction:
                         result = self._execute_queries(connection, query)
 
@@ -137,9 +226,9 @@ class SQLiteDB(DB):
             return rate_limit(
                 (query, eval_query, rollback),
                 _run_execute,
-                self.execs_per_minute,
-                self.semaphore,
+                self.rate_limiter,
                 self.max_attempts,
+                semaphore=self.semaphore,
             )
         except ResourceExhaustedError as e:
             logging.info(
@@ -151,7 +240,7 @@ class SQLiteDB(DB):
         db_metadata = {}
 
         try:
-            with self.engine.connect() as connection:
+            with self._connect() as connection:
                 metadata = MetaData()
                 metadata.reflect(bind=connection)
                 for table in metadata.tables.values():
@@ -183,6 +272,10 @@ class SQLiteDB(DB):
         return create_statements
 
     def create_tmp_database(self, database_name: str):
+        if self.in_memory:
+            # The DB of the tmp database keeps it in memory, see __init__.
+            self.tmp_dbs.append(database_name)
+            return
         try:
             db_path = self._get_connection_path(self.db_path, database_name)
             open(db_path, "a").close()
@@ -214,21 +307,46 @@ class SQLiteDB(DB):
         except Exception as error:
             logging.error(f"Failed to drop all tables: {error}")
 
+    def create_snapshot(self) -> bool:
+        snapshot = sqlite3.connect(":memory:", check_same_thread=False)
+        with self._database_connection() as source:
+            source.backup(snapshot)
+        if self._snapshot is not None:
+            self._snapshot.close()
+        self._snapshot = snapshot
+        return True
+
+    def restore_snapshot(self):
+        if self._snapshot is None:
+            raise RuntimeError(f"No snapshot of {self.db_name} to restore.")
+        try:
+            # The backup API copies all pages at once, replacing the database.
+            with self._database_connection() as target:
+                self._snapshot.backup(target)
+        except sqlite3.Error as error:
+            raise RuntimeError(f"Could not restore snapshot: {error}")
+
+    @contextlib.contextmanager
+    def _database_connection(self):
+        """Yields a sqlite3 connection to the database, in memory or on disk."""
+        if self._memory_connection is not None:
+            yield self._memory_connection
+            return
+        path = self._get_connection_path(self.db_path, self.db_name)
+        with closing(sqlite3.connect(path, timeout=60)) as connection:
+            yield connection
+
     def insert_data(self, data: dict[str, List[str]], setup: Optional[List[str]] = None):
         if not data:
             return
-        insertion_statements = []
-        for table_name in data:
-            for row in data[table_name]:
-                inline_columns = ", ".join([f"{value}" for value in row])
-                insertion_statements.append(
-                    f"INSERT INTO `{table_name}` VALUES ({inline_columns});"
-                )
         try:
-            self.batch_execute(insertion_statements)
+            self._bulk_insert_data(data)
         except RuntimeError as error:
             raise RuntimeError(f"Could not insert data into database: {error}")
 
+    def _qualified_table_name(self, table: str) -> str:
+        return f"`{table}`"
+
     #####################################################
     #####################################################
     # Database User Management
@@ -6,7 +6,10 @@ import logging
 import sqlparse
 from .db import DB
 from google.cloud.sql.connector import Connector
+from .resultset import ResultSet
 from .util import (
+    fetch_bounded,
+    chunked,
     get_db_secret,
     with_cache_execute,
     DatabaseSchema,
@@ -43,6 +46,9 @@ GRANT SELECT, INSERT, UPDATE, DELETE ON DATABASE::{DATABASE} TO [{DML_USERNAME}]
 
 class SQLServerDB(DB):
 
+    # Each table is loaded on a connection of its own.
+    parallel_table_loads = True
+
     #####################################################
     #####################################################
     # Database Connection Setup Logic
@@ -74,7 +80,7 @@ class SQLServerDB(DB):
             if "is_tmp_db" in db_config:
                 common_args["poolclass"] = NullPool
             else:
-                common_args["pool_size"] = 50
+                common_args["pool_size"] = self.pool_size
                 common_args["pool_recycle"] = 300
             return common_args
 
@@ -96,13 +102,19 @@ class SQLServerDB(DB):
     #####################################################
 
     def _execute_queries(self, connection: Connection, query: str) -> List:
-        result: List = []
+        result = ResultSet()
         for sub_query in sqlparse.split(query):
             if sub_query:
-                resultset = connection.execute(text(sub_query))
+                resultset = connection.execute(
+                    text(sub_query),
+                    execution_options={
+                        "stream_results": self.fetch_policy.stream_results
+                    },
+                )
                 if resultset.returns_rows:
-                    rows = resultset.fetchall()
-                    result.extend(r._asdict() for r in rows)
+                    fetch_bounded(
+                        resultset, resultset.keys(), self.fetch_policy, result
+                    )
         return result
 
     def batch_execute(self, commands: list[str]):
@@ -126,6 +138,8 @@ class SQLServerDB(DB):
             self.engine.url,
             self._execute,
             self.cache_client,
+            self.setup_fingerprint,
+            self.backslash_escapes,
         )
 
     def _execute(
@@ -139,7 +153,7 @@ class SQLServerDB(DB):
             eval_result: List = []
             error = None
             try:
-                with self.engine.connect() as connection:
+                with self._connect() as connection:
                     with connection.begin() as transaction:
                         result = self._execute_queries(connection, query)
 
@@ -158,9 +172,9 @@ class SQLServerDB(DB):
             return rate_limit(
                 (query, eval_query, rollback),
                 _run_execute,
-                self.execs_per_minute,
-                self.semaphore,
+                self.rate_limiter,
                 self.max_attempts,
+                semaphore=self.semaphore,
             )
         except ResourceExhaustedError as e:
             logging.info(
@@ -172,7 +186,7 @@ class SQLServerDB(DB):
         db_metadata = {}
 
         try:
-            with self.engine.connect() as connection:
+            with self._connect() as connection:
                 metadata = MetaData()
                 metadata.reflect(bind=connection, schema="dbo")
                 for table in metadata.tables.values():
@@ -226,29 +240,39 @@ class SQLServerDB(DB):
     def insert_data(self, data: dict[str, List[str]], setup: Optional[List[str]] = None):
         if not data:
             return
-
-        insertion_statements = []
-        for table_name in data:
-            for row in data[table_name]:
-                formatted_values = []
-                for value in row:
-                    if str(value).lower() in ["true", "false"]:
-                        formatted_values.append(
-                            "1" if str(value).lower() == "true" else "0"
-                        )
-                    else:
-                        formatted_values.append(str(value))
-
-                inline_values = ", ".join(formatted_values)
-                insertion_statements.append(
-                    f"INSERT INTO dbo.{table_name} VALUES ({inline_values});"
-                )
-
         try:
-            self.batch_execute(insertion_statements)
+            self._bulk_insert_data(data)
         except RuntimeError as error:
             raise RuntimeError(f"Could not insert data into database: {error}")
 
+    def _qualified_table_name(self, table: str) -> str:
+        return f"dbo.{table}"
+
+    def _insert_statement(self, table: str, row) -> str:
+        formatted_values = []
+        for value in row:
+            if str(value).lower() in ["true", "false"]:
+                formatted_values.append("1" if str(value).lower() == "true" else "0")
+            else:
+                formatted_values.append(str(value))
+        inline_values = ", ".join(formatted_values)
+        return f"INSERT INTO dbo.{table} VALUES ({inline_values});"
+
+    def _load_chunk(self, table: str, rows: list, columns: Optional[List[str]]):
+        """Inserts the rows with multi-row VALUES statements.
+
+        pytds runs executemany one row at a time, so rows are batched into
+        statements of up to 1000 rows and 2100 parameters, SQL Server's limits.
+        """
+        rows_per_statement = max(1, min(1000, 2000 // max(1, len(rows[0]))))
+        with self._connect() as connection:
+            with connection.begin():
+                for statement_rows in chunked(rows, rows_per_statement):
+                    statement, params = self._multi_row_insert(
+                        table, statement_rows, columns
+                    )
+                    connection.execute(text(statement), params)
+
     #####################################################
     #####################################################
     # Database User Management
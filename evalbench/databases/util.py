@@ -1,12 +1,39 @@
 from google.cloud import secretmanager_v1
-from typing import Any, Tuple
-import sqlparse
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
 import logging
+import functools
 import hashlib
 import pickle
 import redis
 import re
 from dataclasses import dataclass, field
+from util.cache import (
+    DEFAULT_LOCAL_CACHE_MAX_BYTES,
+    DEFAULT_LOCAL_CACHE_PATH,
+    CacheClient,
+    get_local_cache,
+)
+from util.metrics import CACHE_REQUESTS
+from .resultset import ResultSet, normalize_value
+
+
+# Rows that bulk_load sends to the database per statement / transaction.
+BULK_LOAD_CHUNK_SIZE = 1000
+# Tmp databases created, and tables loaded, at once while setting up.
+SETUP_PARALLELISM = 4
+
+# Caps of the rows of a single query that are kept in memory, see FetchPolicy.
+DEFAULT_MAX_RESULT_ROWS = 100_000
+DEFAULT_MAX_RESULT_BYTES = 64 * 1024 * 1024
+# Rows of a single query that are counted at most, kept or not, so that a
+# runaway result (e.g. a Cartesian join) is not read to its end.
+DEFAULT_MAX_COUNTED_ROWS = 1_000_000
+# Estimated bytes of a row and of a value on top of the bytes of strings.
+_ROW_OVERHEAD_BYTES = 64
+_VALUE_OVERHEAD_BYTES = 16
+
+_INTEGER_LITERAL = re.compile(r"[+-]?\d+")
+_NUMBER_LITERAL = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
 
 
 @dataclass
@@ -36,6 +63,35 @@ class DatabaseSchema:
     views: list[View] = field(default_factory=list)
 
 
+@dataclass
+class FetchPolicy:
+    """How much of the result of a query is fetched into memory.
+
+    Attributes:
+      max_rows: Rows kept per query; later rows are only counted.
+      max_bytes: Estimated bytes of the rows kept per query.
+      max_counted_rows: Rows counted per query; fetching stops there, and the
+        count of the result is only a lower bound.
+      stream_results: Fetch through server-side cursors where the driver
+        supports them, so rows that are dropped are never buffered.
+    """
+
+    max_rows: int = DEFAULT_MAX_RESULT_ROWS
+    max_bytes: int = DEFAULT_MAX_RESULT_BYTES
+    max_counted_rows: int = DEFAULT_MAX_COUNTED_ROWS
+    stream_results: bool = True
+
+    @classmethod
+    def from_config(cls, db_config: dict) -> "FetchPolicy":
+        return cls(
+            max_rows=db_config.get("max_result_rows") or DEFAULT_MAX_RESULT_ROWS,
+            max_bytes=db_config.get("max_result_bytes") or DEFAULT_MAX_RESULT_BYTES,
+            max_counted_rows=db_config.get("max_counted_rows")
+            or DEFAULT_MAX_COUNTED_ROWS,
+            stream_results=db_config.get("stream_results", True),
+        )
+
+
 def _is_db_secret_path(secret: str) -> bool:
     pattern = r"^projects/[^/]+/secrets/[^/]+/versions/\d+$"
     return bool(re.match(pattern, secret))
@@ -94,29 +150,115 @@ def generate_ddl(data, db_name, comments_data=None):
     return "".join(ddl_statements)
 
 
+# Words that are upper-cased in canonical queries. Other words are kept as
+# written, as identifiers can be case-sensitive (e.g. table names in MySQL and
+# BigQuery). These words are reserved in PostgreSQL, MySQL and BigQuery alike,
+# so they are never unquoted identifiers there; SQLite, which allows some of
+# them as identifiers, does not tell identifiers apart by case.
+_SQL_KEYWORDS = frozenset(
+    """
+    ALL AND AS ASC CASE CREATE CROSS DESC DISTINCT ELSE EXCEPT FALSE FETCH FROM
+    GROUP HAVING IN INNER INTERSECT INTO IS JOIN LEFT LIKE LIMIT NOT NULL ON OR
+    ORDER OUTER RIGHT SELECT THEN TRUE UNION USING WHEN WHERE WITH
+    """.split()
+)
+_QUOTED_TOKEN = {
+    # Standard SQL: quotes are escaped by doubling them.
+    False: r"'(?:[^']|'')*'",
+    True: r"'(?:[^'\\]|''|\\.)*'",
+}
+# PostgreSQL strings that are kept verbatim whatever the dialect: escape strings
+# (E'...', always with backslash escapes) and dollar-quoted strings ($$...$$,
+# $tag$...$tag$).
+_PG_STRING_TOKEN = (
+    r"[Ee]'(?:[^'\\]|''|\\.)*'"
+    r"|\$(?P<dollar_tag>(?:[A-Za-z_][A-Za-z0-9_]*)?)\$.*?\$(?P=dollar_tag)\$"
+)
+_SQL_TOKENS = {
+    backslash_escapes: re.compile(
+        rf"(?P<literal>{_PG_STRING_TOKEN}|{quoted}|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])"
+        r"|(?P<comment>--[^\n]*|/\*.*?\*/)"
+        r"|(?P<space>\s+)"
+        r"|(?P<word>[A-Za-z0-9_][A-Za-z0-9_$]*)"
+        r"|(?P<other>.)",
+        re.DOTALL,
+    )
+    for backslash_escapes, quoted in _QUOTED_TOKEN.items()
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def canonicalize_sql(query: str, backslash_escapes: bool = False) -> str:
+    """Returns a canonical form of query, for cache keys.
+
+    Comments are dropped, keywords are upper-cased, trailing semicolons are
+    removed and whitespace is only kept, as one space, between words and
+    literals, so that queries that only differ in formatting share a key.
+    Literals and quoted identifiers are kept verbatim, as results depend on
+    them. Memoized, as the same queries are cached over and over.
+    """
+    parts: list[str] = []
+    previous_kind = None
+    pending_space = False
+    for match in _SQL_TOKENS[backslash_escapes].finditer(query):
+        kind = match.lastgroup
+        token = match.group()
+        if kind in ("space", "comment"):
+            pending_space = True
+            continue
+        if kind == "word" and token.upper() in _SQL_KEYWORDS:
+            token = token.upper()
+        if (
+            pending_space
+            and kind in ("word", "literal")
+            and previous_kind in ("word", "literal")
+        ):
+            parts.append(" ")
+        parts.append(token)
+        previous_kind = kind
+        pending_space = False
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return "".join(parts)
+
+
 def with_cache_execute(
     query: str,
     engine_url,
     execution_method,
     cache_client: Any,
+    setup_fingerprint: Optional[str] = None,
+    backslash_escapes: bool = False,
 ) -> Tuple[Any, Any, Any]:
-    try:
-        # Format the query for consistency
-        query = sqlparse.format(query, reindent=True, keyword_case="upper")
-    except Exception as e:
-        logging.warning(f"Failed to format query: {query} with error: {e}")
+    """Executes query, or returns its result from the cache.
 
-    # Generate a hash of the query and database URL
-    query_hash = hashlib.sha256((query + str(engine_url)).encode()).hexdigest()
+    Results are keyed by the canonical query, the database and the fingerprint
+    of the setup the database was seeded with, so re-seeding the database with
+    other data never serves stale results. Without a fingerprint nothing tells
+    when the contents of the database change, so the query is always executed.
+    """
+    if not setup_fingerprint:
+        return execution_method(query)
+    query_hash = hashlib.sha256(
+        "\n".join(
+            (
+                canonicalize_sql(query, backslash_escapes),
+                str(engine_url),
+                setup_fingerprint,
+            )
+        ).encode()
+    ).hexdigest()
 
     # Attempt to retrieve from cache
     try:
         cached_result = cache_client.get(query_hash)
         if cached_result:
             logging.debug(f"Using cached result for query: {query}")
+            CACHE_REQUESTS.inc(cache="query", result="hit")
             return pickle.loads(cached_result), None, None
     except Exception as e:
         logging.warning(f"Failed to retrieve query from cache: {e}")
+    CACHE_REQUESTS.inc(cache="query", result="miss")
 
     # Execute the query using the internal execute method
     result, _, error = execution_method(query)
@@ -132,15 +274,31 @@ def with_cache_execute(
     return result, None, error
 
 
-def get_cache_client(config):
+def get_cache_client(config) -> Optional[CacheClient]:
+    """Returns the cache of query / LLM results that config asks for, if any.
+
+    cache_backend "redis" (the default when redis_host is set) connects to
+    Redis; "local" uses the process-wide LocalCache of local_cache_path, which
+    needs no server and persists across runs.
+    """
+    cache_backend = config.get(
+        "cache_backend", "redis" if config.get("redis_host", None) else None
+    )
+    if cache_backend == "local":
+        return get_local_cache(
+            config.get("local_cache_path", DEFAULT_LOCAL_CACHE_PATH),
+            config.get("local_cache_max_bytes", DEFAULT_LOCAL_CACHE_MAX_BYTES),
+            config.get("local_cache_ttl", None),
+        )
     cache_client = None
-    if config.get("redis_host", None):
+    if cache_backend == "redis" and config.get("redis_host", None):
         try:
             redis_host = config["redis_host"]
             redis_port = config.get("redis_port", 6379)
             redis_db_id = config.get("redis_db_id", 0)
             logging.info(
-                f"Found Redis config in db_config. redis_host: {redis_host} redis_port: {redis_port} redis_db_id: {redis_db_id}"
+                f"Found Redis config in db_config. redis_host: {redis_host} "
+                f"redis_port: {redis_port} redis_db_id: {redis_db_id}"
             )
             cache_client = redis.StrictRedis(
                 host=redis_host, port=redis_port, db=redis_db_id
@@ -149,4 +307,133 @@ def get_cache_client(config):
             logging.warning(
                 f"redis_host is found in db_config but failed to connect: {e}"
             )
+    elif cache_backend is not None:
+        logging.warning(f"Unknown cache_backend {cache_backend}, not caching.")
     return cache_client
+
+
+def parse_sql_literal(value: str, backslash_escapes: bool = False) -> Any:
+    """Parses a SQL literal of a setup data CSV into a Python value.
+
+    Handles quoted strings ('' escapes a quote), NULL, TRUE / FALSE and numbers,
+    which is what the setup CSVs contain. Raises ValueError for anything else,
+    e.g. function calls, which have to be inserted as SQL instead.
+
+    Args:
+      value: The literal, e.g. 'O''Brien' or 42.
+      backslash_escapes: Whether the database interprets backslashes in string
+        literals (MySQL), in which case strings with backslashes raise too.
+    """
+    literal = value.strip()
+    if len(literal) >= 2 and literal[0] == "'" and literal[-1] == "'":
+        body = literal[1:-1]
+        if "'" in body.replace("''", "") or (backslash_escapes and "\\" in body):
+            raise ValueError(f"Unsupported string literal {value}")
+        return body.replace("''", "'")
+    keyword = literal.upper()
+    if keyword == "NULL":
+        return None
+    if keyword in ("TRUE", "FALSE"):
+        return keyword == "TRUE"
+    if _INTEGER_LITERAL.fullmatch(literal):
+        return int(literal)
+    if _NUMBER_LITERAL.fullmatch(literal):
+        return float(literal)
+    raise ValueError(f"Unsupported SQL literal {value}")
+
+
+class UnparsedRow(tuple):
+    """A raw row of SQL literals that parse_sql_literal cannot parse.
+
+    E.g. a row with a function call, which has to be inserted as SQL.
+    """
+
+
+def parse_literal_rows(
+    rows: Iterable[Sequence[str]],
+    backslash_escapes: bool = False,
+) -> Iterator[tuple]:
+    """Lazily parses rows of SQL literals, see parse_sql_literal.
+
+    Rows with a value that cannot be parsed are yielded raw, as UnparsedRows, in
+    their position among the other rows.
+    """
+    for row in rows:
+        try:
+            yield tuple(parse_sql_literal(value, backslash_escapes) for value in row)
+        except ValueError:
+            yield UnparsedRow(row)
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[list]:
+    """Yields lists of up to size consecutive items of iterable."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def fetch_bounded(
+    rows: Iterable[Any],
+    columns: Sequence[str],
+    policy: FetchPolicy,
+    into: Optional[ResultSet] = None,
+    to_tuple: Callable[[Any], tuple] = tuple,
+    total_row_count: Optional[int] = None,
+) -> ResultSet:
+    """Adds rows to a ResultSet until the caps of policy are hit.
+
+    Rows past the caps are iterated to count them, without converting them,
+    unless total_row_count gives their number up front. Counting stops at
+    policy.max_counted_rows, closing rows, and flags the count as a lower bound.
+
+    Args:
+      rows: The rows, e.g. a streamed SQLAlchemy result.
+      columns: The column names of the rows.
+      policy: The caps.
+      into: ResultSet to add the rows to, e.g. of previous statements of the
+        same query, which share the caps. Defaults to a new ResultSet.
+      to_tuple: Converts a row to the tuple of its values.
+      total_row_count: The number of rows, if the driver knows it.
+    """
+    result = into if into is not None else ResultSet()
+    columns = tuple(columns)
+    if not result.rows and not result.columns:
+        # Keep the columns of results without rows too.
+        result.columns = columns
+    counted = 0
+    count_limit = policy.max_counted_rows - result.total_row_count
+    for row in rows:
+        counted += 1
+        if result.truncated:
+            if total_row_count is None and counted < count_limit:
+                continue
+            if total_row_count is None:
+                result.total_row_count_capped = True
+            # Discards the rows the driver did not send yet, where it can.
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+            break
+        values = tuple(normalize_value(value) for value in to_tuple(row))
+        size = _estimate_size(values)
+        if len(result) >= policy.max_rows or result.size_bytes + size > policy.max_bytes:
+            result.truncated = True
+            continue
+        result.append(columns, values)
+        result.size_bytes += size
+    result.total_row_count += counted if total_row_count is None else total_row_count
+    return result
+
+
+def _estimate_size(values: tuple) -> int:
+    size = _ROW_OVERHEAD_BYTES
+    for value in values:
+        size += _VALUE_OVERHEAD_BYTES
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+    return size
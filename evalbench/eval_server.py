@@ -8,6 +8,10 @@ from absl import flags
 from absl import logging
 import grpc
 import util
+from mp.fairexecutor import shutdown_stage_executors
+from mp.mprunner import RUNNER_POOL
+from mp.processpool import shutdown_process_pools
+from util.metrics import serve_metrics
 from eval_service import EvalServicer
 from eval_service import SessionManagerInterceptor
 from evalproto import eval_service_pb2_grpc
@@ -19,6 +23,13 @@ _LOCALHOST = flags.DEFINE_bool(
     " for local testing.",
 )
 
+_METRICS_PORT = flags.DEFINE_integer(
+    "metrics_port",
+    None,
+    "If set, serves the metrics in the Prometheus text format at /metrics on"
+    " this port.",
+)
+
 _cleanup_coroutines = []
 
 
@@ -56,6 +67,9 @@ async def _serve():
 def main(argv: Sequence[str]) -> None:
     if len(argv) > 1:
         raise app.UsageError("Too many command-line arguments.")
+    if _METRICS_PORT.value:
+        serve_metrics(_METRICS_PORT.value)
+        logging.info(f"Serving metrics on port {_METRICS_PORT.value}")
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
@@ -65,6 +79,9 @@ def main(argv: Sequence[str]) -> None:
     finally:
         loop.run_until_complete(asyncio.gather(*_cleanup_coroutines))
         loop.close()
+        RUNNER_POOL.shutdown()
+        shutdown_stage_executors()
+        shutdown_process_pools()
 
 
 if __name__ == "__main__":
@@ -9,8 +9,9 @@ import contextvars
 import yaml
 import grpc
 import pathlib
-from dataset.dataset import load_json
+from util.ndjson import iter_ndjson
 from evaluator.orchestrator import Orchestrator
+from evaluator.async_orchestrator import AsyncOrchestrator
 import reporting.report as report
 from reporting import get_reporters
 import reporting.analyzer as analyzer
@@ -114,8 +115,12 @@ class EvalServicer(eval_service_pb2_grpc.EvalServiceServicer):
         config, db_configs, model_config, setup_config = load_session_configs(session)
         dataset = await get_dataset_from_request(request_iterator)
 
-        evaluator = Orchestrator(config, db_configs, setup_config)
-        evaluator.evaluate(dataset)
+        if config.get("runners", {}).get("mode") == "async":
+            evaluator = AsyncOrchestrator(config, db_configs, setup_config)
+            await evaluator.evaluate(dataset)
+        else:
+            evaluator = Orchestrator(config, db_configs, setup_config)
+            evaluator.evaluate(dataset)
 
         job_id, run_time, results_tf, scores_tf = evaluator.process()
         reporters = get_reporters(config.get("reporting"), job_id, run_time)
@@ -142,7 +147,7 @@ def _process_results(
         model_config,
         db_configs,
     )
-    results = load_json(results_tf)
+    results = iter_ndjson(results_tf)
     results_df = report.get_dataframe(results)
     if results_df.empty:
         logging.warning(
@@ -150,7 +155,7 @@ def _process_results(
         )
         return eval_response_pb2.EvalResponse(response=f"{job_id}")
     report.quick_summary(results_df)
-    scores = load_json(scores_tf)
+    scores = iter_ndjson(scores_tf)
     scores_df, summary_scores_df = analyzer.analyze_result(scores, config)
     summary_scores_df["job_id"] = job_id
     summary_scores_df["run_time"] = run_time
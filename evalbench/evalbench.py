@@ -5,13 +5,17 @@ from absl import app
 from absl import flags
 from reporting import get_reporters
 from util.config import load_yaml_config, config_to_df
-from dataset.dataset import load_json, load_dataset_from_json, flatten_dataset
+from dataset.dataset import load_dataset_from_json, flatten_dataset
 from evaluator.orchestrator import Orchestrator
+from evaluator.async_orchestrator import AsyncOrchestrator
 import reporting.report as report
 import reporting.analyzer as analyzer
 import logging
 from util.config import set_session_configs
+from util.ndjson import iter_ndjson
+from util.metrics import REGISTRY
 from util.service import load_session_configs
+import asyncio
 import os
 import sys
 
@@ -30,6 +34,13 @@ _EXPERIMENT_CONFIG = flags.DEFINE_string(
     "Path to the eval execution configuration file.",
 )
 
+_RESUME_JOB_ID = flags.DEFINE_string(
+    "resume_job_id",
+    None,
+    "Job ID of a previous run that did not finish. Stages that the run already "
+    + "completed for an item are loaded from its journal instead of running again.",
+)
+
 
 def main(argv: Sequence[str]):
     try:
@@ -49,23 +60,38 @@ def main(argv: Sequence[str]):
         # Load the dataset
         dataset = load_dataset_from_json(session["dataset_config"], config)
 
-        # Load the evaluator
-        evaluator = Orchestrator(config, db_configs, setup_config, report_progress=True)
-
-        # Run evaluations
-        evaluator.evaluate(flatten_dataset(dataset))
+        # Load the evaluator and run evaluations
+        if config.get("runners", {}).get("mode") == "async":
+            evaluator = AsyncOrchestrator(
+                config,
+                db_configs,
+                setup_config,
+                report_progress=True,
+                resume_job_id=_RESUME_JOB_ID.value,
+            )
+            asyncio.run(evaluator.evaluate(flatten_dataset(dataset)))
+        else:
+            evaluator = Orchestrator(
+                config,
+                db_configs,
+                setup_config,
+                report_progress=True,
+                resume_job_id=_RESUME_JOB_ID.value,
+            )
+            evaluator.evaluate(flatten_dataset(dataset))
         job_id, run_time, results_tf, scores_tf = evaluator.process()
 
         # Create Dataframes for reporting
         reporters = get_reporters(parsed_config.get("reporting"), job_id, run_time)
         config_df = config_to_df(job_id, run_time, config, model_config, db_configs)
-        results = load_json(results_tf)
+        results = iter_ndjson(results_tf)
         results_df = report.get_dataframe(results)
         report.quick_summary(results_df)
-        scores = load_json(scores_tf)
+        scores = iter_ndjson(scores_tf)
         scores_df, summary_scores_df = analyzer.analyze_result(scores, config)
         summary_scores_df["job_id"] = job_id
         summary_scores_df["run_time"] = run_time
+        metrics_df = report.get_metrics_dataframe(REGISTRY.to_dict(), job_id, run_time)
 
         # Store the reports in specified outputs
         for reporter in reporters:
@@ -73,6 +99,7 @@ def main(argv: Sequence[str]):
             reporter.store(results_df, report.STORETYPE.EVALS)
             reporter.store(scores_df, report.STORETYPE.SCORES)
             reporter.store(summary_scores_df, report.STORETYPE.SUMMARY)
+            reporter.store(metrics_df, report.STORETYPE.METRICS)
             reporter.print_dashboard_links()
 
         print(f"Finished Job ID {job_id}")
@@ -0,0 +1,242 @@
+from typing import List
+import asyncio
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from util import metrics
+from util.tracing import TRACER, item_args
+from util import truncateExecutionOutputs
+from work import promptgenwork
+from work import sqlgenwork
+from work import sqlexecwork
+from work import scorework
+from work.journalwork import get_stage_work, journal_key
+from dataset.evalinput import EvalInputRequest
+from dataset.evaloutput import EvalOutput
+from evaluator.evaluator import close_db_queue
+from evaluator.progress_reporter import (
+    record_successful_prompt_gen,
+    record_successful_sql_gen,
+    record_successful_sql_exec,
+    record_successful_scoring,
+)
+from queue import Queue
+from databases import DB
+from util.journal import Journal
+
+
+class AsyncEvaluator:
+    """Runs the same Work stages as Evaluator, but as coroutines.
+
+    Every item is a task that goes through promptgen -> sqlgen -> sqlexec -> score.
+    Each stage is bounded by a semaphore sized with the same `runners` config
+    as the thread-based Evaluator. Blocking clients run on a thread pool of the
+    stage with as many threads as the stage has runners, rather than on the
+    loop's default executor, whose few threads would cap every stage at once.
+    Natively async clients (see QueryGenerator.agenerate) use no thread.
+    """
+
+    def __init__(
+        self,
+        config,
+        journal: Journal | None = None,
+    ):
+        self.config = config
+        self.journal = journal
+        runner_config = self.config.get("runners", {})
+        self.promptgen_runners = runner_config.get("promptgen_runners", 10)
+        self.sqlgen_runners = runner_config.get("sqlgen_runners", 10)
+        self.sqlexec_runners = runner_config.get("sqlexec_runners", 10)
+        self.scoring_runners = runner_config.get("scoring_runners", 10)
+
+    async def evaluate(
+        self,
+        dataset: List[EvalInputRequest],
+        db_queue: Queue[DB],
+        prompt_generator,
+        model_generator,
+        job_id: str,
+        run_time: datetime.datetime,
+        progress_reporting,
+        global_models,
+        sub_dataset_key: str = "",
+        eval_outputs=None,
+        scoring_results=None,
+    ):
+        """See Evaluator.evaluate."""
+        if eval_outputs is None:
+            eval_outputs = []
+        if scoring_results is None:
+            scoring_results = []
+        self.sub_dataset_key = sub_dataset_key
+
+        self.promptgen_slots = asyncio.Semaphore(self.promptgen_runners)
+        self.sqlgen_slots = asyncio.Semaphore(self.sqlgen_runners)
+        self.scoring_slots = asyncio.Semaphore(self.scoring_runners)
+        # The DBs themselves bound the concurrency of the sqlexec stage.
+        self.dbs: asyncio.Queue[DB] = asyncio.Queue()
+        while not db_queue.empty():
+            self.dbs.put_nowait(db_queue.get())
+        self.executors = {
+            stage: ThreadPoolExecutor(
+                max_workers=runners, thread_name_prefix=f"async_{stage}"
+            )
+            for stage, runners in (
+                ("promptgen", self.promptgen_runners),
+                ("sqlgen", self.sqlgen_runners),
+                ("sqlexec", max(self.sqlexec_runners, self.dbs.qsize())),
+                ("scoring", self.scoring_runners),
+            )
+        }
+
+        tasks = []
+        try:
+            await asyncio.to_thread(prompt_generator.setup)
+            tasks = [
+                asyncio.create_task(
+                    self._evaluate_item(
+                        eval_input,
+                        prompt_generator,
+                        model_generator,
+                        job_id,
+                        run_time,
+                        progress_reporting,
+                        global_models,
+                        eval_outputs,
+                        scoring_results,
+                    )
+                )
+                for eval_input in dataset
+            ]
+            await asyncio.gather(*tasks)
+        finally:
+            # If an item failed, the other items are cancelled, and waited for so
+            # that no DB is closed while an item still runs a query on it.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for executor in self.executors.values():
+                executor.shutdown(wait=False)
+            while not self.dbs.empty():
+                db_queue.put(self.dbs.get_nowait())
+            await asyncio.to_thread(close_db_queue, db_queue, sub_dataset_key)
+
+        return eval_outputs, scoring_results
+
+    async def _evaluate_item(
+        self,
+        eval_input: EvalInputRequest,
+        prompt_generator,
+        model_generator,
+        job_id: str,
+        run_time: datetime.datetime,
+        progress_reporting,
+        global_models,
+        eval_outputs,
+        scoring_results,
+    ):
+        eval_output = EvalOutput(eval_input)
+        eval_output["job_id"] = job_id
+        eval_output["run_time"] = run_time
+
+        key = journal_key(self.sub_dataset_key, eval_output)
+
+        queued_at = time.monotonic()
+        async with self.promptgen_slots:
+            work = get_stage_work(
+                self.journal,
+                key,
+                "promptgen",
+                eval_output,
+                lambda eval_output: promptgenwork.SQLPromptGenWork(
+                    prompt_generator, eval_output
+                ),
+            )
+            eval_output = await self._run_work("promptgen", work, queued_at)
+        record_successful_prompt_gen(progress_reporting)
+
+        queued_at = time.monotonic()
+        async with self.sqlgen_slots:
+            work = get_stage_work(
+                self.journal,
+                key,
+                "sqlgen",
+                eval_output,
+                lambda eval_output: sqlgenwork.SQLGenWork(model_generator, eval_output),
+            )
+            eval_output = await self._run_work("sqlgen", work, queued_at)
+        record_successful_sql_gen(progress_reporting)
+
+        # Items replayed from the journal do not need a DB.
+        queued_at = time.monotonic()
+        db = None
+        if self.journal is None or not self.journal.is_done(key, "sqlexec"):
+            db = await self.dbs.get()
+        try:
+            work = get_stage_work(
+                self.journal,
+                key,
+                "sqlexec",
+                eval_output,
+                lambda eval_output: sqlexecwork.SQLExecWork(
+                    db, self.config, eval_output, None
+                ),
+            )
+            eval_output = await self._run_work("sqlexec", work, queued_at)
+        finally:
+            if db is not None:
+                self.dbs.put_nowait(db)
+        record_successful_sql_exec(progress_reporting)
+
+        queued_at = time.monotonic()
+        async with self.scoring_slots:
+            work = get_stage_work(
+                self.journal,
+                key,
+                "scoring",
+                eval_output,
+                lambda eval_output: scorework.ScorerWork(
+                    self.config, eval_output, scoring_results, global_models
+                ),
+                scoring_results,
+            )
+            eval_output = await self._run_work("scoring", work, queued_at)
+        record_successful_scoring(progress_reporting)
+
+        truncateExecutionOutputs(
+            eval_output,
+            self.config,
+        )
+        eval_outputs.append(eval_output)
+
+    async def _run_work(self, stage: str, work, queued_at: float):
+        started_at = time.monotonic()
+        metrics.STAGE_IN_FLIGHT.inc(stage=stage)
+        failed = False
+        run = asyncio.ensure_future(work.arun(executor=self.executors[stage]))
+        try:
+            try:
+                return await asyncio.shield(run)
+            except asyncio.CancelledError:
+                # Work on a worker thread cannot be interrupted; let it finish.
+                await asyncio.gather(run, return_exceptions=True)
+                raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            finished_at = time.monotonic()
+            metrics.STAGE_IN_FLIGHT.dec(stage=stage)
+            metrics.record_stage(
+                stage,
+                work.eval_result,
+                started_at - queued_at,
+                finished_at - started_at,
+                failed,
+            )
+            # Coroutines overlap on the event loop thread, so use async tracks.
+            args = item_args(work.eval_result)
+            TRACER.async_span(
+                f"{stage} queue wait", queued_at, started_at, "queue", **args
+            )
+            TRACER.async_span(stage, started_at, finished_at, "stage", **args)
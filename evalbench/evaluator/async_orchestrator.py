@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from evaluator.async_evaluator import AsyncEvaluator
+from evaluator.orchestrator import Orchestrator, _log_failed_evaluation
+from dataset.evalinput import EvalInputRequest
+from util.aio import run_in_executor
+
+
+class AsyncOrchestrator(Orchestrator):
+    """Orchestrator that runs the evaluation on the asyncio event loop.
+
+    Sub-datasets are evaluated concurrently (bounded by `eval_runners`) with an
+    AsyncEvaluator each. Blocking setup such as connecting to and seeding the
+    databases runs on worker threads of the orchestrator (one per sub-dataset
+    evaluated at once) so the event loop stays responsive, which
+    lets async callers (e.g. the gRPC EvalServicer) await the evaluation directly.
+    All steps other than the evaluation of the items are shared with Orchestrator.
+    """
+
+    async def evaluate(self, dataset: list[EvalInputRequest]):
+        """See Orchestrator.evaluate."""
+        with self._progress_reporting(dataset) as (sub_datasets, progress_reporting):
+            global_models = {"registered_models": {}, "lock": threading.Lock()}
+            eval_slots = asyncio.Semaphore(self.eval_runners)
+            self.setup_executor = ThreadPoolExecutor(
+                max_workers=self.eval_runners, thread_name_prefix="async_setup"
+            )
+
+            async def evaluate_with_slot(*args):
+                async with eval_slots:
+                    return await self.evaluate_sub_dataset(*args)
+
+            tasks = []
+            try:
+                tasks = [
+                    asyncio.create_task(
+                        evaluate_with_slot(
+                            sub_datasets,
+                            db_config,
+                            dialect,
+                            database,
+                            progress_reporting,
+                            global_models,
+                        )
+                    )
+                    for dialect, db_config, database in self._sub_dataset_targets(
+                        sub_datasets, progress_reporting
+                    )
+                ]
+                await asyncio.gather(*tasks)
+            finally:
+                # If a sub-dataset failed, the others are cancelled, and waited
+                # for so that they close their DBs on the setup executor.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.setup_executor.shutdown(wait=False)
+
+    async def evaluate_sub_dataset(
+        self,
+        sub_datasets,
+        db_config,
+        dialect,
+        database,
+        progress_reporting,
+        global_models,
+    ):
+        core_db = await run_in_executor(
+            self.setup_executor,
+            self._connect,
+            sub_datasets,
+            db_config,
+            dialect,
+            database,
+            progress_reporting,
+        )
+        if core_db is None:
+            return
+        setup_planner = None
+        try:
+            setup_planner, prompt_generator, model_generator = await run_in_executor(
+                self.setup_executor,
+                self._setup_sub_dataset,
+                core_db,
+                sub_datasets,
+                db_config,
+                dialect,
+                database,
+                global_models,
+            )
+
+            for query_type, sub_dataset in self._query_type_sub_datasets(
+                sub_datasets, dialect, database
+            ):
+                db_queue = await run_in_executor(
+                    self.setup_executor,
+                    self._build_db_queue,
+                    setup_planner,
+                    sub_datasets,
+                    dialect,
+                    database,
+                    query_type,
+                    progress_reporting,
+                )
+                if db_queue is None:
+                    continue
+                evaluator = AsyncEvaluator(self.config, self.journal)
+                try:
+                    await evaluator.evaluate(
+                        sub_dataset,
+                        db_queue,
+                        prompt_generator,
+                        model_generator,
+                        **self._evaluate_args(
+                            progress_reporting, global_models, dialect, database, db_config
+                        ),
+                    )
+                except Exception as e:
+                    _log_failed_evaluation(sub_dataset, query_type, dialect, database, e)
+        finally:
+            await run_in_executor(
+                self.setup_executor, self._close_sub_dataset, setup_planner, core_db
+            )
@@ -1,8 +1,18 @@
+import logging
 from queue import Queue
 from copy import deepcopy
-from databases import DB, get_database
-from util.config import load_db_data_from_csvs, load_setup_scripts
-from concurrent.futures import ThreadPoolExecutor
+from databases import (
+    DB,
+    SessionPool,
+    get_database,
+    get_setup_data,
+    setup_fingerprint,
+)
+from databases.session_pool import DEFAULT_HEALTH_CHECK_INTERVAL
+from databases.setup_data import DEFAULT_SETUP_CACHE_DIRECTORY
+from util.config import load_setup_scripts
+from util.tracing import span
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
 from typing import Optional
 
@@ -26,9 +36,10 @@ def build_db_queue(
 
 
 def _prepare_db_queue_for_dql(core_db: DB, db_name, db_config, setup_config, num_dbs):
-    """For DQL, use the same single DB with a user that has only DQL access."""
-    db_queue = Queue[DB]()
+    """For DQL, use sessions of a single DB with a user that has only DQL access."""
     dql_db_config = deepcopy(db_config)
+    # Databases that support it (SQLite) then open their files read-only.
+    dql_db_config["read_only"] = db_config.get("dql_read_only", False)
     if setup_config:
         setup_scripts, data = _get_setup_values(
             setup_config, db_name, db_config.get("db_type")
@@ -37,15 +48,12 @@ def _prepare_db_queue_for_dql(core_db: DB, db_name, db_config, setup_config, num
         core_db.resetup_database(False, True)
         dql_db_config["user_name"] = core_db.get_dql_user()
         dql_db_config["password"] = core_db.get_tmp_user_password()
-    singular_db = get_database(dql_db_config, db_name)
-    for _ in range(num_dbs):
-        db_queue.put(singular_db)
-    return db_queue
+        dql_db_config["setup_fingerprint"] = core_db.setup_fingerprint
+    return _new_session_pool(dql_db_config, db_name, num_dbs)
 
 
 def _prepare_db_queue_for_dml(core_db: DB, db_name, db_config, setup_config, num_dbs):
-    """For DML, use the same single DB with a user that has only DQL / DML access."""
-    db_queue = Queue[DB]()
+    """For DML, use sessions of a single DB with a user that has only DQL / DML access."""
     dml_db_config = deepcopy(db_config)
     if setup_config:
         setup_scripts, data = _get_setup_values(
@@ -55,52 +63,201 @@ def _prepare_db_queue_for_dml(core_db: DB, db_name, db_config, setup_config, num
         core_db.resetup_database(False, True)
         dml_db_config["user_name"] = core_db.get_dml_user()
         dml_db_config["password"] = core_db.get_tmp_user_password()
-    singular_db = get_database(dml_db_config, db_name)
-    for _ in range(num_dbs):
-        db_queue.put(singular_db)
-    return db_queue
+        dml_db_config["setup_fingerprint"] = core_db.setup_fingerprint
+    return _new_session_pool(dml_db_config, db_name, num_dbs)
 
 
-def _prepare_db_queue_for_ddl(core_db: DB, db_name, db_config, setup_config, num_dbs):
-    """For DDL, use the same single DB with a user that has only DDL access."""
-    if setup_config:
-        setup_scripts, _ = _get_setup_values(
-            setup_config, db_name, db_config.get("db_type")
-        )
+def _prepare_db_queue_for_ddl(
+    core_db: DB,
+    db_name,
+    db_config,
+    setup_config,
+    num_dbs,
+    tmp_dbs: Optional[list[DB]] = None,
+):
+    """For DDL, use the same single DB with a user that has only DDL access.
+
+    tmp_dbs are DBs of tmp databases provisioned ahead of time, see SetupPlanner;
+    by default they are created here.
+    """
+    if not setup_config:
+        raise ValueError("No Setup Config was provided for DDL")
+    setup_scripts, _ = _get_setup_values(
+        setup_config, db_name, db_config.get("db_type")
+    )
     core_db.set_setup_instructions(setup_scripts, None)
     core_db.resetup_database(False, False)
+    if tmp_dbs is None:
+        tmp_dbs = _provision_ddl_tmp_dbs(
+            core_db, db_name, db_config, setup_config, num_dbs
+        )
     db_queue = Queue[DB]()
-    if not setup_config:
-        raise ValueError("No Setup Config was provided for DDL")
+    for tmp_db in tmp_dbs:
+        db_queue.put(tmp_db)
+    return db_queue
+
+
+def _provision_ddl_tmp_dbs(
+    admin_db: DB, db_name, db_config, setup_config, num_dbs, seed: bool = False
+) -> list[DB]:
+    """Creates the tmp databases of DDL items and their DBs.
+
+    Args:
+      admin_db: The DB that creates the tmp databases, and so drops them.
+      seed: Also run the setup of each tmp database (and snapshot it), which
+        the DDL items otherwise do on first use.
+    """
     setup_scripts, _ = _get_setup_values(
         setup_config, db_name, db_config.get("db_type")
     )
-    tmp_dbs = core_db.create_tmp_databases(num_dbs)
-    with ThreadPoolExecutor() as executor:
+    tmp_db_names = admin_db.create_tmp_databases(num_dbs)
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(admin_db.setup_parallelism, num_dbs))
+    ) as executor:
         create_ddl_tmp_db_p = partial(
-            _create_ddl_tmp_db, db_config=db_config, setup_scripts=setup_scripts
+            _create_ddl_tmp_db,
+            admin_db=admin_db,
+            db_config=db_config,
+            setup_scripts=setup_scripts,
+            # What the tmp DBs compute when they re-run the setup, without data.
+            fingerprint=setup_fingerprint(setup_scripts, None),
+            seed=seed,
         )
-        results = executor.map(create_ddl_tmp_db_p, tmp_dbs)
-        for tmp_db in results:
-            db_queue.put(tmp_db)
-    return db_queue
+        return list(executor.map(create_ddl_tmp_db_p, tmp_db_names))
+
+
+def _new_session_pool(db_config, db_name, num_dbs) -> SessionPool:
+    """Opens one connection per sqlexec runner, so none connects on the hot path."""
+    db_config["pool_size"] = num_dbs
+    return SessionPool(
+        get_database(db_config, db_name),
+        num_dbs,
+        db_config.get("health_check_interval", DEFAULT_HEALTH_CHECK_INTERVAL),
+    )
 
 
-def _create_ddl_tmp_db(tmp_db, db_config, setup_scripts):
+def _create_ddl_tmp_db(
+    tmp_db, admin_db, db_config, setup_scripts, fingerprint, seed=False
+):
     tmp_ddl_db_config = deepcopy(db_config)
     tmp_ddl_db_config["is_tmp_db"] = True
+    tmp_ddl_db_config["setup_fingerprint"] = fingerprint
     tmp_db = get_database(tmp_ddl_db_config, tmp_db)
     tmp_db.set_setup_instructions(setup_scripts, None)
+    # The admin DB created the tmp database, and can copy it for snapshots.
+    tmp_db.admin_db = admin_db
+    if seed:
+        try:
+            with span("db.seed_tmp_db", "setup", database=tmp_db.db_name):
+                tmp_db.reset_to_setup()
+        except Exception as e:
+            # The first DDL item on the DB runs the setup again.
+            logging.warning(f"Could not seed tmp database {tmp_db.db_name}: {e}")
     return tmp_db
 
 
+class SetupPlanner:
+    """Builds the DB queues of the query types of one database.
+
+    Setting up a database for DDL items means creating and seeding a tmp
+    database per sqlexec runner, which is slow on database servers. The planner
+    starts that in the background as soon as it is created, setup_parallelism
+    tmp databases at a time, so it overlaps with seeding the base database and
+    with evaluating the DQL and DML items. build_db_queue then only waits for
+    what is not ready yet.
+
+    The background work runs on a DB of its own, the admin DB, as core_db is
+    set up on the calling thread meanwhile and is not safe to share. The admin
+    DB creates the tmp databases, and close drops them.
+
+    Attributes:
+      core_db: The DB of the base database.
+      num_dbs: Number of DBs of the queue of each query type.
+    """
+
+    def __init__(
+        self,
+        core_db: DB,
+        db_name: str,
+        db_config: dict,
+        setup_config: dict,
+        num_dbs: dict[str, int],
+    ):
+        self.core_db = core_db
+        self.db_name = db_name
+        self.db_config = db_config
+        self.setup_config = setup_config
+        self.num_dbs = num_dbs
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._admin_db: Optional[DB] = None
+        self._ddl_tmp_dbs: Optional[Future] = None
+        self._ddl_tmp_dbs_taken = False
+        if setup_config and num_dbs.get("ddl"):
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._ddl_tmp_dbs = self._executor.submit(self._provision_ddl_tmp_dbs)
+
+    def build_db_queue(self, query_type: str):
+        """See build_db_queue."""
+        num_dbs = self.num_dbs[query_type]
+        if query_type == "ddl" and self._ddl_tmp_dbs is not None:
+            with span("db_manager.wait_tmp_dbs", "setup", database=self.db_name):
+                tmp_dbs = self._ddl_tmp_dbs.result()
+            db_queue = _prepare_db_queue_for_ddl(
+                self.core_db,
+                self.db_name,
+                self.db_config,
+                self.setup_config,
+                num_dbs,
+                tmp_dbs,
+            )
+            self._ddl_tmp_dbs_taken = True
+            return db_queue
+        return build_db_queue(
+            self.core_db,
+            self.db_name,
+            self.db_config,
+            self.setup_config,
+            query_type,
+            num_dbs,
+        )
+
+    def close(self):
+        """Waits for the background setup and drops the tmp databases it made.
+
+        Call it once the DBs of the DDL queue are no longer used.
+        """
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        if not self._ddl_tmp_dbs_taken and self._ddl_tmp_dbs.exception() is None:
+            for tmp_db in self._ddl_tmp_dbs.result():
+                tmp_db.close_connections()
+        if self._admin_db is not None:
+            self._admin_db.clean_tmp_creations()
+            self._admin_db.close_connections()
+            self._admin_db = None
+
+    def _provision_ddl_tmp_dbs(self) -> list[DB]:
+        self._admin_db = get_database(self.db_config, self.db_name)
+        return _provision_ddl_tmp_dbs(
+            self._admin_db,
+            self.db_name,
+            self.db_config,
+            self.setup_config,
+            self.num_dbs["ddl"],
+            seed=True,
+        )
+
+
 def _get_setup_values(setup_config, db_name: str, db_type: str):
     try:
         setup_scripts = load_setup_scripts(
             setup_config["setup_directory"] + "/" + db_name + "/" + db_type
         )
-        data = load_db_data_from_csvs(
-            setup_config["setup_directory"] + "/" + db_name + "/data"
+        # Tables are read lazily, and parsed once per CSV version thanks to the cache.
+        data = get_setup_data(
+            setup_config["setup_directory"] + "/" + db_name + "/data",
+            setup_config.get("cache_directory", DEFAULT_SETUP_CACHE_DIRECTORY),
         )
         return setup_scripts, data
     except Exception as e:
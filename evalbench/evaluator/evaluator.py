@@ -1,11 +1,16 @@
-from typing import Any, List
+from typing import List
 import datetime
+import logging
 from util import truncateExecutionOutputs
 from work import promptgenwork
 from work import sqlgenwork
 from work import sqlexecwork
 from work import scorework
+from work.journalwork import get_stage_work, journal_key
 from mp import mprunner
+from mp.mprunner import RUNNER_POOL, log_runner_stats
+from mp.fairexecutor import get_stage_executor
+from mp.pipeline import PipelineStage, StreamingPipeline
 import concurrent.futures
 from dataset.evalinput import EvalInputRequest
 from dataset.evaloutput import EvalOutput
@@ -16,20 +21,31 @@ from evaluator.progress_reporter import (
     record_successful_scoring,
 )
 from queue import Queue
-from databases import DB
+from databases import DB, SessionPool
+from util.journal import Journal
+from util.tracing import span
 
 
 class Evaluator:
     def __init__(
         self,
         config,
+        journal: Journal | None = None,
     ):
         self.config = config
+        self.journal = journal
         runner_config = self.config.get("runners", {})
         self.promptgen_runners = runner_config.get("promptgen_runners", 10)
         self.sqlgen_runners = runner_config.get("sqlgen_runners", 10)
         self.sqlexec_runners = runner_config.get("sqlexec_runners", 10)
         self.scoring_runners = runner_config.get("scoring_runners", 10)
+        # "batch" waits for every item of a stage before the next stage is fed,
+        # "streaming" moves each item forward as soon as its own stage is done.
+        self.mode = runner_config.get("mode", "batch")
+        self.queue_size = runner_config.get("queue_size", 100)
+        # Share one process-wide executor per stage across all sub-datasets, with
+        # fair queuing between them, instead of creating dedicated pools each time.
+        self.shared_executors = runner_config.get("shared_executors", False)
 
     def evaluate(
         self,
@@ -41,51 +57,151 @@ class Evaluator:
         run_time: datetime.datetime,
         progress_reporting,
         global_models,
+        sub_dataset_key: str = "",
+        eval_outputs=None,
+        scoring_results=None,
     ):
-        eval_outputs: List[Any] = []
-        scoring_results: List[Any] = []
+        """Evaluates a sub-dataset that runs on the DBs of db_queue.
 
-        self.promptrunner = mprunner.MPRunner(self.promptgen_runners)
-        self.genrunner = mprunner.MPRunner(self.sqlgen_runners)
-        self.sqlrunner = mprunner.MPRunner(self.sqlexec_runners)
-        self.scoringrunner = mprunner.MPRunner(self.scoring_runners)
-        prompt_generator.setup()
+        The eval outputs and score dicts are added to eval_outputs and
+        scoring_results as soon as each item is scored. Pass e.g. NDJSONWriters to
+        stream them to disk instead of keeping them in memory; both default to new
+        lists.
 
-        self.promptrunner.futures.clear()
-        self.genrunner.futures.clear()
-        self.sqlrunner.futures.clear()
-        self.scoringrunner.futures.clear()
+        Returns:
+          The eval_outputs and scoring_results.
+        """
+        if eval_outputs is None:
+            eval_outputs = []
+        if scoring_results is None:
+            scoring_results = []
+        self.sub_dataset_key = sub_dataset_key
 
+        self.promptrunner = self._new_runner(
+            "promptgen", self.promptgen_runners, sub_dataset_key
+        )
+        self.genrunner = self._new_runner("sqlgen", self.sqlgen_runners, sub_dataset_key)
+        self.sqlrunner = self._new_runner(
+            "sqlexec", self.sqlexec_runners, sub_dataset_key
+        )
+        self.scoringrunner = self._new_runner(
+            "scoring", self.scoring_runners, sub_dataset_key
+        )
+        runners = [self.promptrunner, self.genrunner, self.sqlrunner, self.scoringrunner]
+        failed = True
+        try:
+            prompt_generator.setup()
+
+            if self.mode == "streaming":
+                self._evaluate_streaming(
+                    dataset,
+                    db_queue,
+                    prompt_generator,
+                    model_generator,
+                    job_id,
+                    run_time,
+                    progress_reporting,
+                    global_models,
+                    eval_outputs,
+                    scoring_results,
+                )
+            else:
+                self._evaluate_batch(
+                    dataset,
+                    db_queue,
+                    prompt_generator,
+                    model_generator,
+                    job_id,
+                    run_time,
+                    progress_reporting,
+                    global_models,
+                    eval_outputs,
+                    scoring_results,
+                )
+            log_runner_stats(runners, prefix=f"{sub_dataset_key} ")
+            failed = False
+        finally:
+            for runner in runners:
+                if failed:
+                    # Work of the failed evaluation may still be queued or
+                    # running, so it is cancelled (on shared executors, only the
+                    # work of this sub-dataset) and the runner is not reused.
+                    runner.stop(wait=True, cancel_pending=True)
+                elif not self.shared_executors:
+                    # Runners of the shared executors were not acquired from the pool.
+                    RUNNER_POOL.release(runner)
+
+        close_db_queue(db_queue, sub_dataset_key)
+        return eval_outputs, scoring_results
+
+    def _evaluate_batch(
+        self,
+        dataset: List[EvalInputRequest],
+        db_queue: Queue[DB],
+        prompt_generator,
+        model_generator,
+        job_id: str,
+        run_time: datetime.datetime,
+        progress_reporting,
+        global_models,
+        eval_outputs,
+        scoring_results,
+    ):
+        prompt_futures = []
         for eval_input in dataset:
             eval_output = EvalOutput(eval_input)
             eval_output["job_id"] = job_id
             eval_output["run_time"] = run_time
-            work = promptgenwork.SQLPromptGenWork(prompt_generator, eval_output)
-            self.promptrunner.execute_work(work)
+            work = self._stage_work(
+                "promptgen",
+                eval_output,
+                lambda eval_output: promptgenwork.SQLPromptGenWork(
+                    prompt_generator, eval_output
+                ),
+            )
+            prompt_futures.append(self.promptrunner.execute_work(work))
 
-        for future in concurrent.futures.as_completed(self.promptrunner.futures):
+        gen_futures = []
+        for future in concurrent.futures.as_completed(prompt_futures):
             eval_output = future.result()
             record_successful_prompt_gen(progress_reporting)
-            work = sqlgenwork.SQLGenWork(model_generator, eval_output)
-            self.genrunner.execute_work(work)
+            work = self._stage_work(
+                "sqlgen",
+                eval_output,
+                lambda eval_output: sqlgenwork.SQLGenWork(
+                    model_generator, eval_output
+                ),
+            )
+            gen_futures.append(self.genrunner.execute_work(work))
 
-        for future in concurrent.futures.as_completed(self.genrunner.futures):
+        sql_futures = []
+        for future in concurrent.futures.as_completed(gen_futures):
             eval_output = future.result()
             record_successful_sql_gen(progress_reporting)
-            work = sqlexecwork.SQLExecWork(
-                db_queue.get(), self.config, eval_output, db_queue
+            work = self._stage_work(
+                "sqlexec",
+                eval_output,
+                lambda eval_output: sqlexecwork.SQLExecWork(
+                    self._checkout_db(db_queue), self.config, eval_output, db_queue
+                ),
             )
-            self.sqlrunner.execute_work(work)
+            sql_futures.append(self.sqlrunner.execute_work(work))
 
-        for future in concurrent.futures.as_completed(self.sqlrunner.futures):
+        scoring_futures = []
+        for future in concurrent.futures.as_completed(sql_futures):
             eval_output = future.result()
             record_successful_sql_exec(progress_reporting)
-            work = scorework.ScorerWork(
-                self.config, eval_output, scoring_results, global_models
+            work = self._stage_work(
+                "scoring",
+                eval_output,
+                lambda eval_output: scorework.ScorerWork(
+                    self.config, eval_output, scoring_results, global_models
+                ),
+                scoring_results,
             )
-            self.scoringrunner.execute_work(work)
+            scoring_futures.append(self.scoringrunner.execute_work(work))
 
-        for future in concurrent.futures.as_completed(self.scoringrunner.futures):
+        for future in concurrent.futures.as_completed(scoring_futures):
             eval_output = future.result()
             record_successful_scoring(progress_reporting)
             truncateExecutionOutputs(
@@ -94,9 +210,118 @@ class Evaluator:
             )
             eval_outputs.append(eval_output)
 
-        if db_queue:
-            while not db_queue.empty():
-                db = db_queue.get()
-                db.close_connections()
+    def _evaluate_streaming(
+        self,
+        dataset: List[EvalInputRequest],
+        db_queue: Queue[DB],
+        prompt_generator,
+        model_generator,
+        job_id: str,
+        run_time: datetime.datetime,
+        progress_reporting,
+        global_models,
+        eval_outputs,
+        scoring_results,
+    ):
+        def new_eval_output(eval_input):
+            eval_output = EvalOutput(eval_input)
+            eval_output["job_id"] = job_id
+            eval_output["run_time"] = run_time
+            return eval_output
 
-        return eval_outputs, scoring_results
+        def finish_scoring(eval_output):
+            record_successful_scoring(progress_reporting)
+            truncateExecutionOutputs(eval_output, self.config)
+
+        pipeline = StreamingPipeline(
+            [
+                PipelineStage(
+                    "promptgen",
+                    self.promptrunner,
+                    lambda eval_input: self._stage_work(
+                        "promptgen",
+                        new_eval_output(eval_input),
+                        lambda eval_output: promptgenwork.SQLPromptGenWork(
+                            prompt_generator, eval_output
+                        ),
+                    ),
+                    lambda _: record_successful_prompt_gen(progress_reporting),
+                ),
+                PipelineStage(
+                    "sqlgen",
+                    self.genrunner,
+                    lambda eval_output: self._stage_work(
+                        "sqlgen",
+                        eval_output,
+                        lambda eval_output: sqlgenwork.SQLGenWork(
+                            model_generator, eval_output
+                        ),
+                    ),
+                    lambda _: record_successful_sql_gen(progress_reporting),
+                ),
+                PipelineStage(
+                    "sqlexec",
+                    self.sqlrunner,
+                    lambda eval_output: self._stage_work(
+                        "sqlexec",
+                        eval_output,
+                        lambda eval_output: sqlexecwork.SQLExecWork(
+                            self._checkout_db(db_queue),
+                            self.config,
+                            eval_output,
+                            db_queue,
+                        ),
+                    ),
+                    lambda _: record_successful_sql_exec(progress_reporting),
+                ),
+                PipelineStage(
+                    "scoring",
+                    self.scoringrunner,
+                    lambda eval_output: self._stage_work(
+                        "scoring",
+                        eval_output,
+                        lambda eval_output: scorework.ScorerWork(
+                            self.config, eval_output, scoring_results, global_models
+                        ),
+                        scoring_results,
+                    ),
+                    finish_scoring,
+                ),
+            ],
+            queue_size=self.queue_size,
+        )
+        pipeline.run(dataset, eval_outputs)
+
+    def _stage_work(self, stage, eval_output, make_work, scoring_results=None):
+        """Builds the Work of a stage, or replays it from the journal if resuming."""
+        return get_stage_work(
+            self.journal,
+            journal_key(self.sub_dataset_key, eval_output),
+            stage,
+            eval_output,
+            make_work,
+            scoring_results,
+        )
+
+    def _new_runner(self, stage: str, num_runners: int, sub_dataset_key: str):
+        if self.shared_executors:
+            executor = get_stage_executor(stage, num_runners).bind(sub_dataset_key)
+            return mprunner.MPRunner(num_runners, executor, name=stage)
+        return RUNNER_POOL.acquire(stage, num_runners)
+
+    def _checkout_db(self, db_queue: Queue[DB]) -> DB:
+        # Blocks while all DBs are busy, which shows up as a stall in traces.
+        with span("db_queue.get", "db"):
+            return db_queue.get()
+
+
+def close_db_queue(db_queue: Queue[DB], sub_dataset_key: str = ""):
+    """Closes the DBs of a db_queue once a sub-dataset is evaluated."""
+    if isinstance(db_queue, SessionPool):
+        logging.info(f"{sub_dataset_key} DB sessions: {db_queue.stats().to_dict()}")
+        db_queue.close()
+        return
+    if db_queue:
+        while not db_queue.empty():
+            db = db_queue.get()
+            db.close_connections()
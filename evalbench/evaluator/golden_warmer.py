@@ -0,0 +1,123 @@
+"""Fills the golden store with the results of the golden queries of a dataset."""
+
+import concurrent.futures
+import logging
+from queue import Queue
+
+from dataset.dataset import breakdown_datasets
+from dataset.evalinput import EvalInputRequest
+from dataset.evaloutput import EvalOutput
+from databases import SessionPool
+from evaluator.db_manager import SetupPlanner
+from work.sqlexecwork import SQLExecWork
+import databases
+
+
+def warm_golden_store(
+    config: dict,
+    db_configs: dict,
+    setup_config: dict,
+    dataset: list[EvalInputRequest],
+) -> dict:
+    """Runs every golden query of dataset that is not stored yet.
+
+    The databases are set up just like for an evaluation, and the golden
+    queries run on sqlexec_runners DBs per database. Later runs with
+    golden_store enabled then read the results instead of executing the golden
+    queries, until the setup of a database changes.
+
+    Returns:
+      Counts of the golden queries that succeeded, i.e. are now stored unless
+      their results differ on every run, and of those that failed.
+    """
+    # Warming always writes to the store, whether or not runs read it.
+    config = dict(config, golden_store=True)
+    sqlexec_runners = config.get("runners", {}).get("sqlexec_runners", 10)
+    counts = {"succeeded": 0, "failed": 0}
+    sub_datasets, _, _ = breakdown_datasets(dataset)
+    for dialect in sub_datasets:
+        for db_config in db_configs.get(dialect) or []:
+            for database in sub_datasets[dialect]:
+                try:
+                    core_db = databases.get_database(db_config, database)
+                except Exception as e:
+                    logging.error(
+                        f"Could not connect to database {database} on {dialect}; due to {e}"
+                    )
+                    continue
+                setup_planner = SetupPlanner(
+                    core_db,
+                    database,
+                    db_config,
+                    setup_config,
+                    {
+                        query_type: min(sqlexec_runners, len(sub_dataset))
+                        for query_type, sub_dataset in sub_datasets[dialect][
+                            database
+                        ].items()
+                    },
+                )
+                try:
+                    for query_type, sub_dataset in sub_datasets[dialect][
+                        database
+                    ].items():
+                        _warm_sub_dataset(
+                            setup_planner, database, query_type, sub_dataset, config, counts
+                        )
+                finally:
+                    setup_planner.close()
+                    core_db.clean_tmp_creations()
+                    core_db.close_connections()
+    logging.info(f"Golden store: {counts}")
+    return counts
+
+
+def _warm_sub_dataset(
+    setup_planner: SetupPlanner,
+    database: str,
+    query_type: str,
+    sub_dataset: list[EvalInputRequest],
+    config: dict,
+    counts: dict,
+):
+    num_dbs = setup_planner.num_dbs[query_type]
+    try:
+        db_queue = setup_planner.build_db_queue(query_type)
+    except Exception as e:
+        logging.error(
+            f"Skipping {query_type} golden queries as DB {database} "
+            + f"could not be setup properly due to {e}."
+        )
+        counts["failed"] += len(sub_dataset)
+        return
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_dbs) as executor:
+            futures = [
+                executor.submit(
+                    lambda eval_input: SQLExecWork(
+                        db_queue.get(), config, EvalOutput(eval_input), db_queue
+                    ).run_golden(),
+                    eval_input,
+                )
+                for eval_input in sub_dataset
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                eval_output = future.result()
+                if eval_output["golden_error"]:
+                    logging.warning(
+                        f"Golden query of {eval_output['id']} failed: "
+                        + f"{eval_output['golden_error']}"
+                    )
+                    counts["failed"] += 1
+                else:
+                    counts["succeeded"] += 1
+    finally:
+        _close_db_queue(db_queue)
+
+
+def _close_db_queue(db_queue: Queue):
+    if isinstance(db_queue, SessionPool):
+        db_queue.close()
+        return
+    while not db_queue.empty():
+        db_queue.get().close_connections()
@@ -1,10 +1,9 @@
 from multiprocessing import Manager
+import contextlib
 import threading
 import uuid
-import json
 import datetime
 import logging
-import tempfile
 from evaluator.progress_reporter import (
     setup_progress_reporting,
     cleanup_progress_reporting,
@@ -13,9 +12,13 @@ from evaluator.progress_reporter import (
     record_successful_setup,
 )
 from evaluator.evaluator import Evaluator
-from evaluator.db_manager import build_db_queue
+from evaluator.db_manager import SetupPlanner
 from dataset.evalinput import EvalInputRequest
 from dataset.dataset import breakdown_datasets
+from util.journal import Journal, DEFAULT_JOURNAL_DIRECTORY
+from util.ndjson import NDJSONWriter
+from util.rate_limit import load_rate_limits, rate_limit_report, save_rate_limits
+from util.tracing import TRACER, span
 import databases
 import generators.models as models
 import generators.prompts as prompts
@@ -29,20 +32,40 @@ class Orchestrator:
         db_configs,
         setup_config,
         report_progress=False,
+        resume_job_id=None,
     ):
         self.config = config
         self.db_configs = db_configs
         self.setup_config = setup_config
-        self.job_id = f"{uuid.uuid4()}"
+        self.job_id = resume_job_id or f"{uuid.uuid4()}"
         self.run_time = datetime.datetime.now()
-        self.total_eval_outputs = []
-        self.total_scoring_results = []
+        # Every item and its scores are spilled to disk as soon as it is scored.
+        self.total_eval_outputs = NDJSONWriter()
+        self.total_scoring_results = NDJSONWriter()
         self.reporting_total_evals_done = 0
         self.report_progress = report_progress
 
+        # Opt-in checkpoints of the items, so a crashed job can be resumed by
+        # job_id. Resuming reads the journal of the job, and keeps writing it.
+        self.journal = None
+        if self.config.get("journal", False) or resume_job_id:
+            self.journal = Journal(
+                self.config.get("journal_directory", DEFAULT_JOURNAL_DIRECTORY),
+                self.job_id,
+            )
+            logging.info(f"Journaling job {self.job_id} to {self.journal.path}")
+
         runner_config = self.config.get("runners", {})
         self.eval_runners = runner_config.get("eval_runners", 4)
         self.sqlexec_runners = runner_config.get("sqlexec_runners", 10)
+        # Opt-in timeline of every item, written in the Chrome trace-event format.
+        self.trace_file = runner_config.get("trace_file")
+        if self.trace_file:
+            TRACER.enable()
+        # Adaptive rate limiters start from the rates learned by previous runs.
+        self.rate_limits_file = runner_config.get("rate_limits_file")
+        if self.rate_limits_file:
+            load_rate_limits(self.rate_limits_file)
 
     def evaluate(self, dataset: list[EvalInputRequest]):
         """This wrapper breaks down evaluations by category of evaluations. (dql, dml, ddl).
@@ -50,6 +73,78 @@ class Orchestrator:
         require setting up and tearing down the databsae and DML queries require prevention
         of unintended consequences. Additionally, DQLs are run under a read-only user.
         """
+        with self._progress_reporting(dataset) as (sub_datasets, progress_reporting):
+            global_models = {"registered_models": {}, "lock": threading.Lock()}
+
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.eval_runners
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        self.evaluate_sub_dataset,
+                        sub_datasets,
+                        db_config,
+                        dialect,
+                        database,
+                        progress_reporting,
+                        global_models,
+                    )
+                    for dialect, db_config, database in self._sub_dataset_targets(
+                        sub_datasets, progress_reporting
+                    )
+                ]
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+
+    def evaluate_sub_dataset(
+        self,
+        sub_datasets,
+        db_config,
+        dialect,
+        database,
+        progress_reporting,
+        global_models,
+    ):
+        core_db = self._connect(sub_datasets, db_config, dialect, database, progress_reporting)
+        if core_db is None:
+            return
+        setup_planner = None
+        try:
+            setup_planner, prompt_generator, model_generator = self._setup_sub_dataset(
+                core_db, sub_datasets, db_config, dialect, database, global_models
+            )
+
+            for query_type, sub_dataset in self._query_type_sub_datasets(
+                sub_datasets, dialect, database
+            ):
+                db_queue = self._build_db_queue(
+                    setup_planner, sub_datasets, dialect, database, query_type, progress_reporting
+                )
+                if db_queue is None:
+                    continue
+                evaluator = Evaluator(self.config, self.journal)
+                try:
+                    evaluator.evaluate(
+                        sub_dataset,
+                        db_queue,
+                        prompt_generator,
+                        model_generator,
+                        **self._evaluate_args(
+                            progress_reporting, global_models, dialect, database, db_config
+                        ),
+                    )
+                except Exception as e:
+                    _log_failed_evaluation(sub_dataset, query_type, dialect, database, e)
+        finally:
+            self._close_sub_dataset(setup_planner, core_db)
+
+    @contextlib.contextmanager
+    def _progress_reporting(self, dataset: list[EvalInputRequest]):
+        """Breaks the dataset down into sub-datasets and reports their progress.
+
+        Yields:
+          The sub-datasets and the progress_reporting of the evaluation.
+        """
         progress_reporting_thread = None
         progress_reporting_finished = None
         progress_reporting = None
@@ -70,37 +165,7 @@ class Orchestrator:
                         manager, total_dataset_len, total_db_len
                     )
 
-                global_models = {"registered_models": {}, "lock": threading.Lock()}
-
-                with concurrent.futures.ThreadPoolExecutor(
-                    max_workers=self.eval_runners
-                ) as executor:
-                    futures = []
-                    for dialect in sub_datasets:
-                        db_configs = self.db_configs.get(dialect)
-                        if not db_configs:
-                            logging.info(
-                                f"Skipping queries for {dialect} as no applicable db_config"
-                                + " was found."
-                            )
-                            skip_dialect(sub_datasets[dialect], progress_reporting)
-                            continue
-                        for db_config in db_configs:
-                            for database in sub_datasets[dialect]:
-                                future = executor.submit(
-                                    self.evaluate_sub_dataset,
-                                    sub_datasets,
-                                    db_config,
-                                    dialect,
-                                    database,
-                                    progress_reporting,
-                                    global_models,
-                                )
-                                futures.append(future)
-                    for future in concurrent.futures.as_completed(futures):
-                        eval_outputs, scoring_results = future.result()
-                        self.total_eval_outputs.extend(eval_outputs)
-                        self.total_scoring_results.extend(scoring_results)
+                yield sub_datasets, progress_reporting
 
                 if self.report_progress:
                     cleanup_progress_reporting(
@@ -117,98 +182,150 @@ class Orchestrator:
                     )
                 raise e
 
-    def evaluate_sub_dataset(
-        self,
-        sub_datasets,
-        db_config,
-        dialect,
-        database,
-        progress_reporting,
-        global_models,
-    ):
-        total_eval_outputs = []
-        total_scoring_results = []
+    def _sub_dataset_targets(self, sub_datasets, progress_reporting):
+        """Yields the (dialect, db_config, database) of every sub-dataset to evaluate.
+
+        Dialects without a db_config are skipped.
+        """
+        for dialect in sub_datasets:
+            db_configs = self.db_configs.get(dialect)
+            if not db_configs:
+                logging.info(
+                    f"Skipping queries for {dialect} as no applicable db_config"
+                    + " was found."
+                )
+                skip_dialect(sub_datasets[dialect], progress_reporting)
+                continue
+            for db_config in db_configs:
+                for database in sub_datasets[dialect]:
+                    yield dialect, db_config, database
 
+    def _connect(self, sub_datasets, db_config, dialect, database, progress_reporting):
+        """Returns the core DB of database, or None if it could not be connected."""
         try:
             # Setup the core connection just once (for all query types in database)
-            core_db = databases.get_database(db_config, database)
+            with span("connect", "setup", database=database):
+                return databases.get_database(db_config, database)
         except Exception as e:
             skip_database(sub_datasets[dialect][database], progress_reporting, None)
             logging.error(
                 f"Could not connect to database {database} on {dialect}; due to {e}"
             )
-            return [], []
+            return None
 
-        prompt_generator = prompts.get_generator(core_db, self.config)
-        model_generator = models.get_generator(
-            global_models, self.config["model_config"], core_db
+    def _setup_sub_dataset(
+        self, core_db, sub_datasets, db_config, dialect, database, global_models
+    ):
+        """Returns the SetupPlanner and the prompt and model generators of database."""
+        # Starts provisioning the DDL tmp databases in the background, while the
+        # generators and the other query types are set up.
+        setup_planner = SetupPlanner(
+            core_db,
+            database,
+            db_config,
+            self.setup_config,
+            {
+                query_type: min(self.sqlexec_runners, len(sub_dataset))
+                for query_type, sub_dataset in sub_datasets[dialect][database].items()
+            },
         )
+        try:
+            prompt_generator = prompts.get_generator(core_db, self.config)
+            model_generator = models.get_generator(
+                global_models, self.config["model_config"], core_db
+            )
+        except BaseException:
+            # Drops the tmp databases that were provisioned so far.
+            setup_planner.close()
+            raise
+        return setup_planner, prompt_generator, model_generator
 
+    def _query_type_sub_datasets(self, sub_datasets, dialect, database):
+        """Yields the (query_type, sub_dataset) of database, in evaluation order."""
         for query_type in ["dql", "dml", "ddl"]:
-            if query_type not in sub_datasets[dialect][database]:
-                continue
-            sub_dataset = sub_datasets[dialect][database][query_type]
-            sub_dataset_len = len(sub_dataset)
-            db_queue = None
-            try:
-                db_queue = build_db_queue(
-                    core_db,
-                    database,
-                    db_config,
-                    self.setup_config,
-                    query_type,
-                    min(self.sqlexec_runners, sub_dataset_len),
-                )
-                record_successful_setup(progress_reporting)
-            except Exception as e:
-                logging.info(
-                    f"Skipping {query_type} queries as DB {database} "
-                    + f"could not be setup properly in {dialect} due to {e}."
-                )
-                skip_database(
-                    sub_datasets[dialect][database], progress_reporting, query_type
-                )
-                continue
+            if query_type in sub_datasets[dialect][database]:
+                yield query_type, sub_datasets[dialect][database][query_type]
 
-            evaluator = Evaluator(self.config)
-            try:
-                eval_outputs, scoring_results = evaluator.evaluate(
-                    sub_dataset,
-                    db_queue,
-                    prompt_generator,
-                    model_generator,
-                    self.job_id,
-                    self.run_time,
-                    progress_reporting,
-                    global_models,
-                )
-                total_eval_outputs.extend(eval_outputs)
-                total_scoring_results.extend(scoring_results)
-            except Exception as e:
-                logging.info(
-                    f"Failed to evaluate {sub_dataset_len} {query_type} queries "
-                    + f"on DB {database} on {dialect}. Due to {e}"
-                )
+    def _build_db_queue(
+        self, setup_planner, sub_datasets, dialect, database, query_type, progress_reporting
+    ):
+        """Returns the db_queue of query_type, or None if it could not be set up."""
+        try:
+            with span(
+                "build_db_queue", "setup", database=database, query_type=query_type
+            ):
+                db_queue = setup_planner.build_db_queue(query_type)
+            record_successful_setup(progress_reporting)
+            return db_queue
+        except Exception as e:
+            logging.info(
+                f"Skipping {query_type} queries as DB {database} "
+                + f"could not be setup properly in {dialect} due to {e}."
+            )
+            skip_database(
+                sub_datasets[dialect][database], progress_reporting, query_type
+            )
+            return None
+
+    def _evaluate_args(self, progress_reporting, global_models, dialect, database, db_config):
+        """Returns the arguments of Evaluator.evaluate that are shared by all items."""
+        return {
+            "job_id": self.job_id,
+            "run_time": self.run_time,
+            "progress_reporting": progress_reporting,
+            "global_models": global_models,
+            "sub_dataset_key": _sub_dataset_key(dialect, database, db_config),
+            "eval_outputs": self.total_eval_outputs,
+            "scoring_results": self.total_scoring_results,
+        }
 
+    def _close_sub_dataset(self, setup_planner, core_db):
+        if setup_planner is not None:
+            setup_planner.close()
         # Cleanup all the tmp creations that were built from the core connection
         if core_db:
             core_db.clean_tmp_creations()
             core_db.close_connections()
 
-        return total_eval_outputs, total_scoring_results
-
     def process(self):
-        with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".json") as f:
-            json.dump(self.total_eval_outputs, f, sort_keys=True, indent=4, default=str)
-            results_tf = f.name
-        with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".json") as f:
-            json.dump(
-                self.total_scoring_results, f, sort_keys=True, indent=4, default=str
-            )
-            scores_tf = f.name
+        """Finishes the NDJSON files of the results and scores.
+
+        Returns:
+          The job_id, run_time and the paths of the results and scores files,
+          which can be read lazily with util.ndjson.iter_ndjson.
+        """
+        self.total_eval_outputs.close()
+        self.total_scoring_results.close()
+        results_tf = self.total_eval_outputs.path
+        scores_tf = self.total_scoring_results.path
+        if self.trace_file:
+            TRACER.write(self.trace_file)
+            TRACER.disable()
+        for endpoint, limit in rate_limit_report().items():
+            logging.info(f"Rate limit of {endpoint}: {limit}")
+        if self.rate_limits_file:
+            save_rate_limits(self.rate_limits_file)
+        if self.journal:
+            # The job is complete, so there is nothing left to resume.
+            self.journal.close(remove=True)
         return (
             self.job_id,
             self.run_time,
             results_tf,
             scores_tf,
         )
+
+
+def _log_failed_evaluation(sub_dataset, query_type, dialect, database, error):
+    logging.info(
+        f"Failed to evaluate {len(sub_dataset)} {query_type} queries "
+        + f"on DB {database} on {dialect}. Due to {error}"
+    )
+
+
+def _sub_dataset_key(dialect, database, db_config):
+    """Identifies the (dialect, database, db_config) that work is fairly queued by."""
+    return (
+        f"{dialect}/{database}/{db_config.get('db_type')}"
+        + f"@{db_config.get('database_path')}"
+    )
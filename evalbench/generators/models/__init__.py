@@ -2,7 +2,7 @@ from .alloydb_ai_nl import AlloyDBGenerator
 from databases import DB
 from generators.models.generator import QueryGenerator
 from .gemini import GeminiGenerator
-from .passthrough import NOOPGenerator
+from .passthrough import NOOPGenerator, SimulatedLatencyGenerator
 from .claude import ClaudeGenerator
 from util.config import load_yaml_config
 
@@ -22,6 +22,8 @@ def get_generator(global_models, model_config_path: str, db: DB = None):
             model = ClaudeGenerator(config)
         if config["generator"] == "noop":
             model = NOOPGenerator(config)
+        if config["generator"] == "simulated_latency":
+            model = SimulatedLatencyGenerator(config)
         if config["generator"] == "alloydb_ai_nl":
             model = AlloyDBGenerator(db, config)
         if not model:
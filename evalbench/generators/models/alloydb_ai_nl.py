@@ -5,10 +5,13 @@ from databases import DB
 class AlloyDBGenerator(QueryGenerator):
 
     def __init__(self, db, querygenerator_config):
-        super().__init__(querygenerator_config)
         self.db = db
+        super().__init__(querygenerator_config)
         self.name = "alloydb_ai_nl"
 
+    def endpoint(self, querygenerator_config) -> str:
+        return f"{querygenerator_config['generator']}:{self.db.db_type}:{self.db.db_path}"
+
     def get_sql(self, prompt: str) -> str:
         processed_nl_config = str(self.db.nl_config).replace("'", "''")
         processed_prompt = prompt.replace("'", "''")
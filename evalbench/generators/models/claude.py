@@ -1,7 +1,7 @@
 import logging
 from anthropic import AnthropicVertex
 from util.gcp import get_gcp_project, get_gcp_region
-from .generator import QueryGenerator
+from .generator import QueryGenerator, vertex_endpoint
 
 
 class ClaudeGenerator(QueryGenerator):
@@ -18,6 +18,9 @@ class ClaudeGenerator(QueryGenerator):
 
         self.client = AnthropicVertex(region=self.region, project_id=self.project_id)
 
+    def endpoint(self, querygenerator_config) -> str:
+        return vertex_endpoint(querygenerator_config)
+
     def generate_internal(self, prompt):
 
         try:
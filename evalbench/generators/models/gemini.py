@@ -6,7 +6,7 @@ from vertexai.generative_models._generative_models import (
     GenerationResponse,
 )
 from google.api_core.exceptions import ResourceExhausted
-from .generator import QueryGenerator
+from .generator import QueryGenerator, vertex_endpoint
 from util.sanitizer import sanitize_sql
 import logging
 
@@ -27,6 +27,9 @@ class GeminiGenerator(QueryGenerator):
         self.model = GenerativeModel(self.vertex_model)
         self.base_prompt = self.base_prompt
 
+    def endpoint(self, querygenerator_config) -> str:
+        return vertex_endpoint(querygenerator_config)
+
     def generate_internal(self, prompt):
         logger = logging.getLogger(__name__)
         try:
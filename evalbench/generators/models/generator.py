@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 import logging
-from util.rate_limit import rate_limit, ResourceExhaustedError
-from threading import Semaphore
+from concurrent.futures import Executor
+from util.aio import run_in_executor
+from util.gcp import get_gcp_project, get_gcp_region
+from util.rate_limit import get_rate_limiter, rate_limit, ResourceExhaustedError
 
 
 class QueryGenerator(ABC):
@@ -9,15 +11,24 @@ class QueryGenerator(ABC):
     def __init__(self, querygenerator_config):
         self.execs_per_minute = querygenerator_config.get("execs_per_minute") or None
         self.max_attempts = querygenerator_config.get("max_attempts") or 3
-        self.semaphore = Semaphore(self.execs_per_minute or 1)
+        # The budget is shared by every generator that calls the same endpoint.
+        self.rate_limiter = get_rate_limiter(
+            self.endpoint(querygenerator_config),
+            self.execs_per_minute,
+            querygenerator_config.get("execs_burst"),
+            querygenerator_config.get("adaptive_rate_limit", False),
+        )
+
+    def endpoint(self, querygenerator_config) -> str:
+        """Identifies the endpoint that the generator calls, for its rate limit."""
+        return querygenerator_config["generator"]
 
     def generate(self, prompt):
         try:
             return rate_limit(
                 (prompt,),
                 self.generate_internal,
-                self.execs_per_minute,
-                self.semaphore,
+                self.rate_limiter,
                 self.max_attempts,
             )
         except ResourceExhaustedError as e:
@@ -27,6 +38,23 @@ class QueryGenerator(ABC):
             )
             return ""
 
+    async def agenerate(self, prompt, executor: Executor | None = None):
+        # Async adapter for generate. Generators with a blocking client run on a
+        # worker thread of executor; override this for natively async clients.
+        return await run_in_executor(executor, self.generate, prompt)
+
     @abstractmethod
     def generate_internal(self, prompt):
         raise NotImplementedError("Subclasses must implement this method")
+
+
+def vertex_endpoint(querygenerator_config) -> str:
+    """The endpoint of a Vertex AI model, with the project and region it resolves to."""
+    return ":".join(
+        [
+            querygenerator_config["generator"],
+            querygenerator_config["vertex_model"],
+            get_gcp_project(querygenerator_config.get("gcp_project_id")),
+            get_gcp_region(querygenerator_config.get("gcp_region")),
+        ]
+    )
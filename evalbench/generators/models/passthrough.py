@@ -1,3 +1,5 @@
+import asyncio
+import time
 from .generator import QueryGenerator
 
 
@@ -9,3 +11,28 @@ class NOOPGenerator(QueryGenerator):
 
     def generate_internal(self, prompt):
         return ""
+
+
+class SimulatedLatencyGenerator(QueryGenerator):
+    """Returns the prompt as the generated SQL after a fixed, simulated latency.
+
+    Paired with a prompt generator that passes the golden SQL through as the
+    prompt, this stands in for a model that always answers correctly, which makes
+    runs deterministic and free of network calls, e.g. for benchmarks.
+    """
+
+    def __init__(self, querygenerator_config):
+        super().__init__(querygenerator_config)
+        self.name = "simulated_latency"
+        self.latency = querygenerator_config.get("simulated_latency_ms", 0) / 1000
+
+    def generate_internal(self, prompt):
+        time.sleep(self.latency)
+        return prompt
+
+    async def agenerate(self, prompt, executor=None):
+        # Behave like a natively async client, unless calls are rate limited.
+        if self.execs_per_minute:
+            return await super().agenerate(prompt, executor)
+        await asyncio.sleep(self.latency)
+        return prompt
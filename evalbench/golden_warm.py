@@ -0,0 +1,49 @@
+"""Precomputes the results of the golden queries of an experiment's dataset."""
+
+from collections.abc import Sequence
+from absl import app
+from absl import flags
+from util.config import load_yaml_config, set_session_configs
+from dataset.dataset import load_dataset_from_json, flatten_dataset
+from evaluator.golden_warmer import warm_golden_store
+import logging
+import os
+
+logging.getLogger().setLevel(logging.INFO)
+
+_EXPERIMENT_CONFIG = flags.DEFINE_string(
+    "experiment_config",
+    "configs/experiment_config.yaml",
+    "Path to the eval execution configuration file.",
+)
+
+
+def main(argv: Sequence[str]):
+    try:
+        session: dict = {}
+        parsed_config = load_yaml_config(_EXPERIMENT_CONFIG.value)
+        if parsed_config == "":
+            logging.error("No Eval Config Found.")
+            return
+
+        set_session_configs(session, parsed_config)
+        # Unlike a run, warming needs no model_config.
+        config = session["config"]
+        dataset = load_dataset_from_json(session["dataset_config"], config)
+        counts = warm_golden_store(
+            config,
+            session["db_configs"],
+            session["setup_config"],
+            flatten_dataset(dataset),
+        )
+        print(
+            f"{counts['succeeded']} golden queries succeeded, {counts['failed']} failed"
+        )
+    except Exception as e:
+        logging.error(e)
+    finally:
+        return os._exit(0)
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,207 @@
+"""Process-wide stage executors with per-key fair queuing."""
+
+import collections
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Callable, Hashable
+
+
+class FairExecutor:
+    """Fixed-size thread pool that round-robins between per-key queues.
+
+    Work is queued per key (e.g. per database). Whenever a worker is free it takes
+    the next item of the next key that still has pending work, so a key with a
+    long backlog cannot starve the others, and idle capacity always goes to
+    whichever key still has work. The number of threads never exceeds max_workers.
+
+    Attributes:
+      name: Name of the executor, used to name its threads.
+      max_workers: Number of worker threads.
+    """
+
+    def __init__(self, max_workers: int, name: str = "fair"):
+        self.name = name
+        self.max_workers = max_workers
+        self._pending: collections.OrderedDict[Hashable, collections.deque] = (
+            collections.OrderedDict()
+        )
+        # Number of items of each key that run right now.
+        self._running: collections.Counter = collections.Counter()
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._shutdown = False
+
+    def submit(
+        self, key: Hashable, fn: Callable, *args: Any, **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """Queues fn(*args, **kwargs) behind the other work of the same key.
+
+        Args:
+          key: The fairness key that the work is queued under.
+          fn: The callable to run.
+
+        Returns:
+          The future of the call.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError(f"Cannot submit to {self.name} after shutdown.")
+            if key not in self._pending:
+                self._pending[key] = collections.deque()
+            self._pending[key].append((future, fn, args, kwargs))
+            if len(self._threads) < self.max_workers:
+                self._start_worker()
+            self._condition.notify()
+        return future
+
+    def grow(self, max_workers: int):
+        """Raises the number of worker threads to max_workers, if it is lower."""
+        with self._condition:
+            if max_workers <= self.max_workers:
+                return
+            self.max_workers = max_workers
+            queued = sum(len(items) for items in self._pending.values())
+            while len(self._threads) < min(self.max_workers, queued):
+                self._start_worker()
+            self._condition.notify_all()
+
+    def bind(self, key: Hashable) -> "KeyedExecutor":
+        """Returns an executor-like view that submits all work under key."""
+        return KeyedExecutor(self, key)
+
+    def cancel(self, key: Hashable, wait: bool = True) -> int:
+        """Cancels the queued work of key; other keys are not affected.
+
+        Args:
+          key: The fairness key whose work is dropped.
+          wait: Whether to also wait for the work of key that already runs.
+
+        Returns:
+          The number of cancelled items.
+        """
+        with self._condition:
+            items = self._pending.pop(key, collections.deque())
+        for future, _, _, _ in items:
+            future.cancel()
+        if wait:
+            with self._condition:
+                while self._running[key]:
+                    self._condition.wait()
+        return len(items)
+
+    def pending(self) -> dict[Hashable, int]:
+        """Returns the number of queued (not yet running) items per key."""
+        with self._condition:
+            return {key: len(items) for key, items in self._pending.items()}
+
+    def shutdown(self, wait: bool = True):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _start_worker(self):
+        thread = threading.Thread(
+            target=self._work,
+            name=f"{self.name}_{len(self._threads)}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _next_item(self):
+        with self._condition:
+            while not self._pending:
+                if self._shutdown:
+                    return None
+                self._condition.wait()
+            key, items = next(iter(self._pending.items()))
+            item = items.popleft()
+            if items:
+                # Go to the back of the line so the other keys get their turn.
+                self._pending.move_to_end(key)
+            else:
+                del self._pending[key]
+            self._running[key] += 1
+            return key, item
+
+    def _work(self):
+        while True:
+            next_item = self._next_item()
+            if next_item is None:
+                return
+            key, (future, fn, args, kwargs) = next_item
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            finally:
+                with self._condition:
+                    self._running[key] -= 1
+                    if not self._running[key]:
+                        del self._running[key]
+                    self._condition.notify_all()
+
+
+class KeyedExecutor:
+    """A view on a FairExecutor with the ThreadPoolExecutor submit signature."""
+
+    def __init__(self, executor: FairExecutor, key: Hashable):
+        self.executor = executor
+        self.key = key
+
+    @property
+    def max_workers(self) -> int:
+        return self.executor.max_workers
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any):
+        return self.executor.submit(self.key, fn, *args, **kwargs)
+
+    def cancel(self, wait: bool = True) -> int:
+        return self.executor.cancel(self.key, wait)
+
+
+_STAGE_EXECUTORS: dict[str, FairExecutor] = {}
+_STAGE_EXECUTORS_LOCK = threading.Lock()
+
+
+def get_stage_executor(stage: str, max_workers: int) -> FairExecutor:
+    """Returns the process-wide executor of a stage, creating it on first use.
+
+    The executor has as many threads as the largest max_workers requested so far,
+    which is the global concurrency cap of that stage until the executors are shut
+    down.
+
+    Args:
+      stage: The stage name (e.g. "sqlgen").
+      max_workers: Number of threads that the caller needs.
+    """
+    with _STAGE_EXECUTORS_LOCK:
+        if stage not in _STAGE_EXECUTORS:
+            _STAGE_EXECUTORS[stage] = FairExecutor(max_workers, name=stage)
+        executor = _STAGE_EXECUTORS[stage]
+    if max_workers > executor.max_workers:
+        logging.info(
+            f"Growing the shared {stage} executor from {executor.max_workers} "
+            + f"to {max_workers} threads."
+        )
+        executor.grow(max_workers)
+    return executor
+
+
+def shutdown_stage_executors(wait: bool = True):
+    """Shuts down all the stage executors; later calls create new ones."""
+    with _STAGE_EXECUTORS_LOCK:
+        executors = list(_STAGE_EXECUTORS.values())
+        _STAGE_EXECUTORS.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
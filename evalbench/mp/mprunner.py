@@ -1,8 +1,13 @@
 """Multiprocessing runner."""
 
 import concurrent.futures
+import logging
+import threading
+import time
 from typing import Any
 
+from util import metrics
+from util.tracing import TRACER, item_args
 from work import work
 
 
@@ -19,27 +24,231 @@ def do_work(work_obj: work.Work, item_config: Any = None) -> Any:
     return work_obj.run(item_config)
 
 
+class RunnerStats:
+    """Live counters of a runner.
+
+    Attributes:
+      queued: Work items submitted but not started yet.
+      running: Work items currently running.
+      completed: Work items that finished (successfully or not).
+      failed: Work items that raised an exception.
+      total_wait_time: Seconds the completed items spent queued.
+      total_run_time: Seconds the completed items spent running.
+    """
+
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.total_wait_time / self.completed if self.completed else 0.0
+
+    @property
+    def mean_run_time(self) -> float:
+        return self.total_run_time / self.completed if self.completed else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "mean_wait_time": self.mean_wait_time,
+            "mean_run_time": self.mean_run_time,
+        }
+
+
 class MPRunner:
     """Multi-processing class that implements the threadpool based execution of work.
 
+    The runner owns a thread pool between start() and stop() (the constructor
+    starts it) and can be used as a context manager. When constructed with a
+    shared executor, the runner only submits to it and never shuts it down.
+
     Attributes:
+      name: Name of the runner, used to name its threads and in its stats.
       executor:
-      futures:
+      max_workers: Number of work items that run concurrently.
     """
 
-    def __init__(self, concurrent_tests: int = 10) -> None:
+    def __init__(
+        self, concurrent_tests: int = 10, executor: Any = None, name: str = "runner"
+    ) -> None:
         """Initialize the class.
 
         Args:
           concurrent_tests:
+          executor: Optional shared executor (e.g. a KeyedExecutor of a process-wide
+            FairExecutor) to submit to, instead of a dedicated thread pool.
+          name: Name of the runner.
         """
-        self.executor = concurrent.futures.ThreadPoolExecutor(concurrent_tests)
-        self.futures = []
+        self.name = name
+        self._owns_executor = executor is None
+        self.executor = executor
+        self.max_workers = executor.max_workers if executor else concurrent_tests
+        self._stats = RunnerStats()
+        self._stats_lock = threading.Lock()
+        self.start()
+
+    def start(self) -> "MPRunner":
+        """Starts the runner's own thread pool, if it is not running already."""
+        if self._owns_executor and self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix=self.name
+            )
+        return self
+
+    def stop(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """Stops the runner's own thread pool. Shared executors are left running.
+
+        Args:
+          wait: Whether to wait for the running work to finish.
+          cancel_pending: Whether to cancel the work that did not start yet,
+            instead of running it first. On a shared executor, this cancels the
+            work queued under the runner's key only, e.g. of a failed sub-dataset.
+        """
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+            self.executor = None
+        elif cancel_pending and self.executor is not None:
+            self.executor.cancel(wait=wait)
+
+    @property
+    def is_running(self) -> bool:
+        return self.executor is not None
+
+    def __enter__(self) -> "MPRunner":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
 
-    def execute_work(self, work_obj: work.Work) -> None:
+    def execute_work(self, work_obj: work.Work) -> concurrent.futures.Future:
         """Schedule to requested work.
 
         Args:
           work_obj: The work object.
+
+        Returns:
+          The future of the scheduled work.
+        """
+        if self.executor is None:
+            raise RuntimeError(f"Runner {self.name} was stopped.")
+        with self._stats_lock:
+            self._stats.queued += 1
+        return self.executor.submit(self._timed_work, work_obj, time.monotonic())
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the runner's stats."""
+        with self._stats_lock:
+            return {"name": self.name, **self._stats.to_dict()}
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats = RunnerStats()
+
+    def _timed_work(self, work_obj: work.Work, queued_at: float) -> Any:
+        started_at = time.monotonic()
+        stats = self._stats
+        with self._stats_lock:
+            stats.queued -= 1
+            stats.running += 1
+        metrics.STAGE_IN_FLIGHT.inc(stage=self.name)
+        failed = False
+        try:
+            return do_work(work_obj)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            finished_at = time.monotonic()
+            metrics.STAGE_IN_FLIGHT.dec(stage=self.name)
+            with self._stats_lock:
+                stats.running -= 1
+                stats.completed += 1
+                stats.failed += int(failed)
+                stats.total_wait_time += started_at - queued_at
+                stats.total_run_time += finished_at - started_at
+            eval_result = getattr(work_obj, "eval_result", None)
+            metrics.record_stage(
+                self.name,
+                eval_result,
+                started_at - queued_at,
+                finished_at - started_at,
+                failed,
+            )
+            TRACER.async_span(
+                f"{self.name} queue wait",
+                queued_at,
+                started_at,
+                "queue",
+                **item_args(eval_result),
+            )
+            TRACER.complete(
+                self.name, started_at, finished_at, "stage", **item_args(eval_result)
+            )
+
+
+class RunnerPool:
+    """Keeps idle runners around so their threads are reused across Evaluators.
+
+    Evaluators acquire a runner per stage and release it when they are done, so a
+    long running process only ever holds as many threads as the peak number of
+    concurrent Evaluators needs, instead of leaking idle pools for every call.
+    """
+
+    def __init__(self):
+        self._idle: dict[tuple[str, int], list[MPRunner]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name: str, concurrent_tests: int) -> MPRunner:
+        """Returns a started runner with fresh stats for the given stage and size."""
+        with self._lock:
+            idle = self._idle.get((name, concurrent_tests))
+            runner = idle.pop() if idle else None
+        if runner is None:
+            runner = MPRunner(concurrent_tests, name=name)
+        runner.reset_stats()
+        return runner.start()
+
+    def release(self, runner: MPRunner) -> None:
+        """Hands a runner back to the pool once all of its work is done.
+
+        Runners that may still have work in flight, e.g. of an evaluation that
+        failed, must be stopped instead.
         """
-        self.futures.append(self.executor.submit(do_work, work_obj))
+        if not runner._owns_executor or not runner.is_running:
+            return
+        with self._lock:
+            self._idle.setdefault((runner.name, runner.max_workers), []).append(
+                runner
+            )
+
+    def shutdown(self) -> None:
+        """Stops all idle runners."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for runners in idle.values():
+            for runner in runners:
+                runner.stop()
+
+
+RUNNER_POOL = RunnerPool()
+
+
+def log_runner_stats(runners: list[MPRunner], prefix: str = "") -> None:
+    """Logs the stats of the runners to help spot the bottleneck stage."""
+    for runner in runners:
+        stats = runner.stats()
+        logging.info(
+            f"{prefix}{stats['name']}: completed={stats['completed']} "
+            + f"failed={stats['failed']} queued={stats['queued']} "
+            + f"running={stats['running']} "
+            + f"mean_wait={stats['mean_wait_time']:.3f}s "
+            + f"mean_run={stats['mean_run_time']:.3f}s"
+        )
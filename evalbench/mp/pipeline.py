@@ -0,0 +1,157 @@
+"""Streaming pipeline that links MPRunner stages with bounded queues."""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from mp.mprunner import MPRunner
+from work import work
+
+# Marks the end of the stream for a stage; forwarded once all in-flight work is done.
+_END_OF_STREAM = object()
+
+
+class PipelineStage:
+    """A single stage of the streaming pipeline.
+
+    Attributes:
+      name: Name of the stage, used for logging.
+      runner: The MPRunner that executes the work of this stage.
+      make_work: Builds the Work object for an item. This is called on the stage
+        dispatcher thread and may block (e.g. waiting for a free DB connection).
+      on_done: Optional callback called with each item once the stage finished it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        runner: MPRunner,
+        make_work: Callable[[Any], work.Work],
+        on_done: Optional[Callable[[Any], None]] = None,
+    ):
+        self.name = name
+        self.runner = runner
+        self.make_work = make_work
+        self.on_done = on_done
+
+
+class StreamingPipeline:
+    """Moves each item to the next stage as soon as its previous stage finishes.
+
+    Every stage has a bounded inbound queue and a dispatcher thread that hands the
+    items to the stage's runner, keeping at most `runner.max_workers` items in
+    flight. Finished items go to a forwarder thread of the stage, which puts them
+    on the next stage's queue. When a stage is saturated its inbound queue fills
+    up and the upstream forwarder blocks on `put`, still holding the upstream
+    slot, which applies backpressure all the way to the source. Runner threads
+    never block on a full queue, so a saturated database does not tie up the
+    threads of executors shared with other databases.
+
+    Attributes:
+      stages: The ordered list of stages.
+      queue_size: Max number of items waiting in front of each stage.
+    """
+
+    def __init__(self, stages: list[PipelineStage], queue_size: int = 100):
+        self.stages = stages
+        self.queue_size = queue_size
+        self._queues: list[queue.Queue] = []
+        # Futures of finished work, per stage, that wait to be forwarded.
+        self._outboxes: list[queue.Queue] = []
+        self._results: Any = []
+        self._errors: list[Exception] = []
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable[Any], results: Any = None) -> Any:
+        """Streams the items through all the stages.
+
+        Args:
+          items: The items to feed into the first stage.
+          results: Optional list-like that finished items are appended to.
+
+        Returns:
+          The items that made it through the last stage, in completion order.
+        """
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        # Unbounded, but never holds more than the slots of the stage.
+        self._outboxes = [queue.Queue() for _ in self.stages]
+        self._results = [] if results is None else results
+        self._errors = []
+        threads = [
+            threading.Thread(
+                target=target,
+                args=(index,),
+                name=f"pipeline-{stage.name}{suffix}",
+                daemon=True,
+            )
+            for index, stage in enumerate(self.stages)
+            for target, suffix in ((self._dispatch, ""), (self._forward_done, "-forward"))
+        ]
+        for thread in threads:
+            thread.start()
+        for item in items:
+            self._queues[0].put(item)
+        self._queues[0].put(_END_OF_STREAM)
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+        return self._results
+
+    def _dispatch(self, index: int):
+        stage = self.stages[index]
+        inbound = self._queues[index]
+        slots = threading.Semaphore(stage.runner.max_workers)
+        while True:
+            item = inbound.get()
+            if item is _END_OF_STREAM:
+                break
+            slots.acquire()
+            try:
+                work_obj = stage.make_work(item)
+            except Exception as e:
+                self._record_error(e)
+                slots.release()
+                continue
+            future = stage.runner.execute_work(work_obj)
+            # Runs on the runner's thread, so it must not block.
+            future.add_done_callback(
+                lambda f, outbox=self._outboxes[index], slots=slots: outbox.put(
+                    (f, slots)
+                )
+            )
+        # Taking back every slot means that all in-flight work was forwarded.
+        for _ in range(stage.runner.max_workers):
+            slots.acquire()
+        self._outboxes[index].put(_END_OF_STREAM)
+
+    def _forward_done(self, index: int):
+        stage = self.stages[index]
+        outbox = self._outboxes[index]
+        while True:
+            done = outbox.get()
+            if done is _END_OF_STREAM:
+                self._forward(index, _END_OF_STREAM)
+                break
+            future, slots = done
+            try:
+                item = future.result()
+                if stage.on_done:
+                    stage.on_done(item)
+                # Blocks while the next stage is full, holding this stage's slot.
+                self._forward(index, item)
+            except Exception as e:
+                self._record_error(e)
+            finally:
+                slots.release()
+
+    def _forward(self, index: int, item: Any):
+        if index + 1 < len(self.stages):
+            self._queues[index + 1].put(item)
+        elif item is not _END_OF_STREAM:
+            with self._lock:
+                self._results.append(item)
+
+    def _record_error(self, error: Exception):
+        with self._lock:
+            self._errors.append(error)
@@ -0,0 +1,43 @@
+"""Process-wide process pools for CPU-bound stages."""
+
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+_PROCESS_POOLS: dict[str, concurrent.futures.ProcessPoolExecutor] = {}
+_PROCESS_POOLS_LOCK = threading.Lock()
+# Every worker is a whole interpreter with the evaluation modules imported, so
+# pools don't grow with the number of CPUs past this.
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def get_process_pool(
+    name: str, max_workers: int | None = None
+) -> concurrent.futures.ProcessPoolExecutor:
+    """Returns the process-wide process pool of a stage, creating it on first use.
+
+    The workers are spawned rather than forked, as the parent process runs many
+    threads (runners, DB connection pools) that a fork would copy mid-flight.
+
+    Args:
+      name: The stage name (e.g. "scoring").
+      max_workers: Number of worker processes if the pool does not exist yet.
+        Defaults to DEFAULT_MAX_WORKERS.
+    """
+    with _PROCESS_POOLS_LOCK:
+        if name not in _PROCESS_POOLS:
+            _PROCESS_POOLS[name] = concurrent.futures.ProcessPoolExecutor(
+                max_workers or DEFAULT_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _PROCESS_POOLS[name]
+
+
+def shutdown_process_pools(wait: bool = True):
+    """Shuts down all the process pools."""
+    with _PROCESS_POOLS_LOCK:
+        pools = list(_PROCESS_POOLS.values())
+        _PROCESS_POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
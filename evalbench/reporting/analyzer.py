@@ -31,9 +31,14 @@ def analyze_one_metric(
     else:
         df = df[df["comparator"] == metric_name]
         correct_results_count = len(df[df["score"] == metric_score])
+        # Unscored items (e.g. truncated results) count as neither right nor wrong.
+        unscored_results_count = int(df["score"].isna().sum())
+        if unscored_results_count:
+            logging.info(f"{metric_name}: \t{unscored_results_count} unscored")
+            original_df_size -= unscored_results_count
     logging.info(
         f"{metric_name}: \t{correct_results_count}/{original_df_size} = "
-        f"{round(correct_results_count / original_df_size * 100, 2)}%"
+        f"{round(correct_results_count / original_df_size * 100, 2) if original_df_size else 0}%"
     )
     return {
         "metric_name": metric_name,
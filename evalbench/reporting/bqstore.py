@@ -47,6 +47,7 @@ class BigQueryReporter(Reporter):
         self.results_table = "{}.results".format(self.dataset_id)
         self.scores_table = "{}.scores".format(self.dataset_id)
         self.summary_table = "{}.summary".format(self.dataset_id)
+        self.metrics_table = "{}.metrics".format(self.dataset_id)
 
     def store(self, results, type: STORETYPE):
         dataset = bigquery.Dataset(self.dataset_id)
@@ -70,6 +71,8 @@ class BigQueryReporter(Reporter):
             table = self.scores_table
         elif type == STORETYPE.SUMMARY:
             table = self.summary_table
+        elif type == STORETYPE.METRICS:
+            table = self.metrics_table
 
         # Chunk this to avoid BQ OOM
         job_config.write_disposition = bigquery.job.WriteDisposition.WRITE_APPEND  # type: ignore
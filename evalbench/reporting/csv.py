@@ -22,6 +22,10 @@ class CsvReporter(Reporter):
             file_path = (
                 f"{self.config.get('output_directory')}/{self.job_id}/summary.csv"
             )
+        elif type == STORETYPE.METRICS:
+            file_path = (
+                f"{self.config.get('output_directory')}/{self.job_id}/metrics.csv"
+            )
 
         file_name = os.path.basename(file_path)
         directory = os.path.dirname(file_path)
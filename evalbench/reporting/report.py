@@ -3,7 +3,7 @@ import pandas as pd
 import logging
 from abc import ABC, abstractmethod
 
-STORETYPE = Enum("StoreType", ["CONFIGS", "EVALS", "SCORES", "SUMMARY"])
+STORETYPE = Enum("StoreType", ["CONFIGS", "EVALS", "SCORES", "SUMMARY", "METRICS"])
 
 
 class Reporter(ABC):
@@ -20,6 +20,28 @@ class Reporter(ABC):
         pass
 
 
+def get_metrics_dataframe(metrics: dict, job_id, run_time):
+    """Flattens MetricsRegistry.to_dict() to one row per label set and statistic."""
+    rows = []
+    for metric_name, entries in metrics.items():
+        for entry in entries:
+            labels = ",".join(f"{k}={v}" for k, v in entry["labels"].items())
+            for statistic, value in entry.items():
+                if statistic == "labels":
+                    continue
+                rows.append(
+                    {
+                        "metric_name": metric_name,
+                        "labels": labels,
+                        "statistic": statistic,
+                        "value": float(value),
+                        "job_id": job_id,
+                        "run_time": run_time,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
 def get_dataframe(results):
     results_df = pd.DataFrame.from_dict(results, dtype="string")
     logging.info("Total Prompts: %d.", len(results_df))
@@ -9,10 +9,16 @@ import logging
 import traceback
 from typing import Any, Tuple
 
+from databases.resultset import ResultSet
+
 
 class Comparator(abc.ABC):
     """Base class for comparators."""
 
+    # Whether the score depends on the rows of the results, which can't be
+    # scored once the fetch policy of the DB truncated them.
+    compares_results = False
+
     def __init__(self, config: dict):
         """Initializes the Comparator with a config.
 
@@ -61,13 +67,14 @@ class ComparisonResult:
         comparison_error (Optional[Exception]): Exception object if an error
           occurred during the comparison. Defaults to None.
         comparison_logs (str): The logs of the comparison. Defaults to None.
-        score (int): The score of the comparison, ranging from 0 to 100.
+        score (Optional[int]): The score of the comparison, ranging from 0 to
+          100, or None if the item was left unscored (e.g. truncated results).
     """
 
     def __init__(
         self,
         comparator: Comparator,
-        score: int,
+        score: int | None,
         comparison_logs: str | None = None,
         comparison_error: Exception | None = None,
     ):
@@ -133,5 +140,33 @@ def convert_to_set(results: list[dict]):
         else:
             return item
 
+    if isinstance(results, ResultSet):
+        # Same as make_hashable of the row dicts, without building them.
+        return {
+            tuple(sorted(zip(columns, (make_hashable(v) for v in row))))
+            for columns, row in results.iter_rows()
+        }
     results_set = {make_hashable(d) for d in results}
     return results_set
+
+
+def row_tuples(results) -> list[tuple]:
+    """Returns the values of each row of a result, without the column names."""
+    if isinstance(results, ResultSet):
+        return results.tuples()
+    return [tuple(d.values()) for d in results]
+
+
+def truncated_results(eval_output_item) -> list[str]:
+    """Returns which of the golden and generated results were truncated.
+
+    Results fetched by the DBs are ResultSets that know it, results restored
+    from the journal are lists with the flag stored next to them.
+    """
+    truncated = []
+    for key in ("golden_result", "generated_result"):
+        if getattr(eval_output_item.get(key), "truncated", False) or (
+            eval_output_item.get(f"{key}_truncated")
+        ):
+            truncated.append(key)
+    return truncated
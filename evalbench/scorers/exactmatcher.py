@@ -20,6 +20,8 @@ class ExactMatcher(comparator.Comparator):
       2. config: the scorer config defined in the run config yaml file
     """
 
+    compares_results = True
+
     def __init__(self, config: dict):
         self.name = "exact_match"
         self.config = config
@@ -24,6 +24,7 @@ import logging
 
 from scorers import comparator
 from .util import make_hashable, with_cache_execute
+from databases.resultset import ResultSet
 from databases.util import get_cache_client
 
 
@@ -36,6 +37,8 @@ class LLMRater(comparator.Comparator):
         2. model_config: File that defines the configuration settings for the LLM model used in evaluation.
     """
 
+    compares_results = True
+
     def __init__(self, config: dict, global_models):
         self.name = "llmrater"
         self.exact_match_checker = exactmatcher.ExactMatcher({})
@@ -90,12 +93,16 @@ class LLMRater(comparator.Comparator):
         """
         seen_dicts = set()
         new_list = []
-        for d in output_list:
-            # Convert the dictionary to a hashable frozenset for efficient lookup
-            t = frozenset((k, make_hashable(v)) for k, v in d.items())
+        if isinstance(output_list, ResultSet):
+            items = output_list.iter_rows()
+        else:
+            items = ((d.keys(), d.values()) for d in output_list)
+        for columns, values in items:
+            # Convert the row to a hashable frozenset for efficient lookup
+            t = frozenset(zip(columns, (make_hashable(v) for v in values)))
             if t not in seen_dicts:
                 seen_dicts.add(t)
-                new_list.append(d)
+                new_list.append(dict(zip(columns, values)))
                 if len(new_list) == n:
                     break
         return new_list
@@ -17,6 +17,7 @@ Run configurations:
 
 from typing import Tuple
 
+from databases.resultset import ResultSet
 from scorers.comparator import Comparator
 from scorers.comparator import convert_to_set
 
@@ -31,6 +32,8 @@ class RecallMatcher(Comparator):
         3. score_type: one out of precision and recall which will be used as final score
     """
 
+    compares_results = True
+
     def __init__(self, config: dict):
         self.name = "recall_match"
         self.config = config
@@ -58,12 +61,8 @@ class RecallMatcher(Comparator):
         """
 
         # Filter out None values (assuming they shouldn't be considered)
-        golden_results = (
-            [x for x in golden_results if x is not None] if golden_results else []
-        )
-        generated_results = (
-            [x for x in generated_results if x is not None] if generated_results else []
-        )
+        golden_results = _without_none(golden_results)
+        generated_results = _without_none(generated_results)
 
         orig_golden_size = len(golden_results)
         orig_generated_size = len(generated_results)
@@ -118,3 +117,12 @@ class RecallMatcher(Comparator):
             golden_execution_result, generated_execution_result
         )
         return full_result[self.score_type] * 100, str(full_result)
+
+
+def _without_none(results):
+    if not results:
+        return []
+    if isinstance(results, ResultSet):
+        # ResultSets never hold None rows.
+        return results
+    return [x for x in results if x is not None]
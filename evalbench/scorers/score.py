@@ -9,7 +9,15 @@ from scorers import llmrater
 from scorers import returnedsql
 from scorers import executablesql
 from dataset.evaloutput import EvalOutput
+from databases.resultset import ResultSet
+import concurrent.futures
 import logging
+from util.tracing import span
+
+
+# Scorers that call a model. They are IO-bound and hold model clients, so they
+# always run on the scoring threads, even when scoring in worker processes.
+_MODEL_BACKED_SCORERS = {"llmrater"}
 
 
 def compare(
@@ -17,53 +25,112 @@ def compare(
     experiment_config: dict[str, str],
     scoring_results: list[dict],
     global_models,
+    process_pool: concurrent.futures.Executor | None = None,
 ):
     """Run comparators against eval output.
 
     Args:
       eval_output_item: EvalItemOutput object to compare.
       experiment_config: Config for the scorers to run.
+      process_pool: Optional process pool to run the deterministic comparators
+        in, so that CPU heavy comparisons of large results are not bound by the GIL.
     """
     scorers = experiment_config["scorers"]
-    comparators: list[comparator.Comparator] = []
-    if "exact_match" in scorers:
-        comparators.append(exactmatcher.ExactMatcher(scorers["exact_match"]))
-    if "recall_match" in scorers:
-        comparators.append(recallmatcher.RecallMatcher(scorers["recall_match"]))
-    if "set_match" in scorers:
-        comparators.append(setmatcher.SetMatcher(scorers["set_match"]))
-    if "llmrater" in scorers:
-        comparators.append(llmrater.LLMRater(scorers["llmrater"], global_models))
-    if "regexp_matcher" in scorers:
-        comparators.append(
-            generatedqueryregexpmatcher.GeneratedQueryRegexpMatcher(
-                scorers["regexp_matcher"]
-            )
+    if process_pool is None:
+        score_dicts = _compare(
+            eval_output_item, get_comparators(scorers, global_models)
         )
-    if "returned_sql" in scorers:
-        comparators.append(returnedsql.ReturnedSQL(scorers["returned_sql"]))
-    if "executable_sql" in scorers:
-        comparators.append(
-            executablesql.ExecutableGenerationScore(scorers["executable_sql"])
+        scoring_results.extend(score_dicts)
+        return
+
+    deterministic_scorers = {
+        name: config
+        for name, config in scorers.items()
+        if name not in _MODEL_BACKED_SCORERS
+    }
+    model_backed_scorers = {
+        name: config
+        for name, config in scorers.items()
+        if name in _MODEL_BACKED_SCORERS
+    }
+    future = process_pool.submit(
+        compare_packed, pack_eval_output(eval_output_item), deterministic_scorers
+    )
+    model_backed_score_dicts = iter(
+        _compare(eval_output_item, get_comparators(model_backed_scorers, global_models))
+    )
+    deterministic_score_dicts = iter(future.result())
+    # Merge the scores back in the order that the comparators run in threads.
+    scoring_results.extend(
+        next(
+            model_backed_score_dicts
+            if name in _MODEL_BACKED_SCORERS
+            else deterministic_score_dicts
         )
+        for name in _COMPARATORS
+        if name in scorers
+    )
+
+
+# The comparators of each scorer, in the order their scores are reported.
+_COMPARATORS = {
+    "exact_match": lambda config, _: exactmatcher.ExactMatcher(config),
+    "recall_match": lambda config, _: recallmatcher.RecallMatcher(config),
+    "set_match": lambda config, _: setmatcher.SetMatcher(config),
+    "llmrater": llmrater.LLMRater,
+    "regexp_matcher": lambda config, _: (
+        generatedqueryregexpmatcher.GeneratedQueryRegexpMatcher(config)
+    ),
+    "returned_sql": lambda config, _: returnedsql.ReturnedSQL(config),
+    "executable_sql": lambda config, _: executablesql.ExecutableGenerationScore(
+        config
+    ),
+}
+
 
+def get_comparators(scorers: dict, global_models) -> list[comparator.Comparator]:
+    """Builds the comparators that are enabled in the scorers config."""
+    return [
+        make_comparator(scorers[name], global_models)
+        for name, make_comparator in _COMPARATORS.items()
+        if name in scorers
+    ]
+
+
+def _compare(eval_output_item, comparators: list[comparator.Comparator]):
+    score_dicts = []
     for comp in comparators:
         score = 0
         comparison_result = comparator.ComparisonResult(comp, 0)
+        truncated = (
+            comparator.truncated_results(eval_output_item)
+            if comp.compares_results
+            else []
+        )
         try:
-            if eval_output_item["generated_sql"] is not None:
-                score, logs = comp.compare(
-                    eval_output_item["nl_prompt"],
-                    eval_output_item["golden_sql"],
-                    eval_output_item["query_type"],
-                    eval_output_item["golden_result"],
-                    eval_output_item.get("golden_eval_results", ""),
-                    eval_output_item["golden_error"],
-                    eval_output_item["generated_sql"],
-                    eval_output_item["generated_result"],
-                    eval_output_item.get("eval_results", ""),
-                    eval_output_item["generated_error"],
+            if truncated:
+                # Rows past the caps are missing, so neither a match nor a
+                # mismatch of the rest says anything; leave the item unscored.
+                score = None
+                comparison_result.score = None
+                comparison_result.comparison_logs = (
+                    f"Not scored: {' and '.join(truncated)} truncated by the fetch"
+                    + " caps of the DB (max_result_rows, max_result_bytes)."
                 )
+            elif eval_output_item["generated_sql"] is not None:
+                with span(comp.name, "scorer", id=eval_output_item["id"]):
+                    score, logs = comp.compare(
+                        eval_output_item["nl_prompt"],
+                        eval_output_item["golden_sql"],
+                        eval_output_item["query_type"],
+                        eval_output_item["golden_result"],
+                        eval_output_item.get("golden_eval_results", ""),
+                        eval_output_item["golden_error"],
+                        eval_output_item["generated_sql"],
+                        eval_output_item["generated_result"],
+                        eval_output_item.get("eval_results", ""),
+                        eval_output_item["generated_error"],
+                    )
                 comparison_result.score = score
                 comparison_result.comparison_logs = logs
         except Exception as e:
@@ -75,5 +142,68 @@ def compare(
         score_dict["dialects"] = eval_output_item["dialects"]
         score_dict["database"] = eval_output_item["database"]
         score_dict["job_id"] = eval_output_item["job_id"]
-        logging.debug("scoring: %d %s %d", score_dict["id"], comp.name, score)
-        scoring_results.append(score_dict)
+        logging.debug("scoring: %s %s %s", score_dict["id"], comp.name, score)
+        score_dicts.append(score_dict)
+    return score_dicts
+
+
+# The fields of an eval output that the comparators and score dicts read.
+_SCORED_FIELDS = [
+    "id",
+    "nl_prompt",
+    "golden_sql",
+    "query_type",
+    "golden_result",
+    "golden_eval_results",
+    "golden_error",
+    "generated_sql",
+    "generated_result",
+    "eval_results",
+    "generated_error",
+    "golden_result_truncated",
+    "generated_result_truncated",
+    "dialects",
+    "database",
+    "job_id",
+]
+_RESULT_FIELDS = [
+    "golden_result",
+    "golden_eval_results",
+    "generated_result",
+    "eval_results",
+]
+
+
+def pack_eval_output(eval_output_item) -> dict:
+    """Returns the scored fields of an eval output in a compact picklable form.
+
+    Results are sent as ResultSets, the column names plus a tuple per row instead
+    of a dict per row, so the column names are not pickled once for every row.
+    """
+    payload = {}
+    for field in _SCORED_FIELDS:
+        if field not in eval_output_item:
+            continue
+        value = eval_output_item[field]
+        if field in _RESULT_FIELDS:
+            value = _pack_rows(value)
+        payload[field] = value
+    return payload
+
+
+def compare_packed(payload: dict, scorers: dict) -> list[dict]:
+    """Runs the deterministic comparators on a packed eval output.
+
+    This runs in the scoring worker processes.
+    """
+    return _compare(payload, get_comparators(scorers, None))
+
+
+def _pack_rows(value):
+    # Results fetched by the DBs are ResultSets already, results restored from
+    # the journal are lists of dicts.
+    if not isinstance(value, list) or not value:
+        return value
+    if not all(isinstance(row, dict) for row in value):
+        return value
+    return ResultSet.from_records(value)
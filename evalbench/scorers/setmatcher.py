@@ -8,7 +8,7 @@ Run configurations: None
 from typing import Tuple
 
 from scorers import comparator
-from scorers.comparator import convert_to_set
+from scorers.comparator import convert_to_set, row_tuples
 
 
 class SetMatcher(comparator.Comparator):
@@ -20,6 +20,8 @@ class SetMatcher(comparator.Comparator):
         2. config: Scorer config defined in the run config yaml file
     """
 
+    compares_results = True
+
     def __init__(self, config: dict):
         self.name = "set_match"
         self.config = config
@@ -42,13 +44,9 @@ class SetMatcher(comparator.Comparator):
         if golden_error or generated_error:
             return 0, None
         else:
-            # Current results are a list of Dict. Converting to Tuple for set comparison
-            golden_execution_result_tuple = [
-                tuple(d.values()) for d in golden_execution_result
-            ]
-            generated_execution_result_tuple = [
-                tuple(d.values()) for d in generated_execution_result
-            ]
+            # Compare the values of the rows, ignoring the column names
+            golden_execution_result_tuple = row_tuples(golden_execution_result)
+            generated_execution_result_tuple = row_tuples(generated_execution_result)
             score = (
                 100
                 if set(golden_execution_result_tuple)
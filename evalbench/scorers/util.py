@@ -4,6 +4,7 @@ from typing import Any
 import logging
 import hashlib
 import pickle
+from util.metrics import CACHE_REQUESTS
 
 
 def with_cache_execute(
@@ -33,9 +34,11 @@ def with_cache_execute(
         cached_result = cache_client.get(query_hash)
         if cached_result is not None:  # Ensure the result is valid
             logging.debug("Found cached result for comparing prompt")
+            CACHE_REQUESTS.inc(cache="llmrater", result="hit")
             return pickle.loads(cached_result)
     except Exception as e:
         logging.warning(f"Failed to retrieve query from cache: {e}")
+    CACHE_REQUESTS.inc(cache="llmrater", result="miss")
 
     # Execute the method as the result is not cached
     try:
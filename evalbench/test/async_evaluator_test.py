@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import threading
+from queue import Queue
+
+import pytest
+
+from dataset.evalinput import EvalInputRequest
+from evaluator.async_evaluator import AsyncEvaluator
+
+
+class _Generator:
+    name = "noop"
+
+    def setup(self):
+        pass
+
+    def generate(self, prompt):
+        return prompt
+
+
+class _DB:
+    """DB whose queries fail, or block until released."""
+
+    def __init__(self, fail: bool, running: threading.Event, release: threading.Event):
+        self.fail = fail
+        self.running = running
+        self.release = release
+        self.finished = False
+        self.closed = False
+        self.closed_while_running = False
+
+    def execute(self, query, eval_query=None, use_cache=False, rollback=False):
+        if self.fail:
+            self.running.wait()
+            raise RuntimeError("query failed")
+        self.running.set()
+        self.release.wait()
+        self.finished = True
+        return [], None, None
+
+    def close_connections(self):
+        self.closed = True
+        if not self.finished:
+            self.closed_while_running = True
+
+
+def _eval_input(id):
+    return EvalInputRequest(
+        id=id,
+        query_type="dql",
+        database="db",
+        nl_prompt="",
+        dialects=["sqlite"],
+        golden_sql=["SELECT 1;"],
+        eval_query=[],
+        setup_sql=[],
+        cleanup_sql=[],
+        tags=[],
+        other={},
+        generated_sql="SELECT 1;",
+    )
+
+
+class TestAsyncEvaluator:
+
+    def test_failed_item_waits_for_running_queries_before_closing_dbs(self):
+        running = threading.Event()
+        release = threading.Event()
+        failing = _DB(True, running, release)
+        blocked = _DB(False, running, release)
+        db_queue = Queue()
+        db_queue.put(blocked)
+        db_queue.put(failing)
+        threading.Timer(0.2, release.set).start()
+
+        evaluator = AsyncEvaluator({"prompt_generator": "NOOPGenerator"})
+        with pytest.raises(RuntimeError):
+            asyncio.run(
+                evaluator.evaluate(
+                    [_eval_input("1"), _eval_input("2")],
+                    db_queue,
+                    _Generator(),
+                    _Generator(),
+                    "job",
+                    datetime.datetime.now(),
+                    None,
+                    {},
+                )
+            )
+        assert blocked.finished
+        assert blocked.closed and failing.closed
+        assert not blocked.closed_while_running
+        assert db_queue.empty()
+
+    def test_stages_run_as_many_blocking_calls_as_they_have_runners(self):
+        # Every call waits until all of them run at once, which the loop's
+        # default executor (at most 32 threads) could not do.
+        items = 40
+        barrier = threading.Barrier(items, timeout=5)
+
+        class _BlockingPromptGenerator(_Generator):
+            def generate(self, prompt):
+                barrier.wait()
+                return prompt
+
+        release = threading.Event()
+        release.set()
+        db_queue = Queue()
+        db_queue.put(_DB(False, threading.Event(), release))
+
+        evaluator = AsyncEvaluator(
+            {
+                "prompt_generator": "NOOPGenerator",
+                "runners": {"promptgen_runners": items},
+                "scorers": {},
+            }
+        )
+        eval_outputs, _ = asyncio.run(
+            evaluator.evaluate(
+                [_eval_input(str(i)) for i in range(items)],
+                db_queue,
+                _BlockingPromptGenerator(),
+                _Generator(),
+                "job",
+                datetime.datetime.now(),
+                None,
+                {},
+            )
+        )
+        assert len(eval_outputs) == items
+        assert all(
+            eval_output["prompt_generator_error"] is None
+            for eval_output in eval_outputs
+        )
@@ -0,0 +1,85 @@
+import json
+
+from databases import BQDB
+
+SETUP = [
+    """CREATE TABLE `{{dataset}}.posts` (
+  post_id INT64 NOT NULL,
+  title STRING,
+  is_active BOOL,
+  tags JSON,
+  score NUMERIC,
+  PRIMARY KEY(post_id) NOT ENFORCED
+);""",
+    """CREATE TABLE `{{dataset}}.users` (
+  user_id INT64 NOT NULL,
+  name STRING
+);""",
+]
+
+
+class FakeJob:
+
+    def result(self):
+        return []
+
+
+class FakeBigQueryClient:
+    """Records the load jobs and queries instead of calling BigQuery."""
+
+    def __init__(self):
+        self.loads = {}
+        self.queries = []
+
+    def load_table_from_file(self, file, table_id, job_config=None, location=None):
+        self.loads[table_id] = [json.loads(line) for line in file.read().splitlines()]
+        return FakeJob()
+
+    def query(self, query, job_config=None):
+        self.queries.append(query)
+        return FakeJob()
+
+
+def _bq_db(monkeypatch, client):
+    monkeypatch.setenv("EVAL_GCP_PROJECT_ID", "project")
+    return BQDB(
+        {
+            "db_type": "bigquery",
+            "database_path": "project",
+            "database_name": "blog",
+            "max_executions_per_minute": 1000,
+        },
+        client=client,
+    )
+
+
+class TestBigQueryLoad:
+
+    def test_one_load_job_per_table_with_typed_rows(self, monkeypatch):
+        client = FakeBigQueryClient()
+        db = _bq_db(monkeypatch, client)
+        db.insert_data(
+            {
+                "posts": [
+                    ["1", "'It''s'", "'1'", '\'["sql"]\'', "1.10"],
+                    ["2", "NULL", "false", "NULL", "2"],
+                ],
+                "users": [["1", "'Ann'"]],
+            },
+            SETUP,
+        )
+        assert client.loads["project.blog.posts"] == [
+            {"post_id": 1, "title": "It's", "is_active": True, "tags": ["sql"], "score": "1.10"},
+            {"post_id": 2, "title": None, "is_active": False, "tags": None, "score": "2"},
+        ]
+        assert client.loads["project.blog.users"] == [{"user_id": 1, "name": "Ann"}]
+        assert client.queries == []
+
+    def test_expressions_fall_back_to_insert_statements(self, monkeypatch):
+        client = FakeBigQueryClient()
+        db = _bq_db(monkeypatch, client)
+        db.insert_data({"users": [["1", "'Ann'"], ["2", "UPPER('bob')"]]}, SETUP)
+        assert client.loads["project.blog.users"] == [{"user_id": 1, "name": "Ann"}]
+        assert client.queries == [
+            "INSERT INTO `project.blog.users` VALUES (2, UPPER('bob'));"
+        ]
@@ -0,0 +1,77 @@
+import pytest
+
+from databases import get_database
+from databases.util import parse_sql_literal
+
+
+def _sqlite_db(tmp_path):
+    db = get_database(
+        {
+            "db_type": "sqlite",
+            "database_path": str(tmp_path),
+            "max_executions_per_minute": 1000,
+            "bulk_load_chunk_size": 2,
+        },
+        "bulk_load_test",
+    )
+    db.batch_execute(["CREATE TABLE t (id INTEGER, name TEXT, created TEXT);"])
+    return db
+
+
+class TestParseSQLLiteral:
+
+    def test_literals(self):
+        assert parse_sql_literal("'O''Brien'") == "O'Brien"
+        assert parse_sql_literal("'a,b'") == "a,b"
+        assert parse_sql_literal("NULL") is None
+        assert parse_sql_literal("TRUE") is True
+        assert parse_sql_literal("-42") == -42
+        assert parse_sql_literal("1.5e3") == 1500.0
+
+    def test_unsupported_literals(self):
+        with pytest.raises(ValueError):
+            parse_sql_literal("DATE('2024-01-01')")
+        with pytest.raises(ValueError):
+            parse_sql_literal("'C:\\temp'", backslash_escapes=True)
+
+
+class TestBulkLoad:
+
+    def test_bulk_load_streams_chunks(self, tmp_path):
+        db = _sqlite_db(tmp_path)
+        rows = ((i, f"name_{i}", None) for i in range(5))
+        assert db.bulk_load("t", rows) == 5
+        result, _, _ = db.execute("SELECT COUNT(*) AS n FROM t;")
+        assert result == [{"n": 5}]
+
+    def test_insert_data_falls_back_to_sql_for_expressions(self, tmp_path):
+        db = _sqlite_db(tmp_path)
+        db.insert_data(
+            {
+                "t": [
+                    ["1", "'it''s'", "NULL"],
+                    ["2", "'two'", "DATE('2024-01-01')"],
+                ]
+            }
+        )
+        result, _, _ = db.execute("SELECT * FROM t ORDER BY id;")
+        assert result == [
+            {"id": 1, "name": "it's", "created": None},
+            {"id": 2, "name": "two", "created": "2024-01-01"},
+        ]
+
+    def test_insert_data_keeps_the_row_order(self, tmp_path):
+        db = _sqlite_db(tmp_path)
+        db.insert_data(
+            {
+                "t": [
+                    ["3", "'three'", "NULL"],
+                    ["1", "'one'", "DATE('2024-01-01')"],
+                    ["4", "'four'", "NULL"],
+                    ["2", "'two'", "NULL"],
+                    ["5", "'five'", "DATE('2024-01-05')"],
+                ]
+            }
+        )
+        result, _, _ = db.execute("SELECT id FROM t;")
+        assert [row["id"] for row in result] == [3, 1, 4, 2, 5]
@@ -0,0 +1,78 @@
+import threading
+from mp.fairexecutor import (
+    FairExecutor,
+    get_stage_executor,
+    shutdown_stage_executors,
+)
+
+
+class TestFairExecutor:
+
+    def test_round_robin_between_keys(self):
+        executor = FairExecutor(1, name="test")
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def block():
+            started.set()
+            release.wait()
+
+        executor.submit("a", block)
+        started.wait()
+        futures = [executor.submit("a", order.append, f"a{i}") for i in range(3)]
+        futures.append(executor.submit("b", order.append, "b0"))
+        assert executor.pending() == {"a": 3, "b": 1}
+        release.set()
+        for future in futures:
+            future.result()
+        executor.shutdown()
+        assert order == ["a0", "b0", "a1", "a2"]
+
+    def test_thread_count_is_capped(self):
+        executor = FairExecutor(2, name="test")
+        futures = [
+            executor.bind(f"db{i % 5}").submit(threading.current_thread)
+            for i in range(50)
+        ]
+        threads = {future.result().name for future in futures}
+        executor.shutdown()
+        assert len(threads) <= 2
+
+    def test_exceptions_are_set_on_future(self):
+        executor = FairExecutor(1, name="test")
+        future = executor.submit("a", lambda: 1 / 0)
+        assert isinstance(future.exception(), ZeroDivisionError)
+        executor.shutdown()
+
+    def test_cancel_drops_the_queued_work_of_a_key(self):
+        executor = FairExecutor(1, name="test")
+        release = threading.Event()
+        finished = []
+
+        def block():
+            release.wait()
+            finished.append("a0")
+
+        running = executor.submit("a", block)
+        queued = [executor.submit("a", finished.append, f"a{i}") for i in range(1, 3)]
+        other = executor.submit("b", finished.append, "b0")
+        threading.Timer(0.1, release.set).start()
+        assert executor.cancel("a") == 2
+        # The running item of the key was waited for.
+        assert running.done() and finished[0] == "a0"
+        assert all(future.cancelled() for future in queued)
+        other.result()
+        executor.shutdown()
+        assert finished == ["a0", "b0"]
+
+    def test_stage_executor_grows_to_the_largest_request(self):
+        executor = get_stage_executor("fairexecutor_test", 2)
+        assert get_stage_executor("fairexecutor_test", 5) is executor
+        assert executor.max_workers == 5
+        assert executor.bind("a").max_workers == 5
+        get_stage_executor("fairexecutor_test", 1)
+        assert executor.max_workers == 5
+        shutdown_stage_executors()
+        assert get_stage_executor("fairexecutor_test", 1) is not executor
+        shutdown_stage_executors()
@@ -0,0 +1,144 @@
+from databases import get_database
+from databases import ResultSet
+from databases.util import FetchPolicy, fetch_bounded
+from reporting import analyzer
+from scorers import score
+from util import truncateExecutionOutputs
+
+
+class TestFetchBounded:
+
+    def test_rows_past_the_caps_are_counted(self):
+        rows = fetch_bounded(((i,) for i in range(10)), ("id",), FetchPolicy(max_rows=3))
+        assert rows == [{"id": 0}, {"id": 1}, {"id": 2}]
+        assert rows.truncated
+        assert rows.total_row_count == 10
+
+    def test_counting_stops_at_max_counted_rows(self):
+        class Rows:
+            def __init__(self):
+                self.fetched = 0
+                self.closed = False
+
+            def __iter__(self):
+                while True:
+                    self.fetched += 1
+                    yield (self.fetched,)
+
+            def close(self):
+                self.closed = True
+
+        rows = Rows()
+        result = fetch_bounded(
+            rows, ("id",), FetchPolicy(max_rows=3, max_counted_rows=10)
+        )
+        assert len(result) == 3
+        assert result.total_row_count == 10
+        assert result.total_row_count_capped
+        assert rows.fetched == 10
+        assert rows.closed
+
+    def test_byte_cap(self):
+        rows = fetch_bounded(
+            (("x" * 100,) for _ in range(5)), ("name",), FetchPolicy(max_bytes=500)
+        )
+        assert len(rows) == 2
+        assert rows.truncated
+
+    def test_statements_share_the_caps(self):
+        rows = ResultSet()
+        policy = FetchPolicy(max_rows=3)
+        fetch_bounded([(1,), (2,)], ("id",), policy, rows)
+        fetch_bounded([(3,), (4,)], ("id",), policy, rows)
+        assert [row["id"] for row in rows] == [1, 2, 3]
+        assert rows.total_row_count == 4
+
+    def test_reported_remainder_counts_the_rows_the_caps_dropped(self):
+        rows = fetch_bounded([(i,) for i in range(5)], ("id",), FetchPolicy(max_rows=2))
+        eval_output = {"generated_result": rows}
+        truncateExecutionOutputs(
+            eval_output, {"reporting": {"truncate_execution_outputs": 3}}
+        )
+        assert eval_output["generated_result"].endswith("...and 3 more items truncated")
+
+    def test_sqlite_query_is_bounded(self, tmp_path):
+        db = get_database(
+            {
+                "db_type": "sqlite",
+                "database_path": str(tmp_path),
+                "max_executions_per_minute": 1000,
+                "max_result_rows": 5,
+            },
+            "fetch_policy_test",
+        )
+        db.batch_execute(
+            ["CREATE TABLE t (id INTEGER);"]
+            + [f"INSERT INTO t VALUES ({i});" for i in range(10)]
+        )
+        result, _, error = db.execute("SELECT a.id FROM t a, t b;")
+        assert error is None
+        assert len(result) == 5
+        assert result.truncated
+        assert result.total_row_count == 100
+
+
+def _eval_output(golden_result, generated_result):
+    return {
+        "id": 1,
+        "nl_prompt": "All ids",
+        "golden_sql": "SELECT id FROM t;",
+        "query_type": "dql",
+        "golden_result": golden_result,
+        "golden_eval_results": "",
+        "golden_error": None,
+        "generated_sql": "SELECT id FROM t;",
+        "generated_result": generated_result,
+        "eval_results": "",
+        "generated_error": None,
+        "dialects": ["sqlite"],
+        "database": "db",
+        "job_id": "job",
+    }
+
+
+class TestTruncatedResultsScoring:
+
+    def test_truncated_results_are_not_scored_as_matches(self):
+        policy = FetchPolicy(max_rows=2)
+        golden_result = fetch_bounded([(1,), (2,), (3,)], ("id",), policy)
+        generated_result = fetch_bounded([(1,), (2,), (4,)], ("id",), policy)
+        scores: list = []
+        score.compare(
+            _eval_output(golden_result, generated_result),
+            {"scorers": {"exact_match": None, "set_match": None, "returned_sql": None}},
+            scores,
+            None,
+        )
+        by_comparator = {
+            score_dict["comparator"]: score_dict for score_dict in scores
+        }
+        assert by_comparator["exact_match"]["score"] is None
+        assert "truncated" in by_comparator["set_match"]["comparison_logs"]
+        assert by_comparator["set_match"]["score"] is None
+        # Scorers of the query only still score.
+        assert by_comparator["returned_sql"]["score"] == 100
+
+    def test_truncation_flag_of_restored_results(self):
+        eval_output = _eval_output([{"id": 1}], [{"id": 1}])
+        eval_output["generated_result_truncated"] = True
+        scores: list = []
+        score.compare(eval_output, {"scorers": {"set_match": None}}, scores, None)
+        assert scores[0]["score"] is None
+
+    def test_unscored_items_are_left_out_of_the_accuracy(self):
+        policy = FetchPolicy(max_rows=2)
+        truncated = fetch_bounded([(1,), (2,), (3,)], ("id",), policy)
+        scores: list = []
+        for id, result in ((1, [{"id": 1}]), (2, [{"id": 2}]), (3, truncated)):
+            eval_output = _eval_output(result, result)
+            eval_output["id"] = id
+            score.compare(eval_output, {"scorers": {"set_match": None}}, scores, None)
+        _, summary = analyzer.analyze_result(scores, {"scorers": ["set_match"]})
+        set_match = summary[summary["metric_name"] == "set_match"].iloc[0]
+        assert set_match["correct_results_count"] == 2
+        assert set_match["total_results_count"] == 2
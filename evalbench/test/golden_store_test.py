@@ -0,0 +1,89 @@
+import asyncio
+from queue import Queue
+
+import pytest
+
+from databases import get_database, get_golden_store
+from work.sqlexecwork import SQLExecWork
+
+
+class _Queue:
+    def put(self, db):
+        pass
+
+
+def _eval_result(golden_sql):
+    return {
+        "id": "1",
+        "query_type": "dql",
+        "sql_generator_error": None,
+        "generated_sql": "SELECT 1;",
+        "golden_sql": golden_sql,
+        "eval_query": [],
+    }
+
+
+def _db_and_config(tmp_path):
+    db = get_database(
+        {
+            "db_type": "sqlite",
+            "database_path": str(tmp_path),
+            "max_executions_per_minute": 1000,
+            "setup_fingerprint": "fingerprint",
+        },
+        "golden_store_test",
+    )
+    db.batch_execute(["CREATE TABLE t (id INTEGER);", "INSERT INTO t VALUES (1);"])
+    config = {
+        "prompt_generator": "NOOPGenerator",
+        "golden_store": True,
+        "golden_store_path": str(tmp_path / "golden.sqlite"),
+    }
+    return db, config
+
+
+class TestGoldenStore:
+
+    def test_golden_results_are_read_from_the_store(self, tmp_path):
+        db, config = _db_and_config(tmp_path)
+        SQLExecWork(db, config, _eval_result("SELECT id FROM t;"), _Queue()).run()
+        SQLExecWork(
+            db, config, _eval_result("SELECT id, RANDOM() FROM t;"), _Queue()
+        ).run()
+        db.batch_execute(["INSERT INTO t VALUES (2);"])
+
+        stored = SQLExecWork(db, config, _eval_result("SELECT id FROM t;"), _Queue())
+        assert stored.run()["golden_result"] == [{"id": 1}]
+        executed = SQLExecWork(
+            db, config, _eval_result("SELECT id, RANDOM() FROM t;"), _Queue()
+        )
+        assert len(executed.run()["golden_result"]) == 2
+        assert get_golden_store({}) is None
+
+    def test_sync_and_async_runs_share_the_store(self, tmp_path):
+        db, config = _db_and_config(tmp_path)
+        asyncio.run(
+            SQLExecWork(db, config, _eval_result("SELECT id FROM t;"), None).arun()
+        )
+        db.batch_execute(["INSERT INTO t VALUES (2);"])
+
+        stored = SQLExecWork(db, config, _eval_result("SELECT id FROM t;"), _Queue())
+        assert stored.run()["golden_result"] == [{"id": 1}]
+        stored = asyncio.run(
+            SQLExecWork(db, config, _eval_result("SELECT id FROM t;"), None).arun()
+        )
+        assert stored["golden_result"] == [{"id": 1}]
+        assert stored["golden_error"] is None
+
+    def test_db_is_returned_when_the_store_fails(self, tmp_path, monkeypatch):
+        db, config = _db_and_config(tmp_path)
+        db_queue = Queue()
+        work = SQLExecWork(db, config, _eval_result("SELECT id FROM t;"), db_queue)
+
+        def fail(key):
+            raise ValueError("corrupt entry")
+
+        monkeypatch.setattr(work.golden_store, "get", fail)
+        with pytest.raises(ValueError):
+            work.run()
+        assert db_queue.get_nowait() is db
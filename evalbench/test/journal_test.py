@@ -0,0 +1,155 @@
+import json
+import os
+import time
+
+from databases import ResultSet
+from util import journal as journal_module
+from util.journal import Journal
+from work import Work
+from work.journalwork import JournaledWork, ReplayWork, get_stage_work
+
+
+class _StageWork(Work):
+    """Sets fields on the eval output, like the Work of a stage."""
+
+    def __init__(self, eval_output: dict, fields: dict, scores: list | None = None):
+        self.eval_result = eval_output
+        self.fields = fields
+        self.scores = scores
+
+    def run(self, work_config=None) -> dict:
+        self.eval_result.update(self.fields)
+        return self.eval_result
+
+
+def _eval_output(item_id):
+    return {"id": item_id, "query_type": "dql", "job_id": "job", "run_time": "now"}
+
+
+def _run_item(journal, key, eval_output, scoring_results):
+    """Runs the stages of an item, or replays them from the journal."""
+    stages = [
+        ("promptgen", {"generated_prompt": "prompt"}, None),
+        ("sqlgen", {"generated_sql": "SELECT 1;", "sql_generator_error": None}, None),
+        (
+            "sqlexec",
+            {
+                "golden_result": ResultSet(("n",), [(1,)]),
+                "generated_result": ResultSet(("n",), [(1,)]),
+                "golden_error": None,
+                "generated_error": None,
+            },
+            None,
+        ),
+        ("scoring", {}, [{"id": eval_output["id"], "score": 100}]),
+    ]
+    ran = []
+    for stage, fields, scores in stages:
+
+        def make_work(eval_output, stage=stage, fields=fields, scores=scores):
+            ran.append(stage)
+            return _StageWork(eval_output, fields, scores)
+
+        work = get_stage_work(
+            journal, key, stage, eval_output, make_work, scoring_results
+        )
+        eval_output = work.run()
+    return ran
+
+
+class TestJournal:
+
+    def test_records_compact_entries(self, tmp_path):
+        journal = Journal(str(tmp_path), "job")
+        eval_output = _eval_output(1)
+        _run_item(journal, "db/dql#1", eval_output, [])
+        journal.close()
+
+        with open(journal.path) as f:
+            entries = [json.loads(line) for line in f]
+        assert [entry["stage"] for entry in entries] == ["sqlgen", "scoring"]
+        assert entries[0]["fields"] == {
+            "generated_sql": "SELECT 1;",
+            "sql_generator_error": None,
+        }
+        # Neither prompts nor results are journaled.
+        for entry in entries:
+            assert "generated_prompt" not in entry["fields"]
+            assert "golden_result" not in entry["fields"]
+        assert entries[1]["scores"] == [{"id": 1, "score": 100}]
+
+    def test_entries_are_flushed_without_further_records(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(journal_module, "_FLUSH_INTERVAL", 0.01)
+        journal = Journal(str(tmp_path), "job")
+        journal.record("db/dql#1", "sqlgen", {"generated_sql": "SELECT 1;"})
+        deadline = time.monotonic() + 5
+        while os.path.getsize(journal.path) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        reopened = Journal(str(tmp_path), "job")
+        assert len(reopened) == 1
+        reopened.close()
+        journal.close(remove=True)
+
+    def test_reads_back_entries_and_ignores_partial_lines(self, tmp_path):
+        journal = Journal(str(tmp_path), "job")
+        journal.record("db/dql#1", "sqlgen", {"generated_sql": "SELECT 1;"})
+        journal.record("db/dql#2", "sqlgen", {"generated_sql": "SELECT 2;"})
+        journal.record("db/dql#2", "scoring", {"generated_error": None}, [{"id": 2}])
+        journal.close()
+        with open(journal.path, "a") as f:
+            f.write('{"key": "db/dql#3", "stage": "scor')
+
+        journal = Journal(str(tmp_path), "job")
+        assert len(journal) == 2
+        assert journal.is_done("db/dql#1", "sqlgen")
+        assert not journal.is_done("db/dql#1", "sqlexec")
+        assert journal.is_done("db/dql#2", "sqlexec")
+        assert journal.restore("db/dql#2") == (
+            {"generated_sql": "SELECT 2;", "generated_error": None},
+            [{"id": 2}],
+        )
+        # Entries are appended after the partial line, on a line of their own.
+        journal.record("db/dql#3", "sqlgen", {"generated_sql": "SELECT 3;"})
+        journal.close()
+        assert len(Journal(str(tmp_path), "job")) == 3
+
+    def test_resume_skips_completed_items(self, tmp_path):
+        journal = Journal(str(tmp_path), "job")
+        _run_item(journal, "db/dql#1", _eval_output(1), [])
+        journal.record("db/dql#2", "sqlgen", {"generated_sql": "SELECT 2;"})
+        journal.close()
+
+        journal = Journal(str(tmp_path), "job")
+        scoring_results: list = []
+        scored = _eval_output(1)
+        assert _run_item(journal, "db/dql#1", scored, scoring_results) == []
+        assert scored["generated_sql"] == "SELECT 1;"
+        assert scored["replayed_from_journal"]
+        assert scoring_results == [{"id": 1, "score": 100}]
+
+        # Only the SQL generation of an unscored item is replayed.
+        unscored = _eval_output(2)
+        assert _run_item(journal, "db/dql#2", unscored, scoring_results) == [
+            "promptgen",
+            "sqlexec",
+            "scoring",
+        ]
+        assert unscored["generated_sql"] == "SELECT 2;"
+        assert "replayed_from_journal" not in unscored
+        journal.close(remove=True)
+
+    def test_only_journaled_stages_are_wrapped(self, tmp_path):
+        journal = Journal(str(tmp_path), "job")
+        eval_output = _eval_output(1)
+
+        def make_work(eval_output):
+            return _StageWork(eval_output, {})
+
+        work = get_stage_work(journal, "k", "promptgen", eval_output, make_work)
+        assert isinstance(work, _StageWork)
+        work = get_stage_work(journal, "k", "sqlgen", eval_output, make_work)
+        assert isinstance(work, JournaledWork)
+        work.run()
+        work = get_stage_work(journal, "k", "sqlgen", eval_output, make_work)
+        assert isinstance(work, ReplayWork)
+        journal.close(remove=True)
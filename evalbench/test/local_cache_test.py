@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from databases import get_database
+from databases.util import get_cache_client
+from util.cache import LocalCache
+
+
+# Importing util starts threads that keep the process alive, hence os._exit.
+_SET_IN_PROCESS = """
+import os, sys
+from util.cache import LocalCache
+LocalCache(sys.argv[1]).set("process", b"from another process")
+os._exit(0)
+"""
+
+
+class TestLocalCache:
+
+    def test_get_and_set(self, tmp_path):
+        cache = LocalCache(str(tmp_path / "cache.sqlite"))
+        assert cache.get("key") is None
+        cache.set("key", b"value")
+        assert cache.get("key") == b"value"
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.sets) == (1, 1, 1)
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path):
+        cache = LocalCache(str(tmp_path / "cache.sqlite"), max_bytes=300)
+        for key in "abc":
+            cache.set(key, b"x" * 100)
+            time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("d", b"x" * 100)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("d") is not None
+        assert cache.size_bytes() <= 300
+        assert cache.stats().evictions >= 1
+
+    def test_entries_expire(self, tmp_path):
+        cache = LocalCache(str(tmp_path / "cache.sqlite"), ttl=60)
+        cache.set("old", b"value", ex=-1)
+        cache.set("new", b"value")
+        assert cache.get("old") is None
+        assert cache.get("new") == b"value"
+
+    def test_total_size_is_kept_without_summing_the_entries(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        cache = LocalCache(path, ttl=60)
+        cache.set("a", b"x" * 10)
+        cache.set("b", b"x" * 20)
+        cache.set("a", b"x" * 5)
+        cache.set("old", b"x" * 7, ex=-1)
+        assert cache.size_bytes() == 25
+        assert cache.get("old") is None
+        cache.delete("b")
+        assert cache.size_bytes() == 5
+        cache.clear()
+        assert cache.size_bytes() == 0
+
+    def test_total_size_of_a_file_without_it(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        LocalCache(path).set("a", b"x" * 10)
+        with sqlite3.connect(path) as connection:
+            connection.execute("DROP TABLE meta")
+        assert LocalCache(path).size_bytes() == 10
+
+    def test_threads_and_processes_share_the_file(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        cache = LocalCache(path)
+        threads = [
+            threading.Thread(target=cache.set, args=(f"key{i}", b"value"))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        subprocess.run(
+            [sys.executable, "-c", _SET_IN_PROCESS, path],
+            cwd=os.path.dirname(os.path.dirname(__file__)),
+            check=True,
+            timeout=60,
+        )
+        assert cache.count() == 9
+        assert cache.get("process") == b"from another process"
+
+    def test_sqlite_query_results_are_cached(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        db = get_database(
+            {
+                "db_type": "sqlite",
+                "database_path": str(tmp_path),
+                "max_executions_per_minute": 1000,
+                "cache_backend": "local",
+                "local_cache_path": path,
+                # As passed on by the DB that seeded the database.
+                "setup_fingerprint": "fingerprint",
+            },
+            "local_cache_test",
+        )
+        assert db.cache_client is get_cache_client(
+            {"cache_backend": "local", "local_cache_path": path}
+        )
+        db.batch_execute(["CREATE TABLE t (id INTEGER);", "INSERT INTO t VALUES (1);"])
+        assert db.execute("SELECT id FROM t;", use_cache=True)[0] == [{"id": 1}]
+        db.batch_execute(["DELETE FROM t;"])
+        assert db.execute("SELECT id FROM t;", use_cache=True)[0] == [{"id": 1}]
+        assert os.path.exists(path)
@@ -0,0 +1,30 @@
+from util.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+
+    def test_histogram_summary_and_quantiles(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds")
+        for value in [0.1] * 9 + [1.0]:
+            histogram.observe(value, stage="sqlexec")
+        summary = histogram.summary(stage="sqlexec")
+        assert summary["count"] == 10
+        assert abs(summary["sum"] - 1.9) < 1e-9
+        assert 0.05 <= summary["p50"] <= 0.1
+        assert 0.5 <= summary["p99"] <= 1.0
+        assert histogram.summary(stage="scoring")["count"] == 0
+
+    def test_render_prometheus(self):
+        registry = MetricsRegistry()
+        registry.counter("errors_total", "Errors.").inc(stage="sqlgen")
+        registry.gauge("in_flight").inc(2, stage="scoring")
+        registry.histogram("run_seconds").observe(0.002, stage="scoring")
+        text = registry.render_prometheus()
+        assert "# TYPE errors_total counter" in text
+        assert 'errors_total{stage="sqlgen"} 1' in text
+        assert 'in_flight{stage="scoring"} 2' in text
+        assert 'run_seconds_bucket{stage="scoring",le="0.001"} 0' in text
+        assert 'run_seconds_bucket{stage="scoring",le="0.005"} 1' in text
+        assert 'run_seconds_bucket{stage="scoring",le="+Inf"} 1' in text
+        assert 'run_seconds_count{stage="scoring"} 1' in text
@@ -0,0 +1,79 @@
+import datetime
+import queue
+import threading
+
+import pytest
+
+from evaluator.evaluator import Evaluator
+from mp.fairexecutor import FairExecutor
+from mp.mprunner import MPRunner, RunnerPool, RUNNER_POOL
+from work.work import Work
+
+
+class _BlockingWork(Work):
+
+    def __init__(self, release: threading.Event):
+        self.release = release
+
+    def run(self, work_config=None):
+        self.release.wait()
+        return "done"
+
+
+class _FailingGenerator:
+
+    def setup(self):
+        raise RuntimeError("setup failed")
+
+
+class TestMPRunner:
+
+    def test_stop_cancels_pending_work(self):
+        release = threading.Event()
+        runner = MPRunner(1, name="mprunner_test")
+        running = runner.execute_work(_BlockingWork(release))
+        pending = runner.execute_work(_BlockingWork(release))
+        threading.Timer(0.1, release.set).start()
+        runner.stop(wait=True, cancel_pending=True)
+        assert running.result() == "done"
+        assert pending.cancelled()
+        assert not runner.is_running
+
+    def test_stop_cancels_pending_work_of_its_key_on_a_shared_executor(self):
+        executor = FairExecutor(1, name="mprunner_test")
+        release = threading.Event()
+        runner = MPRunner(executor=executor.bind("a"), name="mprunner_test")
+        running = runner.execute_work(_BlockingWork(release))
+        pending = runner.execute_work(_BlockingWork(release))
+        other = executor.submit("b", lambda: "other")
+        threading.Timer(0.1, release.set).start()
+        runner.stop(wait=True, cancel_pending=True)
+        assert running.result() == "done"
+        assert pending.cancelled()
+        assert other.result() == "other"
+        executor.shutdown()
+
+    def test_released_runners_are_reused(self):
+        pool = RunnerPool()
+        runner = pool.acquire("mprunner_test", 2)
+        pool.release(runner)
+        assert pool.acquire("mprunner_test", 2) is runner
+        pool.shutdown()
+
+    def test_runners_of_a_failed_evaluation_are_not_pooled(self):
+        evaluator = Evaluator({"runners": {"promptgen_runners": 3}})
+        with pytest.raises(RuntimeError):
+            evaluator.evaluate(
+                [],
+                queue.Queue(),
+                _FailingGenerator(),
+                None,
+                "job",
+                datetime.datetime.now(),
+                None,
+                {},
+            )
+        assert not evaluator.promptrunner.is_running
+        runner = RUNNER_POOL.acquire("promptgen", 3)
+        assert runner is not evaluator.promptrunner
+        runner.stop()
@@ -0,0 +1,60 @@
+import databases.postgres
+from databases.postgres import PGDB
+
+
+class _FakeConnector:
+    """Like the Cloud SQL Connector, can't connect once it was closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    def connect(self, *args, **kwargs):
+        assert not self.closed, "connector was closed"
+        return "connection"
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeAdminDB:
+
+    def __init__(self):
+        self.queries = []
+
+    def _execute_auto_commit(self, query):
+        self.queries.append(query)
+        return None, None
+
+
+def _pg_db(monkeypatch):
+    monkeypatch.setattr(databases.postgres, "Connector", _FakeConnector)
+    db = PGDB(
+        {
+            "db_type": "postgres",
+            "database_path": "project:region:instance",
+            "database_name": "tmp_db",
+            "user_name": "user",
+            "password": "password",
+            "max_executions_per_minute": 1000,
+            "is_tmp_db": True,
+        }
+    )
+    db.admin_db = _FakeAdminDB()
+    return db
+
+
+class TestPGSnapshot:
+
+    def test_connects_again_after_snapshot_and_restore(self, monkeypatch):
+        db = _pg_db(monkeypatch)
+        assert db.create_snapshot()
+        # What the engine calls to open its next connection.
+        assert db.engine.pool._creator() == "connection"
+        db.restore_snapshot()
+        assert db.engine.pool._creator() == "connection"
+        assert db.admin_db.queries == [
+            "DROP DATABASE IF EXISTS tmp_db_snapshot;",
+            "CREATE DATABASE tmp_db_snapshot TEMPLATE tmp_db;",
+            "DROP DATABASE IF EXISTS tmp_db WITH (FORCE);",
+            "CREATE DATABASE tmp_db TEMPLATE tmp_db_snapshot;",
+        ]
@@ -0,0 +1,62 @@
+import threading
+
+from mp.fairexecutor import FairExecutor
+from mp.mprunner import MPRunner
+from mp.pipeline import PipelineStage, StreamingPipeline
+from work.work import Work
+
+
+class _EchoWork(Work):
+
+    def run(self, work_config=None):
+        return self.item
+
+
+class TestStreamingPipeline:
+
+    def test_items_go_through_every_stage(self):
+        pipeline = StreamingPipeline(
+            [
+                PipelineStage("first", MPRunner(2, name="first"), _EchoWork),
+                PipelineStage("second", MPRunner(2, name="second"), _EchoWork),
+            ],
+            queue_size=1,
+        )
+        assert sorted(pipeline.run(range(20))) == list(range(20))
+
+    def test_full_downstream_queue_does_not_block_shared_threads(self):
+        executor = FairExecutor(1, name="pipeline_test")
+        release = threading.Event()
+
+        def blocked_work(item):
+            release.wait()
+            return _EchoWork(item)
+
+        # The second stage of "a" does not take items, so its queue fills up.
+        blocked = StreamingPipeline(
+            [
+                PipelineStage(
+                    "first", MPRunner(executor=executor.bind("a"), name="a"), _EchoWork
+                ),
+                PipelineStage("second", MPRunner(1, name="second"), blocked_work),
+            ],
+            queue_size=1,
+        )
+        other = StreamingPipeline(
+            [PipelineStage("first", MPRunner(executor=executor.bind("b"), name="b"), _EchoWork)]
+        )
+        blocked_thread = threading.Thread(target=blocked.run, args=(range(5),))
+        blocked_thread.start()
+        results = []
+        other_thread = threading.Thread(
+            target=lambda: results.extend(other.run(range(5)))
+        )
+        other_thread.start()
+        other_thread.join(timeout=5)
+        finished = not other_thread.is_alive()
+        release.set()
+        blocked_thread.join()
+        other_thread.join()
+        executor.shutdown()
+        assert finished
+        assert sorted(results) == list(range(5))
@@ -0,0 +1,60 @@
+import threading
+
+from mp.processpool import (
+    DEFAULT_MAX_WORKERS,
+    get_process_pool,
+    shutdown_process_pools,
+)
+from scorers import score
+
+
+def _eval_output():
+    return {
+        "id": 1,
+        "nl_prompt": "How many users?",
+        "golden_sql": "SELECT COUNT(*) FROM users;",
+        "query_type": "dql",
+        "golden_result": [{"n": 2}],
+        "golden_eval_results": "",
+        "golden_error": None,
+        "generated_sql": "SELECT COUNT(*) FROM users;",
+        "generated_result": [{"n": 2}],
+        "eval_results": "",
+        "generated_error": None,
+        "dialects": ["sqlite"],
+        "database": "db",
+        "job_id": "job",
+    }
+
+
+class TestProcessPool:
+
+    def test_score_in_workers_and_shut_down(self):
+        pool = get_process_pool("processpool_test", 1)
+        assert get_process_pool("processpool_test") is pool
+        scores: list = []
+        score.compare(_eval_output(), {"scorers": {"set_match": None}}, scores, None, pool)
+        assert [score_dict["score"] for score_dict in scores] == [100]
+
+        # The workers imported util, which must not keep them alive.
+        shutdown = threading.Thread(target=shutdown_process_pools, daemon=True)
+        shutdown.start()
+        shutdown.join(timeout=60)
+        assert not shutdown.is_alive()
+
+    def test_scores_keep_the_comparator_order(self, monkeypatch):
+        # Stand in a deterministic comparator for the model-backed ones.
+        monkeypatch.setattr(score, "_MODEL_BACKED_SCORERS", {"recall_match"})
+        scorers = {"returned_sql": None, "recall_match": None, "exact_match": None}
+        threaded: list = []
+        score.compare(_eval_output(), {"scorers": scorers}, threaded, None)
+        pooled: list = []
+        pool = get_process_pool("processpool_order_test", 1)
+        score.compare(_eval_output(), {"scorers": scorers}, pooled, None, pool)
+        shutdown_process_pools()
+        assert [score_dict["comparator"] for score_dict in pooled] == [
+            score_dict["comparator"] for score_dict in threaded
+        ]
+
+    def test_default_max_workers_is_capped(self):
+        assert 1 <= DEFAULT_MAX_WORKERS <= 4
@@ -0,0 +1,93 @@
+from databases import SetupData, get_database, setup_fingerprint
+from databases.util import canonicalize_sql
+from util.cache import LocalCache
+
+
+class TestCanonicalizeSql:
+
+    def test_formatting_is_ignored(self):
+        assert canonicalize_sql(
+            "select a , b\n  from t -- comment\n where x = 1 ;"
+        ) == canonicalize_sql("SELECT a, b FROM t WHERE x=1")
+
+    def test_literals_and_identifiers_are_kept(self):
+        assert canonicalize_sql("SELECT 'a  b' FROM t") != canonicalize_sql(
+            "SELECT 'A b' FROM t"
+        )
+        assert canonicalize_sql("SELECT * FROM Users") != canonicalize_sql(
+            "SELECT * FROM users"
+        )
+        assert canonicalize_sql("SELECT '--x' FROM t") == "SELECT '--x' FROM t"
+
+    def test_backslash_escapes(self):
+        query = r"SELECT 'a\' from' FROM t"
+        assert canonicalize_sql(query, backslash_escapes=True) == query
+
+    def test_postgres_strings_are_kept(self):
+        assert canonicalize_sql("select $$a   b$$") != canonicalize_sql("select $$a b$$")
+        assert canonicalize_sql("select $fn$a  $$ b$fn$") == "SELECT $fn$a  $$ b$fn$"
+        assert canonicalize_sql(r"select E'a\'  b'") == r"SELECT E'a\'  b'"
+
+    def test_only_reserved_words_are_upper_cased(self):
+        assert (
+            canonicalize_sql("select first, rows from t")
+            == "SELECT first,rows FROM t"
+        )
+
+
+class TestSetupFingerprint:
+
+    def test_changes_with_the_scripts_and_data(self, tmp_path):
+        (tmp_path / "t.csv").write_text("1\n")
+        scripts = ([], ["CREATE TABLE t (id INTEGER);"], [])
+        fingerprint = setup_fingerprint(scripts, SetupData(str(tmp_path)))
+        assert fingerprint == setup_fingerprint(scripts, SetupData(str(tmp_path)))
+        assert fingerprint != setup_fingerprint(scripts, None)
+        (tmp_path / "t.csv").write_text("2\n")
+        assert fingerprint != setup_fingerprint(scripts, SetupData(str(tmp_path)))
+
+    def test_reseeded_databases_do_not_share_cached_results(self, tmp_path):
+        data = tmp_path / "data"
+        data.mkdir()
+        (data / "t.csv").write_text("1\n")
+        db = get_database(
+            {
+                "db_type": "sqlite",
+                "database_path": str(tmp_path),
+                "max_executions_per_minute": 1000,
+                "cache_backend": "local",
+                "local_cache_path": str(tmp_path / "cache.sqlite"),
+            },
+            "query_cache_key_test",
+        )
+        db.set_setup_instructions(
+            ([], ["CREATE TABLE t (id INTEGER);"], []), SetupData(str(data))
+        )
+        db.resetup_database(force=True)
+        assert db.execute("SELECT id FROM t;", use_cache=True)[0] == [{"id": 1}]
+        (data / "t.csv").write_text("2\n")
+        db.set_setup_instructions(db.setup_scripts, SetupData(str(data)))
+        db.resetup_database(force=True)
+        assert db.execute("select id from t", use_cache=True)[0] == [{"id": 2}]
+        assert isinstance(db.cache_client, LocalCache)
+
+    def test_databases_without_setup_data_are_not_cached(self, tmp_path):
+        db = get_database(
+            {
+                "db_type": "sqlite",
+                "database_path": str(tmp_path),
+                "max_executions_per_minute": 1000,
+                "cache_backend": "local",
+                "local_cache_path": str(tmp_path / "cache.sqlite"),
+            },
+            "query_cache_key_test",
+        )
+        db.set_setup_instructions(
+            ([], ["CREATE TABLE IF NOT EXISTS t (id INTEGER);"], []), None
+        )
+        db.resetup_database(force=True)
+        assert db.setup_fingerprint is None
+        db.batch_execute(["INSERT INTO t VALUES (1);"])
+        assert db.execute("SELECT id FROM t;", use_cache=True)[0] == [{"id": 1}]
+        db.batch_execute(["DELETE FROM t;"])
+        assert db.execute("SELECT id FROM t;", use_cache=True)[0] == []
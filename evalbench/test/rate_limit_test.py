@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+
+import pytest
+
+from generators.models.generator import vertex_endpoint
+from util.rate_limit import (
+    AdaptiveTokenBucket,
+    ResourceExhaustedError,
+    TokenBucket,
+    get_rate_limiter,
+    load_rate_limits,
+    rate_limit,
+    save_rate_limits,
+)
+
+
+class TestTokenBucket:
+
+    def test_burst_runs_immediately_then_spaces_out(self):
+        bucket = TokenBucket(6000, burst=3)
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+        # 6000/min is one token every 10ms.
+        assert bucket.reserve() == pytest.approx(0.01, abs=0.002)
+        assert bucket.reserve() == pytest.approx(0.02, abs=0.002)
+
+    def test_concurrent_callers_share_the_rate(self):
+        bucket = TokenBucket(6000, burst=1)
+        started = time.monotonic()
+        threads = [threading.Thread(target=bucket.wait) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert time.monotonic() - started >= 0.095
+
+    def test_limiters_are_shared_per_endpoint(self):
+        limiter = get_rate_limiter("postgres:rate_limit_test", 120)
+        assert get_rate_limiter("postgres:rate_limit_test", 120) is limiter
+        assert get_rate_limiter("postgres:rate_limit_test_other", 120) is not limiter
+        assert get_rate_limiter("postgres:rate_limit_test", None) is None
+
+
+class TestRateLimit:
+
+    def test_gives_up_after_max_attempts(self, monkeypatch):
+        monkeypatch.setattr(time, "sleep", lambda seconds: None)
+        calls = []
+
+        def exhausted():
+            calls.append(1)
+            raise ResourceExhaustedError("quota")
+
+        with pytest.raises(ResourceExhaustedError):
+            rate_limit((), exhausted, TokenBucket(6000), 3)
+        assert len(calls) == 3
+
+    def test_semaphore_caps_calls_in_flight(self):
+        semaphore = threading.Semaphore(2)
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def call():
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+
+        bucket = TokenBucket(600000, burst=100)
+        threads = [
+            threading.Thread(target=rate_limit, args=((), call, bucket, 3, semaphore))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert max(peak) == 2
+
+    def test_latency_excludes_waiting_for_the_semaphore(self):
+        latencies = []
+
+        class _RecordingBucket(TokenBucket):
+            def record_success(self, latency):
+                latencies.append(latency)
+
+        semaphore = threading.Semaphore(1)
+        semaphore.acquire()
+        thread = threading.Thread(
+            target=rate_limit,
+            args=((), lambda: None, _RecordingBucket(600000, burst=100), 3, semaphore),
+        )
+        thread.start()
+        time.sleep(0.2)
+        semaphore.release()
+        thread.join()
+        assert latencies[0] < 0.1
+
+    def test_vertex_endpoints_use_the_resolved_project_and_region(self, monkeypatch):
+        monkeypatch.setenv("EVAL_GCP_PROJECT_ID", "project")
+        monkeypatch.setenv("EVAL_GCP_PROJECT_REGION", "region")
+        config = {"generator": "gcp_vertex_gemini", "vertex_model": "model"}
+        assert vertex_endpoint(config) == "gcp_vertex_gemini:model:project:region"
+        config["gcp_region"] = "other_region"
+        assert vertex_endpoint(config) == "gcp_vertex_gemini:model:project:other_region"
+
+
+class TestAdaptiveTokenBucket:
+
+    def test_increases_additively_and_decreases_multiplicatively(self):
+        bucket = AdaptiveTokenBucket(60, increase=2, cooldown=0)
+        for _ in range(59):
+            bucket.record_success(0.01)
+        assert bucket.execs_per_minute == 60
+        bucket.record_success(0.01)
+        assert bucket.execs_per_minute == 62
+        # The next window is as many calls as the new rate.
+        for _ in range(62):
+            bucket.record_success(0.01)
+        assert bucket.execs_per_minute == 64
+        bucket.record_exhausted()
+        assert bucket.execs_per_minute == 32
+        assert (bucket.increases, bucket.decreases) == (2, 1)
+
+    def test_increase_is_linear_in_the_calls(self):
+        bucket = AdaptiveTokenBucket(60)
+        for _ in range(1000):
+            bucket.record_success(0.01)
+        # 60 + 61 + ... + 73 = 931 calls make 14 windows.
+        assert bucket.execs_per_minute == 74
+
+    def test_retries_back_off_exponentially(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(time, "sleep", sleeps.append)
+
+        def exhausted():
+            raise ResourceExhaustedError("quota")
+
+        bucket = AdaptiveTokenBucket(6000, burst=100, cooldown=0)
+        with pytest.raises(ResourceExhaustedError):
+            rate_limit((), exhausted, bucket, 3)
+        assert sleeps == [10, 20]
+
+    def test_decreases_at_most_once_per_cooldown(self):
+        bucket = AdaptiveTokenBucket(64, cooldown=60)
+        for _ in range(3):
+            bucket.record_exhausted()
+        assert bucket.execs_per_minute == 32
+
+    def test_latency_spike_decreases(self):
+        bucket = AdaptiveTokenBucket(60, increase=0, cooldown=0)
+        for _ in range(20):
+            bucket.record_success(0.01)
+        bucket.record_success(1.0)
+        assert bucket.execs_per_minute == 30
+
+    def test_learned_rates_seed_new_limiters(self, tmp_path):
+        limiter = get_rate_limiter("model:rate_limit_test", 60, adaptive=True)
+        limiter.record_exhausted()
+        path = str(tmp_path / "rate_limits.json")
+        save_rate_limits(path)
+        with open(path) as f:
+            report = json.load(f)
+        assert report["model:rate_limit_test"]["execs_per_minute"] == 30
+
+        report["model:rate_limit_test_seeded"] = {
+            "adaptive": True,
+            "execs_per_minute": 42,
+        }
+        with open(path, "w") as f:
+            json.dump(report, f)
+        load_rate_limits(path)
+        seeded = get_rate_limiter("model:rate_limit_test_seeded", 60, adaptive=True)
+        assert seeded.execs_per_minute == 42
+        assert seeded.configured_execs_per_minute == 60
@@ -0,0 +1,57 @@
+import datetime
+import decimal
+
+from databases import ResultSet
+from databases.util import FetchPolicy, fetch_bounded
+from scorers.comparator import convert_to_set
+from scorers.exactmatcher import ExactMatcher
+from scorers.recallmatcher import RecallMatcher
+from scorers.setmatcher import SetMatcher
+
+
+class TestResultSet:
+
+    def test_reads_like_a_list_of_dicts(self):
+        result = ResultSet.from_records([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+        assert result.columns == ("id", "name")
+        assert result.rows == [(1, "a"), (2, "b")]
+        assert result == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+        assert result[1] == {"id": 2, "name": "b"}
+        assert result.to_records(1) == [{"id": 1, "name": "a"}]
+
+    def test_statements_with_other_columns(self):
+        result = ResultSet()
+        result.append(("id",), (1,))
+        result.append(("name",), ("a",))
+        assert list(result) == [{"id": 1}, {"name": "a"}]
+        assert result[:1] == [{"id": 1}]
+
+    def test_values_are_normalized_on_fetch(self):
+        result = fetch_bounded(
+            [(decimal.Decimal("1.5"), datetime.date(2024, 1, 2))],
+            ("amount", "day"),
+            FetchPolicy(),
+        )
+        assert result.rows == [(decimal.Decimal("1.5"), "2024-01-02")]
+
+    def test_decimals_keep_their_precision(self):
+        golden = fetch_bounded(
+            [(decimal.Decimal("12345678901234567.1"),)], ("amount",), FetchPolicy()
+        )
+        generated = fetch_bounded(
+            [(decimal.Decimal("12345678901234567.2"),)], ("amount",), FetchPolicy()
+        )
+        assert golden != generated
+        args = ("", "", "dql", golden, None, None, "", generated, None, None)
+        assert ExactMatcher({}).compare(*args)[0] == 0
+        assert SetMatcher({}).compare(*args)[0] == 0
+
+    def test_scorers_match_result_sets_and_lists(self):
+        records = [{"id": 1, "name": "a"}, {"id": 2, "name": None}]
+        result = ResultSet.from_records(records)
+        assert convert_to_set(result) == convert_to_set(records)
+        args = ("", "", "dql", result, None, None, "", records, None, None)
+        set_score, _ = SetMatcher({}).compare(*args)
+        recall_score, _ = RecallMatcher({}).compare(*args)
+        assert set_score == 100
+        assert recall_score == 100
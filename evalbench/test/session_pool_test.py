@@ -0,0 +1,92 @@
+from databases import SessionPool, get_database
+
+
+def _sqlite_db(tmp_path):
+    db_config = {
+        "db_type": "sqlite",
+        "database_path": str(tmp_path),
+        "max_executions_per_minute": 1000,
+    }
+    db = get_database(db_config, "session_pool_test")
+    db.batch_execute(["CREATE TABLE t (id INTEGER);", "INSERT INTO t VALUES (1);"])
+    return db
+
+
+class TestSessionPool:
+
+    def test_sessions_are_connected_up_front(self, tmp_path):
+        pool = SessionPool(_sqlite_db(tmp_path), 3)
+        sessions = [pool.get() for _ in range(3)]
+        assert pool.empty()
+        assert len({id(session.connection) for session in sessions}) == 3
+        assert all(not session.connection.closed for session in sessions)
+        for session in sessions:
+            pool.put(session)
+        stats = pool.stats()
+        assert stats.checkouts == 3
+        assert stats.in_use == 0
+        pool.close()
+
+    def test_queries_run_on_the_pinned_connection(self, tmp_path):
+        pool = SessionPool(_sqlite_db(tmp_path), 1)
+        session = pool.get()
+        # A temp table is only visible on the connection that created it.
+        session.batch_execute(["CREATE TEMP TABLE pinned (id INTEGER);"])
+        result, _, error = session.execute("SELECT COUNT(*) AS n FROM pinned;")
+        assert error is None
+        assert result == [{"n": 0}]
+        _, _, error = session.db.execute("SELECT COUNT(*) AS n FROM pinned;")
+        assert "no such table" in error
+        pool.put(session)
+        pool.close()
+
+    def test_broken_session_is_reconnected_on_checkout(self, tmp_path):
+        pool = SessionPool(_sqlite_db(tmp_path), 1)
+        session = pool.get()
+        session.connection.close()
+        pool.put(session)
+        session = pool.get()
+        assert not session.connection.closed
+        assert session.execute("SELECT id FROM t;")[0] == [{"id": 1}]
+        assert pool.stats().reconnects == 1
+        pool.put(session)
+        pool.close()
+
+    def test_in_memory_sessions_are_clones_of_the_database(self, tmp_path):
+        db_config = {
+            "db_type": "sqlite",
+            "database_path": str(tmp_path),
+            "max_executions_per_minute": 1000,
+            "in_memory": True,
+        }
+        _sqlite_db(tmp_path)
+        pool = SessionPool(get_database(db_config, "session_pool_test"), 2)
+        first, second = pool.get(), pool.get()
+        first.execute("INSERT INTO t VALUES (2);")
+        assert first.execute("SELECT COUNT(*) AS n FROM t;")[0] == [{"n": 2}]
+        assert second.execute("SELECT COUNT(*) AS n FROM t;")[0] == [{"n": 1}]
+        assert pool.db.execute("SELECT COUNT(*) AS n FROM t;")[0] == [{"n": 1}]
+        pool.put(first)
+        pool.put(second)
+        pool.close()
+
+    def test_read_only_sessions(self, tmp_path):
+        db_config = {
+            "db_type": "sqlite",
+            "database_path": str(tmp_path),
+            "max_executions_per_minute": 1000,
+            "read_only": True,
+        }
+        _sqlite_db(tmp_path)
+        pool = SessionPool(get_database(db_config, "session_pool_test"), 2)
+        first, second = pool.get(), pool.get()
+        assert (
+            first.connection.connection.driver_connection
+            is not second.connection.connection.driver_connection
+        )
+        assert first.execute("SELECT id FROM t;")[0] == [{"id": 1}]
+        _, _, error = second.execute("INSERT INTO t VALUES (2);")
+        assert "readonly" in error
+        pool.put(first)
+        pool.put(second)
+        pool.close()
@@ -0,0 +1,53 @@
+import os
+
+from databases import SetupData, get_database
+from databases.util import UnparsedRow
+
+
+def _write_csv(path, lines):
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+class TestSetupData:
+
+    def test_tables_are_read_lazily(self, tmp_path):
+        _write_csv(tmp_path / "users.csv", ["1,'Ann'", "2,\"'a,b'\""])
+        _write_csv(tmp_path / "notes.txt", ["ignored"])
+        data = SetupData(str(tmp_path))
+        assert list(data) == ["users"]
+        assert list(data["users"]) == [["1", "'Ann'"], ["2", "'a,b'"]]
+
+    def test_parsed_chunks_are_cached_per_csv_version(self, tmp_path):
+        cache_directory = tmp_path / "cache"
+        csv_path = tmp_path / "users.csv"
+        _write_csv(csv_path, ["1,'Ann'", "2,UPPER('bob')", "3,NULL"])
+        table = SetupData(str(tmp_path), str(cache_directory))["users"]
+
+        chunks = list(table.parsed_chunks(chunk_size=2))
+        assert chunks == [[(1, "Ann"), ("2", "UPPER('bob')")], [(3, None)]]
+        assert isinstance(chunks[0][1], UnparsedRow)
+        assert list(table.parsed_chunks(chunk_size=2)) == chunks
+        assert len(os.listdir(cache_directory)) == 1
+
+        _write_csv(csv_path, ["4,'Dan'"])
+        os.utime(csv_path, ns=(0, os.stat(csv_path).st_mtime_ns + 1))
+        assert list(table.parsed_chunks(chunk_size=2)) == [[(4, "Dan")]]
+        assert len(os.listdir(cache_directory)) == 2
+
+    def test_insert_setup_data(self, tmp_path):
+        data_directory = tmp_path / "data"
+        data_directory.mkdir()
+        _write_csv(data_directory / "t.csv", ["1,'one'", "2,LOWER('TWO')"])
+        db = get_database(
+            {
+                "db_type": "sqlite",
+                "database_path": str(tmp_path),
+                "max_executions_per_minute": 1000,
+            },
+            "setup_data_test",
+        )
+        db.batch_execute(["CREATE TABLE t (id INTEGER, name TEXT);"])
+        db.insert_data(SetupData(str(data_directory), str(tmp_path / "cache")))
+        result, _, _ = db.execute("SELECT * FROM t ORDER BY id;")
+        assert result == [{"id": 1, "name": "one"}, {"id": 2, "name": "two"}]
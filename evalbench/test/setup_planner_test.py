@@ -0,0 +1,199 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from databases import get_database
+from evaluator import orchestrator
+from evaluator.async_orchestrator import AsyncOrchestrator
+from evaluator.db_manager import SetupPlanner
+
+
+def _setup_directory(tmp_path, db_name):
+    scripts_directory = tmp_path / "setup" / db_name / "sqlite"
+    scripts_directory.mkdir(parents=True)
+    (scripts_directory / "setup.sql").write_text(
+        "CREATE TABLE t (id INTEGER, name TEXT);"
+    )
+    data_directory = tmp_path / "setup" / db_name / "data"
+    data_directory.mkdir()
+    (data_directory / "t.csv").write_text("1,'one'\n2,'two'\n")
+    return {
+        "setup_directory": str(tmp_path / "setup"),
+        "cache_directory": str(tmp_path / "cache"),
+    }
+
+
+def _db_config(tmp_path):
+    databases_directory = tmp_path / "databases"
+    databases_directory.mkdir()
+    return {
+        "db_type": "sqlite",
+        "database_path": str(databases_directory),
+        "max_executions_per_minute": 1000,
+        "setup_parallelism": 3,
+    }
+
+
+class TestSetupPlanner:
+
+    def test_create_tmp_databases_in_parallel(self, tmp_path):
+        db_config = _db_config(tmp_path)
+        core_db = get_database(db_config, "planner_test")
+        tmp_dbs = core_db.create_tmp_databases(5)
+        assert len(set(tmp_dbs)) == 5
+        assert sorted(core_db.tmp_dbs) == sorted(tmp_dbs)
+        for tmp_db_name in tmp_dbs:
+            assert os.path.exists(
+                os.path.join(db_config["database_path"], tmp_db_name + ".db")
+            )
+        core_db.clean_tmp_creations()
+        core_db.close_connections()
+
+    def test_ddl_queue_is_seeded_in_the_background(self, tmp_path):
+        db_config = _db_config(tmp_path)
+        setup_config = _setup_directory(tmp_path, "planner_test")
+        core_db = get_database(db_config, "planner_test")
+        planner = SetupPlanner(
+            core_db,
+            "planner_test",
+            db_config,
+            setup_config,
+            {"dql": 1, "ddl": 2},
+        )
+        try:
+            dql_queue = planner.build_db_queue("dql")
+            ddl_queue = planner.build_db_queue("ddl")
+            assert ddl_queue.qsize() == 2
+            ddl_dbs = [ddl_queue.get() for _ in range(2)]
+            for ddl_db in ddl_dbs:
+                assert ddl_db.db_name != "planner_test"
+                result, _, error = ddl_db.execute("SELECT COUNT(*) AS n FROM t;")
+                assert error is None
+                # DDL databases are set up with the schema only.
+                assert result == [{"n": 0}]
+                ddl_db.close_connections()
+            dql_db = dql_queue.get()
+            result, _, _ = dql_db.execute("SELECT COUNT(*) AS n FROM t;")
+            assert result == [{"n": 2}]
+            dql_queue.put(dql_db)
+            dql_queue.close()
+        finally:
+            planner.close()
+            core_db.clean_tmp_creations()
+            core_db.close_connections()
+
+    def test_close_without_taking_the_ddl_queue(self, tmp_path):
+        db_config = _db_config(tmp_path)
+        setup_config = _setup_directory(tmp_path, "planner_test")
+        core_db = get_database(db_config, "planner_test")
+        planner = SetupPlanner(
+            core_db, "planner_test", db_config, setup_config, {"ddl": 2}
+        )
+        planner.close()
+        planner.close()
+        assert os.listdir(db_config["database_path"]) == []
+        core_db.close_connections()
+
+    def test_provisioning_and_dql_setup_run_concurrently(self, tmp_path):
+        db_config = _db_config(tmp_path)
+        setup_config = _setup_directory(tmp_path, "planner_test")
+        core_db = get_database(db_config, "planner_test")
+        planner = SetupPlanner(
+            core_db,
+            "planner_test",
+            db_config,
+            setup_config,
+            {"dql": 2, "ddl": 4},
+        )
+        try:
+            # Seeds core_db while the DDL tmp databases are being provisioned.
+            dql_queue = planner.build_db_queue("dql")
+            ddl_queue = planner.build_db_queue("ddl")
+            ddl_dbs = [ddl_queue.get() for _ in range(4)]
+            # The background provisioning never touched core_db.
+            assert core_db.tmp_dbs == []
+            assert all(ddl_db.admin_db is not core_db for ddl_db in ddl_dbs)
+            for ddl_db in ddl_dbs:
+                result, _, error = ddl_db.execute("SELECT COUNT(*) AS n FROM t;")
+                assert error is None
+                ddl_db.close_connections()
+            dql_db = dql_queue.get()
+            result, _, _ = dql_db.execute("SELECT COUNT(*) AS n FROM t;")
+            assert result == [{"n": 2}]
+            dql_queue.put(dql_db)
+            dql_queue.close()
+        finally:
+            planner.close()
+            core_db.clean_tmp_creations()
+            core_db.close_connections()
+        # close dropped the tmp databases, only the base database is left.
+        assert os.listdir(db_config["database_path"]) == ["planner_test.db"]
+
+
+class _CoreDB:
+
+    def __init__(self):
+        self.closed = False
+
+    def clean_tmp_creations(self):
+        pass
+
+    def close_connections(self):
+        self.closed = True
+
+
+class _Planner:
+
+    instances: list = []
+
+    def __init__(self, *args):
+        self.closed = False
+        _Planner.instances.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def _failing_generator(*args):
+    raise RuntimeError("no generator")
+
+
+class TestSubDatasetCleanup:
+
+    @pytest.fixture
+    def core_db(self, monkeypatch):
+        core_db = _CoreDB()
+        _Planner.instances = []
+        monkeypatch.setattr(orchestrator, "SetupPlanner", _Planner)
+        monkeypatch.setattr(orchestrator.prompts, "get_generator", _failing_generator)
+        monkeypatch.setattr(
+            orchestrator.Orchestrator, "_connect", lambda self, *args: core_db
+        )
+        return core_db
+
+    def _sub_datasets(self):
+        return {"sqlite": {"db": {"dql": [object()]}}}
+
+    def test_failed_generator_setup_closes_the_planner(self, core_db):
+        evaluator = orchestrator.Orchestrator({}, {}, {})
+        with pytest.raises(RuntimeError):
+            evaluator.evaluate_sub_dataset(
+                self._sub_datasets(), {}, "sqlite", "db", None, {}
+            )
+        assert _Planner.instances[0].closed
+        assert core_db.closed
+
+    def test_failed_generator_setup_closes_the_planner_async(self, core_db):
+        evaluator = AsyncOrchestrator({}, {}, {})
+        evaluator.setup_executor = ThreadPoolExecutor(max_workers=1)
+        with pytest.raises(RuntimeError):
+            asyncio.run(
+                evaluator.evaluate_sub_dataset(
+                    self._sub_datasets(), {}, "sqlite", "db", None, {}
+                )
+            )
+        evaluator.setup_executor.shutdown()
+        assert _Planner.instances[0].closed
+        assert core_db.closed
@@ -0,0 +1,64 @@
+from databases import get_database
+
+
+def _sqlite_db(tmp_path, **db_config):
+    db = get_database(
+        {
+            "db_type": "sqlite",
+            "database_path": str(tmp_path),
+            "max_executions_per_minute": 1000,
+            **db_config,
+        },
+        "snapshot_test",
+    )
+    db.set_setup_instructions(
+        (
+            ["DROP TABLE IF EXISTS t"],
+            ["CREATE TABLE t (id INTEGER)", "INSERT INTO t VALUES (1)"],
+            [],
+        ),
+        None,
+    )
+    return db
+
+
+class TestSnapshot:
+
+    def test_reset_restores_the_snapshot(self, tmp_path, monkeypatch):
+        db = _sqlite_db(tmp_path)
+        db.reset_to_setup()
+        assert db.has_snapshot
+
+        setups = []
+        monkeypatch.setattr(db, "resetup_database", lambda **_: setups.append(1))
+        db.execute("CREATE TABLE extra (id INTEGER);")
+        db.execute("DROP TABLE t;")
+        db.reset_to_setup()
+
+        assert setups == []
+        assert list(db.get_metadata()) == ["t"]
+        assert db.execute("SELECT id FROM t;")[0] == [{"id": 1}]
+
+    def test_snapshots_can_be_disabled(self, tmp_path):
+        db = _sqlite_db(tmp_path, ddl_snapshots=False)
+        db.reset_to_setup()
+        assert not db.has_snapshot
+        db.execute("INSERT INTO t VALUES (2);")
+        db.reset_to_setup()
+        assert db.execute("SELECT id FROM t;")[0] == [{"id": 1}]
+
+    def test_in_memory_tmp_database(self, tmp_path):
+        db = _sqlite_db(tmp_path, in_memory=True, is_tmp_db=True)
+        db.reset_to_setup()
+        db.execute("INSERT INTO t VALUES (2);")
+        db.reset_to_setup()
+        assert db.execute("SELECT id FROM t;")[0] == [{"id": 1}]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_in_memory_tmp_database_survives_closing_connections(self, tmp_path):
+        db = _sqlite_db(tmp_path, in_memory=True, is_tmp_db=True)
+        db.reset_to_setup()
+        db.close_connections()
+        assert db.execute("SELECT id FROM t;")[0] == [{"id": 1}]
+        db.reset_to_setup()
+        assert db.execute("SELECT id FROM t;")[0] == [{"id": 1}]
@@ -0,0 +1,21 @@
+"""Helpers for running blocking code from coroutines."""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Executor
+from typing import Any, Callable
+
+
+async def run_in_executor(executor: Executor | None, func: Callable, *args: Any) -> Any:
+    """Like asyncio.to_thread, but runs func(*args) on the given executor.
+
+    asyncio.to_thread always uses the loop's default executor, which has at most
+    min(32, cpu + 4) threads shared by every caller. Stages that size their own
+    executor pass it here; None falls back to the default executor.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, func, *args)
+    )
@@ -0,0 +1,254 @@
+"""Persistent local cache, an alternative to Redis for query and LLM results."""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional, Protocol
+
+DEFAULT_LOCAL_CACHE_PATH = os.path.join(
+    tempfile.gettempdir(), "evalbench_cache", "cache.sqlite"
+)
+DEFAULT_LOCAL_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# Seconds a connection waits for a lock held by another thread or process.
+_BUSY_TIMEOUT = 30.0
+# Once the cache is full, evict down to this fraction of max_bytes, so that
+# not every set has to evict.
+_EVICT_TO_FRACTION = 0.9
+
+
+class CacheClient(Protocol):
+    """What the executors need of a cache: redis.StrictRedis and LocalCache."""
+
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    def set(self, key: str, value: bytes) -> object: ...
+
+
+class CacheStats:
+    """Counters of a LocalCache, of this process.
+
+    Attributes:
+      hits: Lookups that found a live entry.
+      misses: Lookups that found no entry, or an expired one.
+      sets: Entries written.
+      evictions: Entries dropped to stay under max_bytes, or since they expired.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+        }
+
+
+class LocalCache:
+    """Key / value cache in a SQLite file, with size-bounded LRU and TTL eviction.
+
+    It has the get / set interface of the Redis clients, so it can be passed
+    wherever a cache_client is expected. Every thread uses a connection of its
+    own, and the database runs in WAL mode, so any number of threads and
+    processes can share one cache file: reads never block each other, and
+    writes are serialized by SQLite. Triggers keep the total size of the
+    entries in the meta table, in the transaction of every write, so a set
+    checks the size without summing all the entries.
+
+    Attributes:
+      path: The SQLite file.
+      max_bytes: Bytes of values to keep; least recently used entries past it
+        are evicted.
+      ttl: Seconds an entry lives after it was set, or None to keep it until it
+        is evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_LOCAL_CACHE_PATH,
+        max_bytes: int = DEFAULT_LOCAL_CACHE_MAX_BYTES,
+        ttl: Optional[float] = None,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stats = CacheStats()
+        self._stats_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed_at"
+                " ON entries (accessed_at)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                " name TEXT PRIMARY KEY,"
+                " value INTEGER NOT NULL)"
+            )
+            for trigger, event, change in (
+                ("entries_insert_size", "INSERT", "NEW.size"),
+                ("entries_update_size", "UPDATE OF size", "NEW.size - OLD.size"),
+                ("entries_delete_size", "DELETE", "-OLD.size"),
+            ):
+                connection.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON entries"
+                    f" BEGIN UPDATE meta SET value = value + {change}"
+                    " WHERE name = 'total_size'; END"
+                )
+            # Files of older versions have entries, but no total yet. Entries
+            # written since the triggers exist are counted by this sum too.
+            connection.execute(
+                "INSERT OR IGNORE INTO meta (name, value)"
+                " SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries"
+                " WHERE NOT EXISTS (SELECT 1 FROM meta WHERE name = 'total_size')"
+            )
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(evictions=1)
+                row = None
+            if row is None:
+                self._count(misses=1)
+                return None
+            connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        self._count(hits=1)
+        return row[0]
+
+    def set(self, key: str, value: bytes, ex: Optional[float] = None) -> bool:
+        """Stores value under key, expiring after ex (default: ttl) seconds."""
+        now = time.time()
+        ttl = ex if ex is not None else self.ttl
+        expires_at = now + ttl if ttl is not None else None
+        with self._connection() as connection:
+            # An upsert rather than INSERT OR REPLACE, whose deletes do not fire
+            # the triggers that keep the total size.
+            connection.execute(
+                "INSERT INTO entries"
+                " (key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value,"
+                " size = excluded.size, expires_at = excluded.expires_at,"
+                " accessed_at = excluded.accessed_at",
+                (key, sqlite3.Binary(value), len(value), expires_at, now),
+            )
+            evicted = self._evict(connection, now)
+        self._count(sets=1, evictions=evicted)
+        return True
+
+    def delete(self, key: str) -> int:
+        with self._connection() as connection:
+            return connection.execute(
+                "DELETE FROM entries WHERE key = ?", (key,)
+            ).rowcount
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM entries")
+
+    def size_bytes(self) -> int:
+        with self._connection() as connection:
+            return self._total_size(connection)
+
+    def count(self) -> int:
+        # Not __len__: callers test cache clients for truthiness.
+        with self._connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> CacheStats:
+        with self._stats_lock:
+            stats = CacheStats()
+            stats.__dict__.update(self._stats.__dict__)
+        return stats
+
+    def close(self):
+        """Closes the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        # Used as a context manager, the connection commits or rolls back.
+        return connection
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> int:
+        evicted = connection.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        ).rowcount
+        if self._total_size(connection) <= self.max_bytes:
+            return evicted
+        # Keep the most recently used entries that fit in the target size.
+        evicted += connection.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key)"
+            "   AS kept_bytes FROM entries)"
+            " WHERE kept_bytes > ?)",
+            (int(self.max_bytes * _EVICT_TO_FRACTION),),
+        ).rowcount
+        return evicted
+
+    def _total_size(self, connection: sqlite3.Connection) -> int:
+        return connection.execute(
+            "SELECT value FROM meta WHERE name = 'total_size'"
+        ).fetchone()[0]
+
+    def _count(self, hits=0, misses=0, sets=0, evictions=0):
+        with self._stats_lock:
+            self._stats.hits += hits
+            self._stats.misses += misses
+            self._stats.sets += sets
+            self._stats.evictions += evictions
+
+
+# LocalCaches of the process, by path, shared by every DB and scorer.
+_LOCAL_CACHES: dict[str, LocalCache] = {}
+_LOCAL_CACHES_LOCK = threading.Lock()
+
+
+def get_local_cache(
+    path: str = DEFAULT_LOCAL_CACHE_PATH,
+    max_bytes: int = DEFAULT_LOCAL_CACHE_MAX_BYTES,
+    ttl: Optional[float] = None,
+) -> LocalCache:
+    """Returns the process-wide LocalCache of path, creating it on first use."""
+    path = os.path.abspath(path)
+    with _LOCAL_CACHES_LOCK:
+        cache = _LOCAL_CACHES.get(path)
+        if cache is None:
+            cache = LocalCache(path, max_bytes, ttl)
+            _LOCAL_CACHES[path] = cache
+        return cache
@@ -1,7 +1,6 @@
 import datetime
 import logging
 import os
-import csv
 import random
 import string
 from typing import List
@@ -25,22 +24,6 @@ def load_textproto(textproto_file, text_proto_object):
     return text_proto_object
 
 
-def load_db_data_from_csvs(data_directory: str):
-    tables: dict[str, List[str]] = {}
-    if not os.path.isdir(data_directory):
-        return tables
-    for filename in os.listdir(data_directory):
-        if filename.endswith(".csv"):
-            table_name = filename[:-4]
-            with open(os.path.join(data_directory, filename), "r") as csvfile:
-                reader = csv.reader(csvfile)
-                rows = []
-                for row in reader:
-                    rows.append(row)
-                tables[table_name] = rows
-    return tables
-
-
 def load_setup_scripts(setup_scripts_directory_path: str):
     pre_setup = _load_setup_sql(
         os.path.join(setup_scripts_directory_path, "pre_setup.sql"),
@@ -143,6 +126,10 @@ def set_session_configs(session, experiment_config: dict):
         session["setup_config"]["setup_directory"] = experiment_config[
             "setup_directory"
         ]
+    if experiment_config.get("setup_cache_directory"):
+        session["setup_config"]["cache_directory"] = experiment_config[
+            "setup_cache_directory"
+        ]
 
 
 def generate_key(length=12):
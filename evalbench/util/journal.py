@@ -0,0 +1,174 @@
+"""Append-only checkpoint journal of the eval items of an evaluation job."""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from util.ndjson import json_default
+
+# The stages that are journaled, with the fields of the eval output they keep.
+# Only small fields are kept: the prompts and results are not journaled, so a
+# resumed run generates the prompts and executes the queries again for the
+# items that were not scored.
+JOURNALED_FIELDS = {
+    "sqlgen": ["generated_sql", "sql_generator_error"],
+    "scoring": [
+        "prompt_generator_error",
+        "generated_sql",
+        "sql_generator_error",
+        "sanitized_sql",
+        "golden_error",
+        "generated_error",
+        "golden_result_total_row_count",
+        "golden_result_truncated",
+        "generated_result_total_row_count",
+        "generated_result_truncated",
+    ],
+}
+
+DEFAULT_JOURNAL_DIRECTORY = os.path.join(tempfile.gettempdir(), "evalbench_journal")
+# Seconds between flushes (and fsyncs) of the journal file. A crash loses at
+# most the entries of this long, whose items then run again.
+_FLUSH_INTERVAL = 1.0
+
+
+class Journal:
+    """Records the generated SQL and the scores of every eval item.
+
+    Every entry is one short JSON line with the key of the item, the stage and
+    the JOURNALED_FIELDS of that stage. Lines are buffered and written to disk
+    by a background thread every _FLUSH_INTERVAL seconds, and on close, so
+    journaling costs the workers no disk write. Re-opening the journal of the
+    same job_id loads the entries back, which lets a resumed run skip the SQL
+    generation of the items that had it, and every stage of the items that were
+    scored. Only sqlgen and scoring are journaled: a resumed run generates the
+    prompts and executes the queries again for every item that was not scored,
+    and the records of the scored items lack the prompts and results (they are
+    marked with replayed_from_journal). A line cut short by a crash is ignored.
+
+    Attributes:
+      path: Path of the journal file.
+    """
+
+    def __init__(self, directory: str, job_id: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{job_id}.jsonl")
+        self._lock = threading.Lock()
+        # item key -> (journaled stages, journaled fields, scores)
+        self._entries: dict[str, tuple[set, dict, list | None]] = {}
+        terminated = True
+        if os.path.exists(self.path):
+            terminated = self._load()
+        self._file = open(self.path, "a")
+        self._dirty = False
+        if not terminated:
+            # Start on a new line after a line that was cut short by a crash.
+            self._file.write("\n")
+            self._dirty = True
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, name="journal_flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(
+        self, key: str, stage: str, eval_output: dict, scores: list | None = None
+    ):
+        """Appends the journaled fields of a finished stage of an item.
+
+        Args:
+          key: Identifies the eval item within the job.
+          stage: The stage name; only the stages of JOURNALED_FIELDS are recorded.
+          eval_output: The eval output after the stage.
+          scores: The score dicts of the item, for the scoring stage.
+        """
+        if stage not in JOURNALED_FIELDS:
+            return
+        fields = {
+            field: eval_output[field]
+            for field in JOURNALED_FIELDS[stage]
+            if field in eval_output
+        }
+        line = json.dumps(
+            {"key": key, "stage": stage, "fields": fields, "scores": scores},
+            default=json_default,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._dirty = True
+            self._add(key, stage, fields, scores)
+
+    def flush(self):
+        """Writes the buffered entries to disk."""
+        with self._lock:
+            if not self._dirty or self._file.closed:
+                return
+            self._file.flush()
+            self._dirty = False
+            fileno = self._file.fileno()
+        # fsync outside of the lock, so that workers can keep recording.
+        os.fsync(fileno)
+
+    def is_done(self, key: str, stage: str) -> bool:
+        """Returns whether the stage of the item can be replayed from the journal.
+
+        Every stage of a scored item can, and the SQL generation of an item that
+        has its generated SQL. The prompts and results are not journaled, so
+        the other stages of unscored items run again.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        return "scoring" in entry[0] or (stage == "sqlgen" and "sqlgen" in entry[0])
+
+    def restore(self, key: str) -> tuple[dict, list | None]:
+        """Returns the journaled fields and the scores (if scored) of an item."""
+        _, fields, scores = self._entries[key]
+        return dict(fields), scores
+
+    def close(self, remove: bool = False):
+        """Closes the journal, and removes its file once the job fully completed."""
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._file.close()
+        if remove:
+            os.remove(self.path)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(_FLUSH_INTERVAL):
+            self.flush()
+
+    def _add(self, key: str, stage: str, fields: dict, scores: list | None):
+        stages, previous_fields, previous_scores = self._entries.get(
+            key, (set(), {}, None)
+        )
+        self._entries[key] = (
+            stages | {stage},
+            {**previous_fields, **fields},
+            scores if stage == "scoring" else previous_scores,
+        )
+
+    def _load(self) -> bool:
+        terminated = True
+        with open(self.path) as f:
+            for line in f:
+                terminated = line.endswith("\n")
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring a partial line in journal {self.path}")
+                    continue
+                if entry["stage"] not in JOURNALED_FIELDS:
+                    continue
+                self._add(entry["key"], entry["stage"], entry["fields"], entry["scores"])
+        logging.info(f"Loaded {len(self._entries)} items from journal {self.path}")
+        return terminated
@@ -1,5 +1,7 @@
 import json
 
+from databases.resultset import ResultSet
+
 
 def truncateExecutionOutputs(eval_output, config):
     for key in [
@@ -14,10 +16,22 @@ def truncateExecutionOutputs(eval_output, config):
             and "truncate_execution_outputs" in config["reporting"]
         ):
             truncated_result_count = config["reporting"]["truncate_execution_outputs"]
-        if key in eval_output and isinstance(eval_output[key], list):
+        if key in eval_output and isinstance(eval_output[key], (list, ResultSet)):
             suffix = ""
-            if len(eval_output[key]) > truncated_result_count:
-                suffix = f"...and {len(eval_output[key]) - truncated_result_count} more items truncated"
+            # Also count the rows that the fetch policy of the DB dropped, which
+            # can leave fewer rows than truncate_execution_outputs to print.
+            total = getattr(eval_output[key], "total_row_count", len(eval_output[key]))
+            printed = min(len(eval_output[key]), truncated_result_count)
+            if total > printed:
+                at_least = (
+                    "at least "
+                    if getattr(eval_output[key], "total_row_count_capped", False)
+                    else ""
+                )
+                suffix = (
+                    f"...and {at_least}{total - printed}"
+                    + " more items truncated"
+                )
             eval_output[key] = (
                 json.dumps(eval_output[key][:truncated_result_count], default=str)
                 + suffix
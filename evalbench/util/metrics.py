@@ -0,0 +1,353 @@
+"""Lightweight in-process metrics registry with Prometheus text export."""
+
+import bisect
+import http.server
+import threading
+from typing import Any
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+# The fields of an eval output that hold the error of each stage.
+STAGE_ERROR_FIELDS = {
+    "promptgen": ["prompt_generator_error"],
+    "sqlgen": ["sql_generator_error"],
+    "sqlexec": ["golden_error", "generated_error"],
+}
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: dict[str, str] | None = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    escaped = [
+        name
+        + '="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for name, value in items
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values: dict[LabelKey, Any] = {}
+
+    def label_sets(self) -> list[LabelKey]:
+        with self._lock:
+            return list(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. the number of errors."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            return [
+                (self.name, key, None, value) for key, value in self._values.items()
+            ]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. the number of in-flight items."""
+
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class _HistogramValue:
+    def __init__(self, num_buckets: int):
+        self.bucket_counts = [0] * num_buckets
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, e.g. stage latencies."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        # bisect_left puts a value that equals a bound into that bound's bucket.
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = _HistogramValue(len(self.buckets) + 1)
+            histogram = self._values[key]
+            histogram.bucket_counts[index] += 1
+            histogram.count += 1
+            histogram.sum += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            histogram = self._values.get(_label_key(labels))
+            return histogram.count if histogram else 0
+
+    def summary(self, **labels) -> dict[str, float]:
+        """Returns the count, sum, mean, p50, p90 and p99 of the observations."""
+        with self._lock:
+            histogram = self._values.get(_label_key(labels))
+            count = histogram.count if histogram else 0
+            total = histogram.sum if histogram else 0.0
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "p50": self.quantile(0.5, **labels),
+            "p90": self.quantile(0.9, **labels),
+            "p99": self.quantile(0.99, **labels),
+        }
+
+    def quantile(self, q: float, **labels) -> float:
+        """Estimates a quantile by linear interpolation within its bucket."""
+        with self._lock:
+            histogram = self._values.get(_label_key(labels))
+            if not histogram or not histogram.count:
+                return 0.0
+            return _bucket_quantile(q, self.buckets, histogram.bucket_counts)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, histogram in self._values.items():
+                cumulative = 0
+                for bound, count in zip(
+                    list(self.buckets) + ["+Inf"], histogram.bucket_counts
+                ):
+                    cumulative += count
+                    samples.append(
+                        (f"{self.name}_bucket", key, {"le": str(bound)}, cumulative)
+                    )
+                samples.append((f"{self.name}_sum", key, None, histogram.sum))
+                samples.append((f"{self.name}_count", key, None, histogram.count))
+        return samples
+
+
+def _bucket_quantile(q: float, buckets: tuple, bucket_counts: list[int]) -> float:
+    rank = q * sum(bucket_counts)
+    cumulative = 0
+    for index, count in enumerate(bucket_counts):
+        if cumulative + count >= rank and count:
+            lower = buckets[index - 1] if index > 0 else 0.0
+            # Values above the last bound are reported as the last bound.
+            upper = buckets[index] if index < len(buckets) else buckets[-1]
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-1]
+
+
+class MetricsRegistry:
+    """Holds the metrics of the process, by name."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "") -> Histogram:
+        return self._get_or_create(Histogram, name, description)
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render_prometheus(self) -> str:
+        """Renders all the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, key, extra, value in metric._samples():
+                lines.append(f"{name}{_format_labels(key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict[str, list[dict]]:
+        """Returns the value of every metric per label set.
+
+        Histograms are summarized by Histogram.summary.
+        """
+        result: dict[str, list[dict]] = {}
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            entries = []
+            for key in metric.label_sets():
+                labels = dict(key)
+                if isinstance(metric, Histogram):
+                    values = metric.summary(**labels)
+                else:
+                    values = {"value": metric.value(**labels)}
+                entries.append({"labels": labels, **values})
+            result[metric.name] = entries
+        return result
+
+    def _get_or_create(self, cls, name: str, description: str):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is a {metric.type}, not a {cls.type}.")
+            return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_QUEUE_WAIT = REGISTRY.histogram(
+    "evalbench_stage_queue_wait_seconds",
+    "Time that work items waited for a free runner of the stage.",
+)
+STAGE_RUN_TIME = REGISTRY.histogram(
+    "evalbench_stage_run_seconds", "Time that the stage took per work item."
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "evalbench_stage_errors_total",
+    "Work items whose stage raised or recorded an error.",
+)
+STAGE_IN_FLIGHT = REGISTRY.gauge(
+    "evalbench_stage_in_flight", "Work items that the stage is running right now."
+)
+RATE_LIMIT_RETRIES = REGISTRY.counter(
+    "evalbench_rate_limit_retries_total",
+    "Calls retried after a ResourceExhaustedError.",
+)
+RATE_LIMIT = REGISTRY.gauge(
+    "evalbench_rate_limit_execs_per_minute",
+    "Current rate limit of an endpoint, as learned by adaptive limiters.",
+)
+RATE_LIMIT_SLEEP = REGISTRY.counter(
+    "evalbench_rate_limit_sleep_seconds_total",
+    "Time spent sleeping for rate limits and backoffs.",
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "evalbench_cache_requests_total", "Cache lookups, by cache and result."
+)
+DB_SESSION_WAIT = REGISTRY.histogram(
+    "evalbench_db_session_wait_seconds",
+    "Time that workers waited to check out a DB session.",
+)
+DB_SESSION_RECONNECTS = REGISTRY.counter(
+    "evalbench_db_session_reconnects_total",
+    "DB sessions whose connection failed a health check and was reopened.",
+)
+
+
+def item_labels(eval_output: dict | None) -> dict[str, str]:
+    """Returns the dialect, database and query_type labels of an eval item."""
+    if not eval_output:
+        return {}
+    dialects = eval_output.get("dialects") or [""]
+    return {
+        "dialect": dialects[0],
+        "database": eval_output.get("database", ""),
+        "query_type": eval_output.get("query_type", ""),
+    }
+
+
+def record_stage(
+    stage: str,
+    eval_output: dict | None,
+    wait_time: float,
+    run_time: float,
+    failed: bool = False,
+):
+    """Records the latencies and errors of a stage of an eval item."""
+    labels = {"stage": stage, **item_labels(eval_output)}
+    STAGE_QUEUE_WAIT.observe(wait_time, **labels)
+    STAGE_RUN_TIME.observe(run_time, **labels)
+    if failed:
+        STAGE_ERRORS.inc(field="exception", **labels)
+        return
+    for field in STAGE_ERROR_FIELDS.get(stage, []):
+        if eval_output and eval_output.get(field):
+            STAGE_ERRORS.inc(field=field, **labels)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int) -> http.server.ThreadingHTTPServer:
+    """Serves the registry at http://0.0.0.0:<port>/metrics on a daemon thread."""
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    )
+    thread.start()
+    return server
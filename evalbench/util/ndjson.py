@@ -0,0 +1,66 @@
+"""Append-only NDJSON files for streaming eval results to disk."""
+
+import json
+import tempfile
+import threading
+from typing import Any, Iterable, Iterator
+
+from databases.resultset import ResultSet
+
+
+def json_default(value: Any) -> Any:
+    """Encodes what json cannot: ResultSets as their row dicts, the rest as str."""
+    if isinstance(value, ResultSet):
+        return value.to_records()
+    return str(value)
+
+
+class NDJSONWriter:
+    """Writes one compact JSON record per line as soon as it is added.
+
+    The writer has the list methods that the evaluation stages use to collect
+    their outputs (append, extend), so it can be passed wherever those expect a
+    list, and results are streamed to disk instead of piling up in memory.
+
+    Attributes:
+      path: Path of the file that is written.
+    """
+
+    def __init__(self, path: str | None = None, suffix: str = ".ndjson"):
+        if path is None:
+            with tempfile.NamedTemporaryFile(
+                mode="w", delete=False, suffix=suffix
+            ) as f:
+                path = f.name
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, record: Any):
+        self.extend([record])
+
+    def extend(self, records: Iterable[Any]):
+        lines = [
+            json.dumps(record, sort_keys=True, default=json_default) + "\n"
+            for record in records
+        ]
+        with self._lock:
+            self._file.write("".join(lines))
+            self._count += len(lines)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def iter_ndjson(path: str) -> Iterator[Any]:
+    """Lazily yields the records of an NDJSON file, one line at a time."""
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
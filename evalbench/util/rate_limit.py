@@ -1,40 +1,301 @@
+import contextlib
+import json
 import logging
+import os
+import threading
 import time
 
-from threading import Semaphore
 from typing import Tuple, Any
+from util.metrics import RATE_LIMIT, RATE_LIMIT_RETRIES, RATE_LIMIT_SLEEP
+from util.tracing import span
 
 
 class ResourceExhaustedError(Exception):
     pass
 
 
+class TokenBucket:
+    """Thread-safe token bucket that allows execs_per_minute calls on average.
+
+    Up to `burst` calls can run back to back after the bucket was idle. Callers
+    reserve a token under a short lock and sleep for their turn outside of it,
+    so waiting never blocks other callers and never holds a concurrency slot.
+    """
+
+    def __init__(self, execs_per_minute: int, burst: int | None = None):
+        self.configured_execs_per_minute = execs_per_minute
+        self.execs_per_minute = execs_per_minute
+        self.rate = execs_per_minute / 60
+        self.burst = burst or max(1, int(execs_per_minute) // 60)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            # Tokens go negative while callers are queued for future refills.
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def wait(self):
+        """Blocks until the caller may run one call."""
+        wait_time = self.reserve()
+        if wait_time > 0:
+            RATE_LIMIT_SLEEP.inc(wait_time)
+            with span("rate_limit.wait", "rate_limit"):
+                time.sleep(wait_time)
+
+    def record_success(self, latency: float):
+        """Feedback of a call that succeeded after latency seconds."""
+
+    def record_exhausted(self):
+        """Feedback of a call that failed with a ResourceExhaustedError."""
+
+    def backoff(self, attempt: int) -> float:
+        """Returns the seconds to sleep before retrying an exhausted call."""
+        # exponentially backoff starting at 5 seconds
+        return 5 * (2 ** (attempt))
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket that learns the rate an endpoint sustains (AIMD).
+
+    Every window of as many successful calls as the current rate per minute,
+    i.e. about a minute at full rate, raises the rate by `increase` executions
+    per minute, up to `max_execs_per_minute`. A ResourceExhaustedError, or a
+    call that took longer than `spike_factor` times the moving average latency,
+    cuts the rate by `decrease_factor`, down to `min_execs_per_minute`, and
+    starts a new window. Cuts are at most once per `cooldown` seconds, so a
+    burst of failures of calls that were already in flight counts as one.
+    Retries back off exponentially, like with a TokenBucket.
+    """
+
+    def __init__(
+        self,
+        execs_per_minute: float,
+        burst: int | None = None,
+        configured_execs_per_minute: float | None = None,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        min_execs_per_minute: float = 1.0,
+        max_execs_per_minute: float | None = None,
+        spike_factor: float = 3.0,
+        cooldown: float = 5.0,
+    ):
+        super().__init__(execs_per_minute, burst)
+        self.configured_execs_per_minute = (
+            configured_execs_per_minute or execs_per_minute
+        )
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.min_execs_per_minute = min_execs_per_minute
+        self.max_execs_per_minute = (
+            max_execs_per_minute or 10 * self.configured_execs_per_minute
+        )
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self.increases = 0
+        self.decreases = 0
+        self._mean_latency = 0.0
+        self._latency_samples = 0
+        self._decreased_at = float("-inf")
+        # Successful calls since the rate last changed.
+        self._window_successes = 0
+
+    def record_success(self, latency: float):
+        with self._lock:
+            is_spike = (
+                self._latency_samples >= _MIN_LATENCY_SAMPLES
+                and latency > self.spike_factor * self._mean_latency
+            )
+            if self._latency_samples < _MIN_LATENCY_SAMPLES:
+                self._mean_latency += (latency - self._mean_latency) / (
+                    self._latency_samples + 1
+                )
+            else:
+                self._mean_latency += _LATENCY_EWMA_WEIGHT * (
+                    latency - self._mean_latency
+                )
+            self._latency_samples += 1
+            if is_spike:
+                self._decrease()
+            elif self.execs_per_minute < self.max_execs_per_minute:
+                self._window_successes += 1
+                if self._window_successes >= self.execs_per_minute:
+                    self.increases += 1
+                    self._set_execs_per_minute(self.execs_per_minute + self.increase)
+
+    def record_exhausted(self):
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._decreased_at < self.cooldown:
+            return
+        self._decreased_at = now
+        self.decreases += 1
+        self._set_execs_per_minute(self.execs_per_minute * self.decrease_factor)
+
+    def _set_execs_per_minute(self, execs_per_minute: float):
+        execs_per_minute = min(
+            self.max_execs_per_minute, max(self.min_execs_per_minute, execs_per_minute)
+        )
+        # Settle the tokens earned at the old rate before switching.
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+        self.execs_per_minute = execs_per_minute
+        self.rate = execs_per_minute / 60
+        self._window_successes = 0
+
+
+# Adaptive limiters only detect latency spikes once they saw this many calls.
+_MIN_LATENCY_SAMPLES = 20
+_LATENCY_EWMA_WEIGHT = 0.1
+
+_RATE_LIMITERS: dict[str, TokenBucket] = {}
+# Learned execs_per_minute by endpoint, that new adaptive limiters start from.
+_LEARNED_RATES: dict[str, float] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(
+    key: str,
+    execs_per_minute: int | None,
+    burst: int | None = None,
+    adaptive: bool = False,
+) -> TokenBucket | None:
+    """Returns the process-wide token bucket of an endpoint.
+
+    Every DB and generator that calls the same physical endpoint (database
+    instance, model and region, ...) passes the same key and so shares one
+    budget, however many objects are created for it.
+
+    Args:
+      key: Identifies the endpoint.
+      execs_per_minute: The configured rate.
+      burst: Calls that may run back to back after the endpoint was idle.
+      adaptive: Learn the rate with an AdaptiveTokenBucket, starting from the
+        rate loaded by load_rate_limits if any, else from execs_per_minute.
+
+    Returns:
+      None if execs_per_minute is not a positive int, i.e. calls are unlimited.
+    """
+    if not isinstance(execs_per_minute, int) or execs_per_minute <= 0:
+        return None
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(key)
+        if limiter is None:
+            if adaptive:
+                limiter = AdaptiveTokenBucket(
+                    _LEARNED_RATES.get(key, execs_per_minute),
+                    burst,
+                    configured_execs_per_minute=execs_per_minute,
+                )
+            else:
+                limiter = TokenBucket(execs_per_minute, burst)
+            _RATE_LIMITERS[key] = limiter
+        elif limiter.configured_execs_per_minute != execs_per_minute:
+            logging.warning(
+                f"Rate limit of {key} is already"
+                + f" {limiter.configured_execs_per_minute}/min,"
+                + f" ignoring {execs_per_minute}/min."
+            )
+        return limiter
+
+
+def rate_limit_report() -> dict[str, dict]:
+    """Returns the configured and current rate of every endpoint of the process."""
+    with _RATE_LIMITERS_LOCK:
+        limiters = dict(_RATE_LIMITERS)
+    report = {}
+    for key, limiter in limiters.items():
+        entry = {
+            "configured_execs_per_minute": limiter.configured_execs_per_minute,
+            "execs_per_minute": limiter.execs_per_minute,
+            "adaptive": isinstance(limiter, AdaptiveTokenBucket),
+        }
+        if isinstance(limiter, AdaptiveTokenBucket):
+            entry["increases"] = limiter.increases
+            entry["decreases"] = limiter.decreases
+        report[key] = entry
+        RATE_LIMIT.set(limiter.execs_per_minute, endpoint=key)
+    return report
+
+
+def load_rate_limits(path: str):
+    """Seeds adaptive limiters created from now on with the rates of a report."""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        report = json.load(f)
+    with _RATE_LIMITERS_LOCK:
+        for key, entry in report.items():
+            if entry.get("adaptive"):
+                _LEARNED_RATES[key] = entry["execs_per_minute"]
+    logging.info(f"Loaded learned rate limits of {len(report)} endpoints from {path}")
+
+
+def save_rate_limits(path: str):
+    """Writes the rate_limit_report, merged over the report already at path."""
+    report = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            report = json.load(f)
+    report.update(rate_limit_report())
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
 def rate_limit(
     query: Tuple,
     execution_method,
-    execs_per_minute: int | None,
-    semaphore: Semaphore,
+    rate_limiter: TokenBucket | None,
     max_attempts: int,
+    semaphore: threading.Semaphore | None = None,
 ) -> Any:
+    # The semaphore caps the calls in flight; it is only held while a call runs,
+    # not while waiting for a token or backing off.
+    concurrency = semaphore if semaphore is not None else contextlib.nullcontext()
     # If no limit is specified, run immediately.
-    if not isinstance(execs_per_minute, int):
-        return execution_method(*query)
+    if rate_limiter is None:
+        with concurrency:
+            return execution_method(*query)
 
-    result = None
-    semaphore.acquire()
     attempt = 1
-    while attempt <= max_attempts:
+    while True:
+        rate_limiter.wait()
         try:
-            result = execution_method(*query)
-            break
+            with concurrency:
+                # Time the call only: queueing for the semaphore is no latency
+                # of the backend, and must not make the adaptive limit back off.
+                started_at = time.monotonic()
+                result = execution_method(*query)
         except ResourceExhaustedError as e:
             logging.info(e)
-            # exponentially backoff starting at 5 seconds
-            time.sleep(5 * (2 ** (attempt)))
+            rate_limiter.record_exhausted()
+            if attempt >= max_attempts:
+                # All attempts were unsuccessful
+                raise ResourceExhaustedError() from e
+            RATE_LIMIT_RETRIES.inc()
+            backoff = rate_limiter.backoff(attempt)
+            if backoff:
+                RATE_LIMIT_SLEEP.inc(backoff)
+                with span("rate_limit.backoff", "rate_limit", attempt=attempt):
+                    time.sleep(backoff)
             attempt += 1
-    time.sleep(60 / execs_per_minute)
-    semaphore.release()
-    if attempt > max_attempts:
-        # All attempts were unsuccessful
-        raise ResourceExhaustedError()
-    return result
+            continue
+        rate_limiter.record_success(time.monotonic() - started_at)
+        return result
@@ -16,7 +16,9 @@ class SessionManager:
         self.sessions = {}
         self.ttl = 3600
         logging.debug("Starting reaper...")
-        reaper = Thread(target=self.reaper, args=[])
+        # A daemon thread, so that importing util never keeps a process alive,
+        # e.g. the spawned workers of a process pool on shutdown.
+        reaper = Thread(target=self.reaper, args=[], daemon=True)
         reaper.start()
 
     def set_ttl(self, ttl):
@@ -0,0 +1,137 @@
+"""Opt-in tracer that exports per-item timelines in the Chrome trace-event format.
+
+The written trace.json can be opened in chrome://tracing or https://ui.perfetto.dev.
+Spans show up on one track per thread (e.g. per runner thread), and waits that
+overlap each other, such as items waiting in a stage's queue, on async tracks.
+"""
+
+import contextlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+# Spans are recorded with time.monotonic(), the clock the runners already use.
+_US_PER_SECOND = 1_000_000
+
+
+class Tracer:
+    """Collects trace events while enabled; all calls are no-ops otherwise."""
+
+    def __init__(self):
+        self.enabled = False
+        self._events: list[dict] = []
+        self._thread_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._async_ids = itertools.count()
+
+    def enable(self):
+        with self._lock:
+            self.enabled = True
+            self._events = []
+            self._thread_names = {}
+
+    def disable(self):
+        self.enabled = False
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "evalbench", **args: Any):
+        """Traces the enclosed block on the track of the current thread."""
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.complete(name, start, time.monotonic(), category, **args)
+
+    def complete(
+        self, name: str, start: float, end: float, category: str = "evalbench", **args
+    ):
+        """Records a span of the current thread that was timed by the caller."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        self._add(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * _US_PER_SECOND,
+                "dur": (end - start) * _US_PER_SECOND,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": args,
+            },
+            thread,
+        )
+
+    def async_span(
+        self, name: str, start: float, end: float, category: str = "evalbench", **args
+    ):
+        """Records a span that may overlap others, e.g. an item waiting in a queue.
+
+        Async spans of the same category are grouped on their own track.
+        """
+        if not self.enabled:
+            return
+        span_id = next(self._async_ids)
+        common = {"name": name, "cat": category, "id": span_id, "pid": os.getpid()}
+        self._add({**common, "ph": "b", "ts": start * _US_PER_SECOND, "args": args})
+        self._add({**common, "ph": "e", "ts": end * _US_PER_SECOND})
+
+    def write(self, path: str):
+        """Writes the collected events as a Chrome trace-event JSON file."""
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        pid = os.getpid()
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": thread_name},
+            }
+            for tid, thread_name in thread_names.items()
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {"traceEvents": metadata + events, "displayTimeUnit": "ms"},
+                f,
+                default=str,
+            )
+        logging.info(f"Wrote {len(events)} trace events to {path}")
+
+    def _add(self, event: dict, thread: threading.Thread | None = None):
+        with self._lock:
+            self._events.append(event)
+            if thread is not None and thread.ident not in self._thread_names:
+                self._thread_names[thread.ident] = thread.name
+
+
+TRACER = Tracer()
+
+
+def span(name: str, category: str = "evalbench", **args: Any):
+    """Shorthand for TRACER.span."""
+    return TRACER.span(name, category, **args)
+
+
+def item_args(eval_output: dict | None) -> dict[str, Any]:
+    """Returns the span args that identify an eval item."""
+    if not eval_output:
+        return {}
+    return {
+        "id": eval_output.get("id"),
+        "database": eval_output.get("database"),
+        "query_type": eval_output.get("query_type"),
+    }
@@ -0,0 +1,101 @@
+"""Work wrappers that checkpoint stage outputs to a Journal and replay them."""
+
+from concurrent.futures import Executor
+from typing import Any, Callable
+from util.journal import JOURNALED_FIELDS, Journal
+from work import Work
+
+
+class JournaledWork(Work):
+    """Runs the Work of a stage and appends its output to the journal."""
+
+    def __init__(self, work: Work, journal: Journal, key: str, stage: str):
+        self.work = work
+        self.eval_result = getattr(work, "eval_result", None)
+        self.journal = journal
+        self.key = key
+        self.stage = stage
+
+    def run(self, work_config: Any = None) -> dict:
+        eval_output = self.work.run(work_config)
+        self._record(eval_output)
+        return eval_output
+
+    async def arun(
+        self, work_config: Any = None, executor: Executor | None = None
+    ) -> dict:
+        eval_output = await self.work.arun(work_config, executor)
+        self._record(eval_output)
+        return eval_output
+
+    def _record(self, eval_output):
+        self.journal.record(
+            self.key, self.stage, eval_output, getattr(self.work, "scores", None)
+        )
+
+
+class ReplayWork(Work):
+    """Stands in for a stage that a previous run of the same job journaled."""
+
+    def __init__(
+        self,
+        eval_output: dict,
+        scores: list | None = None,
+        scoring_results: list | None = None,
+    ):
+        self.eval_result = eval_output
+        self.scores = scores
+        self.scoring_results = scoring_results
+
+    def run(self, work_config: Any = None) -> dict:
+        if self.scores and self.scoring_results is not None:
+            self.scoring_results.extend(self.scores)
+        return self.eval_result
+
+    async def arun(
+        self, work_config: Any = None, executor: Executor | None = None
+    ) -> dict:
+        return self.run(work_config)
+
+
+def journal_key(sub_dataset_key: str, eval_output: dict) -> str:
+    """Identifies an eval item by its (dialect, database, db_config) and id."""
+    return f"{sub_dataset_key}/{eval_output['query_type']}#{eval_output['id']}"
+
+
+def get_stage_work(
+    journal: Journal | None,
+    key: str,
+    stage: str,
+    eval_output: dict,
+    make_work: Callable[[dict], Work],
+    scoring_results: list | None = None,
+) -> Work:
+    """Returns the Work of a stage of an item, taking the journal into account.
+
+    Stages that the journal has as done are replayed without calling make_work,
+    so e.g. no DB is taken from the queue for an item that was scored already.
+
+    Args:
+      journal: The journal of the job, or None if journaling is disabled.
+      key: Identifies the eval item within the job.
+      stage: The stage name.
+      eval_output: The eval output of the item going into the stage.
+      make_work: Builds the actual Work of the stage for the eval output.
+      scoring_results: The list that replayed scores are added to.
+    """
+    if journal is None:
+        return make_work(eval_output)
+    if not journal.is_done(key, stage):
+        if stage not in JOURNALED_FIELDS:
+            return make_work(eval_output)
+        return JournaledWork(make_work(eval_output), journal, key, stage)
+    restored, scores = journal.restore(key)
+    eval_output.update(restored)
+    if stage == "scoring":
+        # The prompt and results of a scored item are not journaled, so its
+        # record lacks them; mark it, as it differs from that of a fresh run.
+        eval_output["replayed_from_journal"] = True
+    else:
+        scores = None
+    return ReplayWork(eval_output, scores, scoring_results)
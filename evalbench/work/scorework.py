@@ -1,6 +1,7 @@
 """ScorerWork is the class for all scoring work."""
 
 from typing import Any
+from mp.processpool import get_process_pool
 from scorers import score
 from work import Work
 
@@ -19,6 +20,14 @@ class ScorerWork(Work):
         self.eval_result = eval_result
         self.scoring_results = scoring_results
         self.global_models = global_models
+        # The score dicts of this item only.
+        self.scores: list = []
+        self.process_pool = None
+        runner_config = experiment_config.get("runners", {})
+        if runner_config.get("scoring_mode", "thread") == "process":
+            self.process_pool = get_process_pool(
+                "scoring", runner_config.get("scoring_processes")
+            )
 
     def run(self, work_config: Any = None) -> dict:
         """Score the work item.
@@ -32,7 +41,9 @@ class ScorerWork(Work):
         score.compare(
             self.eval_result,
             self.experiment_config,
-            self.scoring_results,
+            self.scores,
             self.global_models,
+            self.process_pool,
         )
+        self.scoring_results.extend(self.scores)
         return self.eval_result
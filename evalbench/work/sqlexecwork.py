@@ -1,9 +1,12 @@
 """Work is the base class for all work items."""
 
+from concurrent.futures import Executor
 from typing import Any
-from databases import DB
+from databases import DB, get_golden_store
 from work import Work
+from util.aio import run_in_executor
 from util.sanitizer import sanitize_sql
+from util.tracing import span
 from queue import Queue
 import sqlparse
 
@@ -22,6 +25,7 @@ class SQLExecWork(Work):
         self.experiment_config = experiment_config
         self.eval_result = eval_result
         self.db_queue = db_queue
+        self.golden_store = get_golden_store(experiment_config)
 
     def run(self, work_config: Any = None) -> dict:
         """Runs the work item.
@@ -32,6 +36,33 @@ class SQLExecWork(Work):
         Returns:
 
         """
+        try:
+            self._execute()
+        finally:
+            # Also on errors, e.g. of the golden store, or later checkouts block.
+            self.db_queue.put(self.db)
+        return self.eval_result
+
+    async def arun(
+        self, work_config: Any = None, executor: Executor | None = None
+    ) -> dict:
+        """Runs the work item on a worker thread of executor.
+
+        The DB drivers are blocking, so the queries run on a thread. The DB is not
+        returned to db_queue; the caller that checked it out owns it.
+
+        Args:
+          work_config:
+          executor: The executor of the stage, or None for the loop's default.
+
+        Returns:
+
+        """
+        await run_in_executor(executor, self._execute)
+        return self.eval_result
+
+    def _execute(self):
+        """Runs the generated and golden queries, and stores their results."""
         generated_result = None
         generated_eval_result = None
         generated_error = None
@@ -49,26 +80,102 @@ class SQLExecWork(Work):
             golden_sql = self._get_golden_sql()
 
             if sanitized_generated_sql:
-                generated_result, generated_eval_result, generated_error = (
-                    self._evaluate_execution_results(
-                        sanitized_generated_sql, eval_query, query_type, is_golden=False
+                with span("generated_sql", "db", id=self.eval_result["id"]):
+                    generated_result, generated_eval_result, generated_error = (
+                        self._evaluate_execution_results(
+                            sanitized_generated_sql,
+                            eval_query,
+                            query_type,
+                            is_golden=False,
+                        )
                     )
+            with span("golden_sql", "db", id=self.eval_result["id"]):
+                golden_result, golden_eval_result, golden_error = (
+                    self._evaluate_golden_results(golden_sql, eval_query, query_type)
                 )
+
+        self._store_results(
+            generated_result,
+            generated_eval_result,
+            generated_error,
+            golden_result,
+            golden_eval_result,
+            golden_error,
+        )
+
+    def run_golden(self) -> dict:
+        """Runs only the golden query, to fill the golden store."""
+        try:
             golden_result, golden_eval_result, golden_error = (
-                self._evaluate_execution_results(
-                    golden_sql, eval_query, query_type, is_golden=True
+                self._evaluate_golden_results(
+                    self._get_golden_sql(),
+                    self._get_eval_query(),
+                    self.eval_result["query_type"],
                 )
             )
+        finally:
+            self.db_queue.put(self.db)
+        self.eval_result["golden_result"] = golden_result
+        self.eval_result["golden_eval_results"] = golden_eval_result
+        self.eval_result["golden_error"] = golden_error
+        return self.eval_result
 
+    def _store_results(
+        self,
+        generated_result,
+        generated_eval_result,
+        generated_error,
+        golden_result,
+        golden_eval_result,
+        golden_error,
+    ):
         self.eval_result["generated_result"] = generated_result
         self.eval_result["eval_results"] = generated_eval_result
         self.eval_result["generated_error"] = generated_error
         self.eval_result["golden_result"] = golden_result
         self.eval_result["golden_eval_results"] = golden_eval_result
         self.eval_result["golden_error"] = golden_error
+        # Results are capped by the fetch policy of the DB, see ResultSet.
+        for key, result in (
+            ("generated_result", generated_result),
+            ("golden_result", golden_result),
+        ):
+            self.eval_result[f"{key}_total_row_count"] = getattr(
+                result,
+                "total_row_count",
+                len(result) if isinstance(result, list) else None,
+            )
+            self.eval_result[f"{key}_truncated"] = getattr(result, "truncated", False)
+            self.eval_result[f"{key}_total_row_count_capped"] = getattr(
+                result, "total_row_count_capped", False
+            )
 
-        self.db_queue.put(self.db)
-        return self.eval_result
+    def _evaluate_golden_results(self, golden_sql, eval_query, query_type):
+        """Reads the golden results from the golden store, or runs the query."""
+        golden_key, stored = self._read_golden_store(golden_sql, eval_query, query_type)
+        if stored is not None:
+            return stored
+        golden_results = self._evaluate_execution_results(
+            golden_sql, eval_query, query_type, is_golden=True
+        )
+        self._write_golden_store(golden_key, golden_results)
+        return golden_results
+
+    def _read_golden_store(self, golden_sql, eval_query, query_type):
+        """Returns the key of the golden query, and its stored results if any."""
+        if self.golden_store is None:
+            return None, None
+        golden_key = self.golden_store.key(self.db, query_type, golden_sql, eval_query)
+        stored = self.golden_store.get(golden_key)
+        if stored is None:
+            return golden_key, None
+        golden_result, golden_eval_result = stored
+        return golden_key, (golden_result, golden_eval_result, None)
+
+    def _write_golden_store(self, golden_key, golden_results):
+        golden_result, golden_eval_result, golden_error = golden_results
+        if golden_key and not golden_error:
+            self.golden_store.put(golden_key, golden_result, golden_eval_result)
 
     def _evaluate_execution_results(
         self, query, eval_query, query_type, is_golden=False
@@ -87,7 +194,7 @@ class SQLExecWork(Work):
         elif query_type == "ddl":
             # self.db.execute(self.eval_result["setup_sql"])
             try:
-                self.db.resetup_database(force=True)
+                self.db.reset_to_setup()
             except Exception as setup_error:
                 return (
                     None,
@@ -1,5 +1,6 @@
 """Work is the base class for all work items."""
 
+from concurrent.futures import Executor
 from typing import Any
 from work import Work
 
@@ -22,22 +23,63 @@ class SQLGenWork(Work):
         """
         generated_sql = None
         sql_generator_error = None
-        if self.eval_result["prompt_generator_error"] is None:
-            if "noop" in self.generator.name:
-                # only set these if value is truthy, to avoid issues like
-                # proto default value empty string false positive error.
-                if self.eval_result["generated_sql"]:
-                    generated_sql = self.eval_result["generated_sql"]
-                if self.eval_result["sql_generator_error"]:
-                    sql_generator_error = self.eval_result["sql_generator_error"]
-            else:
-                try:
-                    generated_sql = self.generator.generate(
-                        self.eval_result["generated_prompt"]
-                    )
-                except Exception as e:
-                    sql_generator_error = str(e)
+        if self._should_generate():
+            try:
+                generated_sql = self.generator.generate(
+                    self.eval_result["generated_prompt"]
+                )
+            except Exception as e:
+                sql_generator_error = str(e)
+        else:
+            generated_sql, sql_generator_error = self._passthrough_results()
+
+        self.eval_result["generated_sql"] = generated_sql
+        self.eval_result["sql_generator_error"] = sql_generator_error
+        return self.eval_result
+
+    async def arun(
+        self, work_config: str = None, executor: Executor | None = None
+    ) -> dict:
+        """Runs the work item through the generator's async adapter.
+
+        Args:
+          work_config:
+          executor: The executor for blocking generator clients.
+
+        Returns:
+
+        """
+        generated_sql = None
+        sql_generator_error = None
+        if self._should_generate():
+            try:
+                generated_sql = await self.generator.agenerate(
+                    self.eval_result["generated_prompt"], executor
+                )
+            except Exception as e:
+                sql_generator_error = str(e)
+        else:
+            generated_sql, sql_generator_error = self._passthrough_results()
 
         self.eval_result["generated_sql"] = generated_sql
         self.eval_result["sql_generator_error"] = sql_generator_error
         return self.eval_result
+
+    def _should_generate(self):
+        return (
+            self.eval_result["prompt_generator_error"] is None
+            and "noop" not in self.generator.name
+        )
+
+    def _passthrough_results(self):
+        """Results for items that are not sent to the generator (noop / prompt errors)."""
+        generated_sql = None
+        sql_generator_error = None
+        if self.eval_result["prompt_generator_error"] is None:
+            # only set these if value is truthy, to avoid issues like
+            # proto default value empty string false positive error.
+            if self.eval_result["generated_sql"]:
+                generated_sql = self.eval_result["generated_sql"]
+            if self.eval_result["sql_generator_error"]:
+                sql_generator_error = self.eval_result["sql_generator_error"]
+        return generated_sql, sql_generator_error
@@ -1,6 +1,8 @@
 """Work is the base class for all work items."""
 
+from concurrent.futures import Executor
 from typing import Any
+from util.aio import run_in_executor
 
 
 class Work:
@@ -19,3 +21,19 @@ class Work:
 
         """
         return f"{self.item} {work_config}"
+
+    async def arun(
+        self, work_config: Any = None, executor: Executor | None = None
+    ) -> str | dict:
+        """Runs the work item as a coroutine.
+
+        Work items that only have a blocking implementation run on a worker thread.
+
+        Args:
+          work_config:
+          executor: The executor of the stage, or None for the loop's default.
+
+        Returns:
+
+        """
+        return await run_in_executor(executor, self.run, work_config)